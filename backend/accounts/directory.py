@@ -0,0 +1,158 @@
+"""
+Public directory listings (hospitals / labs): filters, opt-in cursor pagination,
+and a per-process cache of the rendered JSON with ETag / Cache-Control.
+
+- Cache entries are keyed by the absolute request URL + a version stamp in the
+  shared cache; signals bump the stamp after commit of any Hospital / Lab /
+  Governorate write, so every process drops its copies on the next request
+  (never caching pre-commit rows under the new stamp).
+- A hit costs one shared-cache read: no DB query, no serializer, no JSON encoding.
+- Clients sending If-None-Match with the current ETag get 304.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.pagination import CursorPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from appointments.services.caching import bump_version_on_commit, get_version
+
+
+LOCAL_CACHE_MAX_ENTRIES = 256
+# BigAutoField primary keys: larger values would overflow the DB integer type
+MAX_ID = 2**63 - 1
+
+
+def directory_version_name(name: str) -> str:
+    return f"directory:{name}"
+
+
+def invalidate_directory(name: str) -> None:
+    bump_version_on_commit(directory_version_name(name))
+
+
+def cache_max_age() -> int:
+    return int(getattr(settings, "DIRECTORY_CACHE_MAX_AGE", 60) or 0)
+
+
+def parse_governorate(raw) -> int | None:
+    """?governorate= as a valid id, None when absent; ValueError otherwise."""
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    if not raw.isdecimal():
+        raise ValueError(raw)
+    value = int(raw)
+    if not 1 <= value <= MAX_ID:
+        raise ValueError(raw)
+    return value
+
+
+class DirectoryCursorPagination(CursorPagination):
+    ordering = "id"
+    page_size = 50
+    page_size_query_param = "limit"
+    max_page_size = 200
+
+
+class _LocalCache:
+    """Small thread-safe LRU: key -> (etag, body)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_local_cache = _LocalCache(LOCAL_CACHE_MAX_ENTRIES)
+
+
+class CachedDirectoryListMixin:
+    """
+    For ListCreateAPIView subclasses. Set directory_name ("hospital" / "lab").
+
+    Query params:
+    - governorate=<id>, specialty=<exact text>
+    - limit / cursor -> cursor pagination ({"next", "previous", "results"});
+      without them the response stays a plain list (existing clients).
+    """
+
+    directory_name = ""
+    pagination_class = DirectoryCursorPagination
+
+    @property
+    def paginator(self):
+        params = self.request.query_params
+        if "cursor" not in params and "limit" not in params:
+            return None
+        return super().paginator
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+
+        governorate = parse_governorate(params.get("governorate"))
+        if governorate is not None:
+            queryset = queryset.filter(governorate_id=governorate)
+
+        specialty = (params.get("specialty") or "").strip()
+        if specialty:
+            queryset = queryset.filter(specialty=specialty)
+
+        return queryset
+
+    def _render(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            data = self.get_paginated_response(self.get_serializer(page, many=True).data).data
+        else:
+            data = self.get_serializer(queryset, many=True).data
+
+        body = JSONRenderer().render(data)
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        return etag, body
+
+    def list(self, request, *args, **kwargs):
+        try:
+            parse_governorate(request.query_params.get("governorate"))
+        except ValueError:
+            return Response({"detail": "Invalid governorate. Use integer."}, status=400)
+
+        version = get_version(directory_version_name(self.directory_name))
+        key = (self.directory_name, version, request.build_absolute_uri())
+
+        entry = _local_cache.get(key)
+        if entry is None:
+            entry = self._render(request)
+            _local_cache.set(key, entry)
+        etag, body = entry
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type="application/json")
+
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=cache_max_age())
+        return response
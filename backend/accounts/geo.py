@@ -0,0 +1,127 @@
+"""
+Grid index + nearest-N search for rows with latitude/longitude (Hospital, Lab, CustomUser).
+
+- geo_cell = row * GRID_COLS + col on a fixed GRID_DEG grid (indexed integer column,
+  filled in Model.save()).
+- A query turns the search circle into a bounding box -> one contiguous cell range
+  per grid row (index range scans) + a lat/lon BETWEEN on the same box.
+- Candidates are ranked with exact haversine distance in Python; the radius grows
+  until at least N results lie inside it (so the N returned are the true nearest).
+
+Boxes are not wrapped across the antimeridian (not relevant for our coverage area).
+"""
+from __future__ import annotations
+
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+GRID_DEG = 0.05  # ~5.5 km per cell in latitude
+GRID_ROWS = int(round(180 / GRID_DEG))
+GRID_COLS = int(round(360 / GRID_DEG))
+
+SEARCH_RADII_KM = (5, 10, 25, 50, 100, 250, 500)
+DEFAULT_MAX_KM = 500
+
+
+def _row_col(lat: float, lon: float) -> tuple[int, int]:
+    row = int(math.floor((lat + 90.0) / GRID_DEG))
+    col = int(math.floor((lon + 180.0) / GRID_DEG))
+    return min(max(row, 0), GRID_ROWS - 1), min(max(col, 0), GRID_COLS - 1)
+
+
+def grid_cell(lat, lon) -> int | None:
+    if lat is None or lon is None:
+        return None
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    row, col = _row_col(lat, lon)
+    return row * GRID_COLS + col
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (
+        max(lat - dlat, -90.0),
+        min(lat + dlat, 90.0),
+        max(lon - dlon, -180.0),
+        min(lon + dlon, 180.0),
+    )
+
+
+def bbox_q(lat: float, lon: float, radius_km: float, prefix: str = "") -> Q:
+    """Q filter: cell ranges per grid row + exact box on latitude/longitude."""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    row_min, col_min = _row_col(min_lat, min_lon)
+    row_max, col_max = _row_col(max_lat, max_lon)
+
+    cell_ranges = [
+        Q(**{
+            f"{prefix}geo_cell__gte": row * GRID_COLS + col_min,
+            f"{prefix}geo_cell__lte": row * GRID_COLS + col_max,
+        })
+        for row in range(row_min, row_max + 1)
+    ]
+
+    return reduce(or_, cell_ranges) & Q(**{
+        f"{prefix}latitude__gte": min_lat,
+        f"{prefix}latitude__lte": max_lat,
+        f"{prefix}longitude__gte": min_lon,
+        f"{prefix}longitude__lte": max_lon,
+    })
+
+
+def nearest(queryset, lat: float, lon: float, limit: int = 10, max_km: float = DEFAULT_MAX_KM) -> list:
+    """
+    [(obj, distance_km)] for the `limit` rows of queryset closest to (lat, lon),
+    nearest first, none farther than max_km.
+    """
+    radii = [r for r in SEARCH_RADII_KM if r < max_km] + [max_km]
+
+    ranked = []
+    for radius in radii:
+        ranked = []
+        for obj in queryset.filter(bbox_q(lat, lon, radius)):
+            d = haversine_km(lat, lon, float(obj.latitude), float(obj.longitude))
+            if d <= radius:
+                ranked.append((obj, d))
+        if len(ranked) >= limit:
+            break
+
+    ranked.sort(key=lambda x: x[1])
+    return ranked[:limit]
+
+
+def sync_geo_cell(instance, update_fields=None):
+    """
+    Called from Model.save(): keep geo_cell in step with latitude/longitude.
+    Returns update_fields extended with geo_cell when coordinates are being saved.
+    """
+    instance.geo_cell = grid_cell(instance.latitude, instance.longitude)
+    if update_fields is not None:
+        update_fields = set(update_fields)
+        if update_fields & {"latitude", "longitude"}:
+            update_fields.add("geo_cell")
+    return update_fields
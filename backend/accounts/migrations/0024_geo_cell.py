@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:25
+
+import math
+
+from django.db import migrations, models
+
+
+# Frozen copy of the grid in accounts/geo.py as of this migration: a later change
+# to the grid size or the cell formula must not change what this backfill writes.
+GRID_DEG = 0.05
+GRID_ROWS = int(round(180 / GRID_DEG))
+GRID_COLS = int(round(360 / GRID_DEG))
+
+
+def grid_cell(lat, lon):
+    if lat is None or lon is None:
+        return None
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    row = min(max(int(math.floor((lat + 90.0) / GRID_DEG)), 0), GRID_ROWS - 1)
+    col = min(max(int(math.floor((lon + 180.0) / GRID_DEG)), 0), GRID_COLS - 1)
+    return row * GRID_COLS + col
+
+
+def backfill_geo_cell(apps, schema_editor):
+    for model_name in ("CustomUser", "Hospital", "Lab"):
+        Model = apps.get_model("accounts", model_name)
+        rows = list(
+            Model.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .only("id", "latitude", "longitude")
+        )
+        for row in rows:
+            row.geo_cell = grid_cell(row.latitude, row.longitude)
+        Model.objects.bulk_update(rows, ["geo_cell"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_patientdetails_activity_level_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='hospital',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lab',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_geo_cell, migrations.RunPython.noop),
+    ]
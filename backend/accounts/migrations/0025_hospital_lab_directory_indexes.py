@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_geo_cell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hospital',
+            index=models.Index(fields=['governorate', 'specialty'], name='hospital_gov_specialty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hospital',
+            index=models.Index(fields=['specialty'], name='hospital_specialty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lab',
+            index=models.Index(fields=['governorate', 'specialty'], name='lab_gov_specialty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lab',
+            index=models.Index(fields=['specialty'], name='lab_specialty_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_hospital_lab_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-date_time', '-id'], name='appt_patient_datetime_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_appointment_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urgentrequest',
+            name='offer_date_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='urgentrequest',
+            name='offer_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='urgentrequest',
+            index=models.Index(fields=['doctor', 'status', '-score', 'created_at'], name='urgent_doctor_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:57
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def backfill_effective_priority(apps, schema_editor):
+    # score only; open rows get their aging bonus from the next refresh_urgent_priorities run
+    UrgentRequest = apps.get_model("accounts", "UrgentRequest")
+    UrgentRequest.objects.update(effective_priority=Coalesce(F("score"), 0) * 1.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_urgent_request_offer'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='urgentrequest',
+            name='urgent_doctor_queue_idx',
+        ),
+        migrations.AddField(
+            model_name='urgentrequest',
+            name='effective_priority',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='urgentrequest',
+            index=models.Index(fields=['doctor', 'status', '-effective_priority', '-created_at', '-id'], name='urgent_doctor_priority_idx'),
+        ),
+        migrations.RunPython(backfill_effective_priority, migrations.RunPython.noop),
+    ]
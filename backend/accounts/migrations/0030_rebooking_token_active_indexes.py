@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_urgent_request_priority'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rebookingprioritytoken',
+            name='accounts_re_patient_86b56a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='rebookingprioritytoken',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['patient', 'doctor', '-issued_at'], name='rebook_token_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rebookingprioritytoken',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='rebook_token_active_exp_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.utils import timezone
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 
+from .geo import sync_geo_cell
+
 # نموذج المحافظة المرجعية
 class Governorate(models.Model):
     name = models.CharField(max_length=150, unique=True)
@@ -52,6 +54,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     address = models.TextField(blank=True, null=True)
     latitude = models.DecimalField(max_digits=10, decimal_places=7, blank=True, null=True)
     longitude = models.DecimalField(max_digits=10, decimal_places=7, blank=True, null=True)
+    # خلية الشبكة الجغرافية (تُحسب تلقائيًا من الإحداثيات) - للبحث عن الأقرب
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='patient')
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=False)  # سيبقى غير مفعل للطبيب تلقائيًا
@@ -67,6 +71,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.email} ({self.role})"
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = sync_geo_cell(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 # نموذج طلب حذف حساب 
 class AccountDeletionRequest(models.Model):
     STATUS_CHOICES = [
@@ -423,9 +431,31 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Optimistic concurrency: bumped by every write; lifecycle transitions are
+    # compare-and-swap on it (appointments/services/lifecycle.py)
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # patient timeline: newest first per patient
+            models.Index(fields=["patient", "-date_time", "-id"], name="appt_patient_datetime_idx"),
+        ]
+
     def __str__(self):
         return f"{self.patient.username} with {self.doctor.username} on {self.date_time}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # Bumped in SQL (not from this instance's possibly stale copy)
+        self.version = models.F("version") + 1
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
+
 #-----------------------------
 # التقييم الأولي
 #-----------------------------
@@ -509,24 +539,46 @@ class Hospital(models.Model):
     address = models.TextField(blank=True, null=True)
     latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
     specialty = models.CharField(max_length=200, blank=True, null=True)
     contact_info = models.CharField(max_length=200, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["governorate", "specialty"], name="hospital_gov_specialty_idx"),
+            models.Index(fields=["specialty"], name="hospital_specialty_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = sync_geo_cell(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 class Lab(models.Model):
     name = models.CharField(max_length=200)
     governorate = models.ForeignKey(Governorate, on_delete=models.CASCADE, related_name='labs')
     address = models.TextField(blank=True, null=True)
     latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
     longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    geo_cell = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
     specialty = models.CharField(max_length=200, blank=True, null=True)
     contact_info = models.CharField(max_length=200, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["governorate", "specialty"], name="lab_gov_specialty_idx"),
+            models.Index(fields=["specialty"], name="lab_specialty_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = sync_geo_cell(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
 
 class DoctorAbsence(models.Model):
     TYPE_CHOICES = [
@@ -649,14 +701,32 @@ class UrgentRequest(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     handled_at = models.DateTimeField(blank=True, null=True)
 
+    # Freed slot offered by the urgent matcher (appointments/services/urgent_matcher.py)
+    offer_date_time = models.DateTimeField(blank=True, null=True)
+    offer_expires_at = models.DateTimeField(blank=True, null=True)
+
+    # score + aging bonus (appointments/services/urgent_queue.py), refreshed periodically
+    effective_priority = models.FloatField(default=0)
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["doctor", "status", "created_at"]),
             models.Index(fields=["patient", "created_at"]),
             models.Index(fields=["score", "created_at"]),
+            # doctor's inbox / urgent matcher: highest aged priority first, keyset on (created_at, id)
+            models.Index(
+                fields=["doctor", "status", "-effective_priority", "-created_at", "-id"],
+                name="urgent_doctor_priority_idx",
+            ),
         ]
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.effective_priority:
+            # nothing waited yet -> priority is the triage score
+            self.effective_priority = float(self.score or 0)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"UrgentRequest(patient={self.patient_id}, doctor={self.doctor_id}, score={self.score}, status={self.status})"
 
@@ -703,8 +773,19 @@ class RebookingPriorityToken(models.Model):
         ordering = ["-issued_at"]
 
         indexes = [
-            # البحث عن توكن فعّال للمريض عند الحجز
-            models.Index(fields=["patient", "doctor", "is_active", "expires_at"]),
+            # البحث عن توكن فعّال للمريض عند الحجز / عرض المواعيد
+            # (جزئي: التوكنات الفعّالة فقط، والمنتهية يعطّلها sweep_rebooking_tokens)
+            models.Index(
+                fields=["patient", "doctor", "-issued_at"],
+                condition=models.Q(is_active=True),
+                name="rebook_token_active_idx",
+            ),
+            # sweeper: التوكنات الفعّالة حسب تاريخ الانتهاء
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(is_active=True),
+                name="rebook_token_active_exp_idx",
+            ),
 
             # دعم الاستعلامات القديمة (لو استُخدمت بمكان آخر)
             models.Index(fields=["patient", "is_active", "expires_at"]),
@@ -0,0 +1,161 @@
+"""
+Reference data layer: governorates, appointment types, doctor duration overrides
+and doctor-specific visit types, held per process.
+
+- The whole snapshot is keyed by one global version stamp in the shared cache.
+- Signals (accounts/signals.py) bump the stamp on any write to these tables,
+  so every process reloads on its next read (write-through invalidation).
+- A read costs one shared-cache get; the tables are only queried on reload.
+
+Appointment types are kept as model instances (read-only!) so callers can use
+them directly as FK values / with getattr like a fresh .get().
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+
+from rest_framework.renderers import JSONRenderer
+
+from appointments.services.caching import bump_version, get_version
+
+from .models import AppointmentType, DoctorAppointmentType, DoctorSpecificVisitType, Governorate
+
+
+VERSION_NAME = "reference_data"
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def invalidate_reference_data() -> None:
+    bump_version(VERSION_NAME)
+
+
+def _load(version: int) -> dict:
+    from .serializers import AppointmentTypeSerializer, GovernorateSerializer
+
+    governorates = list(Governorate.objects.all().order_by("name"))
+    types = list(AppointmentType.objects.all().order_by("type_name"))
+
+    overrides = {
+        (doctor_id, type_id): int(minutes)
+        for doctor_id, type_id, minutes in DoctorAppointmentType.objects.values_list(
+            "doctor_id", "appointment_type_id", "duration_minutes"
+        )
+    }
+
+    specific = {}
+    for s in DoctorSpecificVisitType.objects.all().order_by("name"):
+        specific.setdefault(s.doctor_id, []).append(
+            {
+                "id": s.id,
+                "name": s.name,
+                "duration_minutes": s.duration_minutes,
+                "description": s.description,
+            }
+        )
+
+    governorates_data = GovernorateSerializer(governorates, many=True).data
+    types_data = AppointmentTypeSerializer(types, many=True).data
+
+    bootstrap_body = JSONRenderer().render(
+        {
+            "version": version,
+            "governorates": governorates_data,
+            "appointment_types": types_data,
+        }
+    )
+
+    return {
+        "version": version,
+        "governorates": governorates_data,
+        "appointment_types": types,
+        "appointment_types_data": types_data,
+        "types_by_id": {t.id: t for t in types},
+        "overrides": overrides,
+        "specific": specific,
+        "bootstrap_body": bootstrap_body,
+        "bootstrap_etag": '"{}"'.format(hashlib.sha1(bootstrap_body).hexdigest()),
+    }
+
+
+def get_snapshot() -> dict:
+    global _snapshot
+
+    version = get_version(VERSION_NAME)
+    snap = _snapshot
+    if snap is not None and snap["version"] == version:
+        return snap
+
+    with _lock:
+        if _snapshot is None or _snapshot["version"] != version:
+            _snapshot = _load(version)
+        return _snapshot
+
+
+# -----------------------------
+# Accessors
+# -----------------------------
+def governorates() -> list:
+    return get_snapshot()["governorates"]
+
+
+def appointment_types() -> list:
+    return get_snapshot()["appointment_types"]
+
+
+def appointment_types_data() -> list:
+    return get_snapshot()["appointment_types_data"]
+
+
+def get_appointment_type(type_id) -> AppointmentType | None:
+    try:
+        return get_snapshot()["types_by_id"].get(int(type_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def doctor_override_minutes(doctor_id: int, type_id: int) -> int | None:
+    return get_snapshot()["overrides"].get((int(doctor_id), int(type_id)))
+
+
+def resolve_duration(doctor_id: int, appt_type: AppointmentType) -> tuple[int, int]:
+    """(default_minutes, duration_minutes) with doctor override > type default."""
+    default_minutes = int(getattr(appt_type, "default_duration_minutes", 15) or 15)
+    override = doctor_override_minutes(doctor_id, appt_type.id)
+    return default_minutes, int(override) if override is not None else default_minutes
+
+
+def doctor_visit_types(doctor_id: int) -> dict:
+    snap = get_snapshot()
+
+    central = []
+    for t in snap["appointment_types"]:
+        default_minutes = int(getattr(t, "default_duration_minutes", 15) or 15)
+        override = snap["overrides"].get((doctor_id, t.id))
+
+        central.append(
+            {
+                "appointment_type_id": t.id,
+                "type_name": t.type_name,
+                "description": t.description,
+                "resolved_duration_minutes": int(override) if override is not None else default_minutes,
+                "default_duration_minutes": default_minutes,
+                "requires_approved_files": bool(getattr(t, "requires_approved_files", False)),
+                "has_doctor_override": override is not None,
+            }
+        )
+
+    return {
+        "doctor_id": doctor_id,
+        "central": central,
+        "specific": list(snap["specific"].get(doctor_id, [])),
+        "specific_booking_enabled": False,
+    }
+
+
+def bootstrap() -> tuple[str, bytes]:
+    """(etag, rendered JSON) of everything the app needs at start."""
+    snap = get_snapshot()
+    return snap["bootstrap_etag"], snap["bootstrap_body"]
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .directory import invalidate_directory
+from .models import (
+    AppointmentType,
+    DoctorAppointmentType,
+    DoctorSpecificVisitType,
+    Governorate,
+    Hospital,
+    Lab,
+)
+from .reference_data import invalidate_reference_data
+
+
+# Version bumps run after commit (invalidate_directory / invalidate_reference_data
+# on_commit): a reader rebuilding in between would otherwise cache the pre-commit
+# rows under the new version.
+
+
+# -----------------------------
+# Directory listings (hospitals / labs) cache invalidation
+# -----------------------------
+@receiver(post_save, sender=Hospital)
+@receiver(post_delete, sender=Hospital)
+def _invalidate_hospitals(sender, instance, **kwargs):
+    invalidate_directory("hospital")
+
+
+@receiver(post_save, sender=Lab)
+@receiver(post_delete, sender=Lab)
+def _invalidate_labs(sender, instance, **kwargs):
+    invalidate_directory("lab")
+
+
+@receiver(post_save, sender=Governorate)
+@receiver(post_delete, sender=Governorate)
+def _invalidate_directories_for_governorate(sender, instance, **kwargs):
+    # listings embed governorate_name
+    invalidate_directory("hospital")
+    invalidate_directory("lab")
+
+
+# -----------------------------
+# Reference data (governorates / appointment types / visit types)
+# -----------------------------
+@receiver(post_save, sender=Governorate)
+@receiver(post_delete, sender=Governorate)
+@receiver(post_save, sender=AppointmentType)
+@receiver(post_delete, sender=AppointmentType)
+@receiver(post_save, sender=DoctorAppointmentType)
+@receiver(post_delete, sender=DoctorAppointmentType)
+@receiver(post_save, sender=DoctorSpecificVisitType)
+@receiver(post_delete, sender=DoctorSpecificVisitType)
+def _invalidate_reference(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_reference_data)
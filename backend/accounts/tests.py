@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import CustomUser, Governorate, Hospital
+
+
+def _client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class ReferenceDataBootstrapTests(TestCase):
+    url = "/api/accounts/reference-data/"
+
+    def setUp(self):
+        cache.clear()
+        Governorate.objects.create(name="Damascus")
+        user = CustomUser.objects.create_user(
+            email="pat@example.com", password="x", username="pat", role="patient", is_active=True
+        )
+        self.client = _client(user)
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.etag = first["ETag"]
+
+    def _get(self, if_none_match):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=if_none_match)
+
+    def test_matching_etags_return_304(self):
+        for header in (self.etag, "W/" + self.etag, f'"stale", {self.etag}', "*"):
+            with self.subTest(header=header):
+                response = self._get(header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], self.etag)
+
+    def test_other_etags_return_200(self):
+        # the second one contains the ETag text but is not a valid list of ETags
+        for header in ('"stale"', self.etag + self.etag):
+            with self.subTest(header=header):
+                response = self._get(header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["governorates"][0]["name"], "Damascus")
+
+    def test_changed_data_gets_a_new_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Governorate.objects.create(name="Aleppo")
+
+        response = self._get(self.etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], self.etag)
+
+
+class HospitalDirectoryTests(TestCase):
+    url = "/api/accounts/hospitals/"
+
+    def setUp(self):
+        cache.clear()
+        self.damascus = Governorate.objects.create(name="Damascus")
+        aleppo = Governorate.objects.create(name="Aleppo")
+        Hospital.objects.create(name="Al Mouwasat", governorate=self.damascus)
+        Hospital.objects.create(name="Aleppo University", governorate=aleppo)
+
+    def test_governorate_filter(self):
+        response = self.client.get(self.url, {"governorate": self.damascus.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([h["name"] for h in response.json()], ["Al Mouwasat"])
+
+    def test_invalid_governorate_returns_400(self):
+        for value in ("abc", "\u00b2", "0", str(2**63), "9" * 40):
+            with self.subTest(value=value):
+                self.assertEqual(self.client.get(self.url, {"governorate": value}).status_code, 400)
@@ -40,10 +40,14 @@ from .views import (
     LabListCreateView,
     LabRetrieveUpdateDestroyView,
 
+    # Nearby
+    NearbyView,
+
     # CurrentUser:
     CurrentUserView,
 
     GovernorateListView,
+    ReferenceDataBootstrapView,
 )
 from .views import (
     PasswordResetRequestView,
@@ -132,6 +136,11 @@ urlpatterns = [
     path("labs/", LabListCreateView.as_view(), name="lab-list-create"),
     path("labs/<int:id>/", LabRetrieveUpdateDestroyView.as_view(), name="lab-detail"),
 
+    # -------------------------------------------------------------------------
+    # Nearby (hospitals / labs / doctors)
+    # -------------------------------------------------------------------------
+    path("nearby/", NearbyView.as_view(), name="nearby"),
+
     # -------------------------------------------------------------------------
     # Activation / Deactivation
     # -------------------------------------------------------------------------
@@ -174,4 +183,5 @@ urlpatterns = [
     ),
     # ...
     path("governorates/", GovernorateListView.as_view(), name="governorate-list"),
+    path("reference-data/", ReferenceDataBootstrapView.as_view(), name="reference-data-bootstrap"),
 ]
@@ -30,6 +30,11 @@ from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
 from .permissions import IsOwnerOrAdmin, IsDoctorOwnerOrAdmin
+from .geo import DEFAULT_MAX_KM, grid_cell, nearest
+from .directory import CachedDirectoryListMixin
+from . import reference_data
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.db import IntegrityError, transaction
 
@@ -285,9 +290,10 @@ def reject_account_deletion_request(request, pk):
 
 
 # HOSPITAL CRUD
-class HospitalListCreateView(generics.ListCreateAPIView):
-    queryset = Hospital.objects.all()
+class HospitalListCreateView(CachedDirectoryListMixin, generics.ListCreateAPIView):
+    queryset = Hospital.objects.select_related("governorate").all()
     serializer_class = HospitalSerializer
+    directory_name = "hospital"
 
     def get_permissions(self):
         if self.request.method in ("GET", "HEAD", "OPTIONS"):
@@ -306,9 +312,10 @@ class HospitalRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # LAB CRUD
-class LabListCreateView(generics.ListCreateAPIView):
-    queryset = Lab.objects.all()
+class LabListCreateView(CachedDirectoryListMixin, generics.ListCreateAPIView):
+    queryset = Lab.objects.select_related("governorate").all()
     serializer_class = LabSerializer
+    directory_name = "lab"
 
     def get_permissions(self):
         if self.request.method in ("GET", "HEAD", "OPTIONS"):
@@ -327,6 +334,101 @@ class LabRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         return [IsAdminUser()]
 
 
+# NEARBY (hospitals / labs / doctors)
+class NearbyView(APIView):
+    """
+    endpoint: GET /api/accounts/nearby/?kind=hospital|lab|doctor&lat=..&lon=..&limit=10&max_km=100
+    يعيد أقرب N عنصر مع المسافة بالكيلومتر.
+    إذا لم تُرسل الإحداثيات نستخدم إحداثيات المستخدم الحالي (إن وجدت).
+    """
+    permission_classes = [AllowAny]
+
+    KINDS = ("hospital", "lab", "doctor")
+
+    def get(self, request):
+        kind = (request.query_params.get("kind") or "").strip().lower()
+        if kind not in self.KINDS:
+            return Response(
+                {"detail": "Invalid kind. Use hospital, lab or doctor."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if kind == "doctor" and not request.user.is_authenticated:
+            return Response(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        raw_lat = (request.query_params.get("lat") or "").strip()
+        raw_lon = (request.query_params.get("lon") or "").strip()
+        try:
+            if raw_lat or raw_lon:
+                lat, lon = float(raw_lat), float(raw_lon)
+            else:
+                lat = float(getattr(request.user, "latitude", None))
+                lon = float(getattr(request.user, "longitude", None))
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": "lat and lon are required (or set your location in your profile)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if grid_cell(lat, lon) is None:
+            return Response(
+                {"detail": "Invalid coordinates."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit") or 10), 50))
+            max_km = float(request.query_params.get("max_km") or 100)
+        except ValueError:
+            return Response(
+                {"detail": "Invalid limit or max_km."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_km = max(1.0, min(max_km, DEFAULT_MAX_KM))
+
+        if kind == "hospital":
+            qs = Hospital.objects.select_related("governorate")
+        elif kind == "lab":
+            qs = Lab.objects.select_related("governorate")
+        else:
+            qs = User.objects.filter(role="doctor", is_active=True).select_related("governorate")
+
+        found = nearest(qs, lat, lon, limit=limit, max_km=max_km)
+
+        if kind == "doctor":
+            specialties = dict(
+                DoctorDetails.objects.filter(user_id__in=[d.id for d, _ in found])
+                .values_list("user_id", "specialty")
+            )
+            results = [
+                {
+                    "id": d.id,
+                    "username": d.username,
+                    "governorate_id": d.governorate_id,
+                    "governorate_name": getattr(d.governorate, "name", None),
+                    "specialty": specialties.get(d.id),
+                    "distance_km": round(km, 2),
+                }
+                for d, km in found
+            ]
+        else:
+            serializer_class = HospitalSerializer if kind == "hospital" else LabSerializer
+            results = [
+                {**serializer_class(obj).data, "distance_km": round(km, 2)}
+                for obj, km in found
+            ]
+
+        return Response(
+            {
+                "kind": kind,
+                "origin": {"latitude": lat, "longitude": lon},
+                "results": results,
+            }
+        )
+
+
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
 def activate_user(request, pk):
@@ -568,6 +670,10 @@ class AppointmentTypeListCreateView(generics.ListCreateAPIView):
         context["request"] = self.request
         return context
 
+    def list(self, request, *args, **kwargs):
+        # reference data snapshot (invalidated by signals on write)
+        return Response(reference_data.appointment_types_data())
+
 
 class AppointmentTypeRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = AppointmentType.objects.all()
@@ -699,10 +805,36 @@ class AppointmentTypeReadOnlyListView(ListAPIView):
     serializer_class = AppointmentTypeSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        return Response(reference_data.appointment_types_data())
+
 
 class GovernorateListView(generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = GovernorateSerializer
 
     def get_queryset(self):
-        return Governorate.objects.all().order_by("name")
\ No newline at end of file
+        return Governorate.objects.all().order_by("name")
+
+    def list(self, request, *args, **kwargs):
+        return Response(reference_data.governorates())
+
+
+class ReferenceDataBootstrapView(APIView):
+    """
+    endpoint: GET /api/accounts/reference-data/
+    كل البيانات المرجعية (المحافظات + أنواع المواعيد) في استجابة واحدة عند بدء التطبيق.
+    يدعم ETag / If-None-Match (304 إذا لم يتغير شيء).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        etag, body = reference_data.bootstrap()
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type="application/json")
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
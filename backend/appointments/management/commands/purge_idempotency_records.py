@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records (run periodically, e.g. hourly)."
+
+    def handle(self, *args, **options):
+        count = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Expired idempotency records removed: {count}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.caching import bump_version
+from appointments.services.doctor_search import rebuild_all
+from appointments.services.scheduling import DOCTOR_SEARCH_VERSION
+
+
+class Command(BaseCommand):
+    help = "Rebuild DoctorSearchEntry rows (and the FTS5 index on SQLite) for all doctors."
+
+    def handle(self, *args, **options):
+        count = rebuild_all()
+        bump_version(DOCTOR_SEARCH_VERSION)
+        self.stdout.write(self.style.SUCCESS(f"Doctor search index rebuilt: {count} doctors"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.next_free_slot import sweep
+
+
+class Command(BaseCommand):
+    help = "Recompute stale DoctorNextFreeSlot rows (run periodically, e.g. every 15 minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every active doctor (e.g. after adding an appointment type).",
+        )
+
+    def handle(self, *args, **options):
+        count = sweep(refresh_all=options["all"])
+        self.stdout.write(self.style.SUCCESS(f"Next free slots refreshed: {count} doctors"))
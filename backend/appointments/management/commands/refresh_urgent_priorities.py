@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.urgent_queue import refresh_priorities
+
+
+class Command(BaseCommand):
+    help = "Re-age open urgent requests' effective_priority (run periodically, e.g. every 15 minutes)."
+
+    def handle(self, *args, **options):
+        count = refresh_priorities()
+        self.stdout.write(self.style.SUCCESS(f"Urgent request priorities refreshed: {count}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from appointments.services.rebooking_tokens import SWEEP_BATCH_SIZE, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Deactivate expired rebooking priority tokens in batches (run periodically, e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        count = sweep_expired(batch_size=max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Expired rebooking tokens deactivated: {count}"))
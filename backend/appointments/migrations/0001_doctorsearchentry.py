@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0023_patientdetails_activity_level_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorSearchEntry',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('is_active', models.BooleanField(default=True)),
+                ('name_text', models.CharField(blank=True, max_length=255)),
+                ('specialty_text', models.CharField(blank=True, max_length=255)),
+                ('governorate_text', models.CharField(blank=True, max_length=255)),
+                ('search_text', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('governorate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.governorate')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_active', 'governorate'], name='doc_search_active_gov_idx')],
+            },
+        ),
+    ]
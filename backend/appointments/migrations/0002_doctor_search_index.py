@@ -0,0 +1,168 @@
+import re
+
+from django.db import migrations
+
+
+FTS_TABLE = "appointments_doctorsearch_fts"
+ENTRY_TABLE = "appointments_doctorsearchentry"
+
+# External-content FTS5 table: the text lives in DoctorSearchEntry, triggers keep the index in sync.
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name_text, specialty_text, governorate_text,
+        content='{ENTRY_TABLE}', content_rowid='doctor_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name_text, specialty_text, governorate_text)
+        VALUES (new.doctor_id, new.name_text, new.specialty_text, new.governorate_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name_text, specialty_text, governorate_text)
+        VALUES ('delete', old.doctor_id, old.name_text, old.specialty_text, old.governorate_text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name_text, specialty_text, governorate_text)
+        VALUES ('delete', old.doctor_id, old.name_text, old.specialty_text, old.governorate_text);
+        INSERT INTO {FTS_TABLE}(rowid, name_text, specialty_text, governorate_text)
+        VALUES (new.doctor_id, new.name_text, new.specialty_text, new.governorate_text);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS doc_search_text_trgm_idx ON {ENTRY_TABLE} USING gin (search_text gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS doc_search_text_trgm_idx",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        # SQLite builds without FTS5 -> skip; search falls back to plain contains
+        try:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+                enabled = bool(cursor.fetchone()[0])
+        except Exception:
+            enabled = False
+        if enabled:
+            _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_BACKWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_BACKWARD)
+
+
+# Frozen copy of the normalization in appointments/services/doctor_search.py as of this
+# migration: later changes to the live helpers must not change what it backfilled.
+_TASHKEEL_RE = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+_CHAR_MAP = str.maketrans(
+    {
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ى": "ي",
+        "ئ": "ي",
+        "ؤ": "و",
+        "ة": "ه",
+        "٠": "0",
+        "١": "1",
+        "٢": "2",
+        "٣": "3",
+        "٤": "4",
+        "٥": "5",
+        "٦": "6",
+        "٧": "7",
+        "٨": "8",
+        "٩": "9",
+    }
+)
+
+
+def _normalize(text):
+    if not text:
+        return ""
+    text = _TASHKEEL_RE.sub("", str(text))
+    text = text.translate(_CHAR_MAP).lower()
+    text = _NON_WORD_RE.sub(" ", text).replace("_", " ")
+    return " ".join(text.split())
+
+
+def _index_text(text):
+    tokens = _normalize(text).split()
+    out = list(tokens)
+    for t in tokens:
+        if t.startswith("ال") and len(t) > 4:
+            out.append(t[2:])
+    return " ".join(out)
+
+
+def backfill(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    DoctorDetails = apps.get_model("accounts", "DoctorDetails")
+    DoctorSearchEntry = apps.get_model("appointments", "DoctorSearchEntry")
+
+    specialties = dict(DoctorDetails.objects.values_list("user_id", "specialty"))
+
+    rows = []
+    for user in CustomUser.objects.filter(role="doctor").select_related("governorate"):
+        name_text = _index_text(user.username)
+        specialty_text = _index_text(specialties.get(user.id))
+        governorate_text = _index_text(getattr(user.governorate, "name", None))
+        rows.append(
+            DoctorSearchEntry(
+                doctor_id=user.id,
+                governorate_id=user.governorate_id,
+                is_active=bool(user.is_active),
+                name_text=name_text,
+                specialty_text=specialty_text,
+                governorate_text=governorate_text,
+                search_text=" ".join(p for p in (name_text, specialty_text, governorate_text) if p),
+            )
+        )
+
+    DoctorSearchEntry.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0001_doctorsearchentry"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
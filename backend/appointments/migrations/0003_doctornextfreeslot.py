@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_geo_cell'),
+        ('appointments', '0002_doctor_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorNextFreeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_free_slot_at', models.DateTimeField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField()),
+                ('appointment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.appointmenttype')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='next_free_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['appointment_type', 'next_free_slot_at'], name='next_free_slot_type_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'appointment_type'), name='uniq_next_free_slot_doctor_type')],
+            },
+        ),
+    ]
@@ -1,3 +1,119 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+# -----------------------------
+# Doctor search index (denormalized, Arabic-normalized text)
+# -----------------------------
+class DoctorSearchEntry(models.Model):
+    """
+    One row per doctor, rebuilt by signals (appointments/signals.py).
+    SQLite: mirrored into an FTS5 table by triggers (see migration 0002).
+    Postgres: search_text carries a pg_trgm GIN index (migration 0002).
+    """
+
+    doctor = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_entry",
+    )
+    governorate = models.ForeignKey(
+        "accounts.Governorate",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    is_active = models.BooleanField(default=True)
+
+    name_text = models.CharField(max_length=255, blank=True)
+    specialty_text = models.CharField(max_length=255, blank=True)
+    governorate_text = models.CharField(max_length=255, blank=True)
+    search_text = models.TextField(blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["is_active", "governorate"], name="doc_search_active_gov_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"DoctorSearchEntry #{self.doctor_id}"
+
+
+# -----------------------------
+# Materialized earliest free slot (per doctor + appointment type)
+# -----------------------------
+class DoctorNextFreeSlot(models.Model):
+    """
+    Earliest bookable slot within the look-ahead horizon (null = none found).
+    Recomputed on schedule changes (signals) and by the refresh_next_free_slots sweep.
+    """
+
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="next_free_slots",
+    )
+    appointment_type = models.ForeignKey(
+        "accounts.AppointmentType",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    next_free_slot_at = models.DateTimeField(null=True, blank=True)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doctor", "appointment_type"],
+                name="uniq_next_free_slot_doctor_type",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["appointment_type", "next_free_slot_at"],
+                name="next_free_slot_type_at_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"NextFreeSlot(doctor={self.doctor_id}, type={self.appointment_type_id})"
+
+
+# -----------------------------
+# Idempotency-Key records (booking / urgent-request POSTs)
+# -----------------------------
+class IdempotencyRecord(models.Model):
+    """
+    Stored 2xx response of a POST made with an Idempotency-Key header, replayed
+    for retries of the same request until expires_at (appointments/services/idempotency.py).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    scope = models.CharField(max_length=32)
+    key = models.CharField(max_length=128)
+    fingerprint = models.CharField(max_length=64)  # sha256 of path + canonical body
+
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "scope", "key"],
+                name="uniq_idempotency_user_scope_key",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"IdempotencyRecord({self.scope}:{self.key})"
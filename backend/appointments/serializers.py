@@ -5,9 +5,7 @@ from rest_framework import serializers
 
 from accounts.models import (
     Appointment,
-    AppointmentType,
     DoctorAvailability,
-    DoctorAppointmentType,
     CustomUser,
     DoctorAbsence,
     TriageAssessment,
@@ -16,7 +14,10 @@ from accounts.models import (
 )
 
 from clinical.models import ClinicalOrder, MedicalRecordFile
+from accounts.reference_data import get_appointment_type, resolve_duration
 from accounts.triage import compute_triage_score
+from .services import rebooking_tokens
+from .services.slot_holds import held_intervals, overlaps_hold
 
 
 class TriageInputSerializer(serializers.Serializer):
@@ -75,9 +76,8 @@ class UrgentRequestCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError({"doctor_id": "Doctor not found."})
 
         appointment_type_id = attrs["appointment_type_id"]
-        try:
-            appt_type = AppointmentType.objects.get(id=appointment_type_id)
-        except AppointmentType.DoesNotExist:
+        appt_type = get_appointment_type(appointment_type_id)
+        if appt_type is None:
             raise serializers.ValidationError({"appointment_type_id": "AppointmentType not found."})
 
         attrs["doctor_obj"] = doctor
@@ -162,6 +162,42 @@ class UrgentRequestReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class UrgentRequestInboxSerializer(serializers.Serializer):
+    """
+    Doctor's inbox rows (urgent_queue.inbox_page values() dicts): same keys as
+    UrgentRequestReadSerializer + effective_priority, without model instances.
+    doctor_name comes from context["doctor_name"] (always the requesting doctor).
+    """
+    id = serializers.IntegerField()
+    patient = serializers.IntegerField(source="patient_id")
+    patient_name = serializers.CharField()
+    doctor = serializers.IntegerField(source="doctor_id")
+    doctor_name = serializers.SerializerMethodField()
+    appointment_type = serializers.IntegerField(source="appointment_type_id")
+    appointment_type_name = serializers.CharField()
+    symptoms_text = serializers.CharField(allow_null=True)
+    temperature_c = serializers.DecimalField(max_digits=4, decimal_places=1, allow_null=True)
+    bp_systolic = serializers.IntegerField(allow_null=True)
+    bp_diastolic = serializers.IntegerField(allow_null=True)
+    heart_rate = serializers.IntegerField(allow_null=True)
+    score = serializers.IntegerField(allow_null=True)
+    confidence = serializers.IntegerField(allow_null=True)
+    missing_fields = serializers.JSONField()
+    score_version = serializers.CharField(allow_null=True)
+    effective_priority = serializers.FloatField()
+    notes = serializers.CharField(allow_null=True)
+    status = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    handled_at = serializers.DateTimeField(allow_null=True)
+    handled_by = serializers.IntegerField(source="handled_by_id", allow_null=True)
+    rejected_reason = serializers.CharField(allow_null=True)
+    handled_type = serializers.CharField(allow_null=True)
+    scheduled_appointment_id = serializers.IntegerField(allow_null=True)
+
+    def get_doctor_name(self, row):
+        return self.context.get("doctor_name")
+
+
 class UrgentRequestRejectSerializer(serializers.Serializer):
     reason = serializers.CharField(required=False, allow_blank=True, allow_null=True)
 
@@ -224,13 +260,7 @@ class UrgentRequestScheduleSerializer(serializers.Serializer):
         appt_type = urgent.appointment_type
 
         # Resolve duration (doctor override > default)
-        dat = DoctorAppointmentType.objects.filter(
-            doctor_id=doctor.id,
-            appointment_type_id=appt_type.id,
-        ).first()
-
-        default_minutes = int(getattr(appt_type, "default_duration_minutes", 15) or 15)
-        duration_minutes = int(dat.duration_minutes) if dat else default_minutes
+        default_minutes, duration_minutes = resolve_duration(doctor.id, appt_type)
         if duration_minutes <= 0:
             raise serializers.ValidationError({"detail": "Invalid duration."})
 
@@ -296,7 +326,11 @@ class UrgentRequestScheduleSerializer(serializers.Serializer):
         return attrs
 
 
-class AppointmentCreateSerializer(serializers.Serializer):
+class BookingSlotValidationMixin(serializers.Serializer):
+    """
+    Booking input + validation (availability, absences, overlaps, other holds),
+    shared by AppointmentCreateSerializer and SlotHoldCreateSerializer.
+    """
     doctor_id = serializers.IntegerField()
     appointment_type_id = serializers.IntegerField()  # REQUIRED (central only)
     date_time = serializers.DateTimeField()
@@ -346,20 +380,11 @@ class AppointmentCreateSerializer(serializers.Serializer):
 
         # 5) Resolve AppointmentType + duration (Doctor override > default 15)
         appointment_type_id = attrs["appointment_type_id"]
-        try:
-            appt_type = AppointmentType.objects.get(id=appointment_type_id)
-        except AppointmentType.DoesNotExist:
+        appt_type = get_appointment_type(appointment_type_id)
+        if appt_type is None:
             raise serializers.ValidationError({"appointment_type_id": "AppointmentType not found."})
 
-        dat = DoctorAppointmentType.objects.filter(
-            doctor=doctor,
-            appointment_type=appt_type,
-        ).first()
-
-        if dat:
-            duration_minutes = dat.duration_minutes
-        else:
-            duration_minutes = getattr(appt_type, "default_duration_minutes", None)
+        _, duration_minutes = resolve_duration(doctor.id, appt_type)
 
         if not duration_minutes or int(duration_minutes) <= 0:
             raise serializers.ValidationError({"detail": "Invalid duration."})
@@ -434,6 +459,12 @@ class AppointmentCreateSerializer(serializers.Serializer):
             if ap_start < end_dt and start_dt < ap_end:
                 raise serializers.ValidationError({"detail": "This time slot is already booked."})
 
+        # 7.5) Short-lived holds placed by other patients (cache only)
+        held = held_intervals(doctor.id, exclude_patient_id=patient.id)
+        if overlaps_hold(start_dt, end_dt, held):
+            raise serializers.ValidationError(
+                {"detail": "This time slot is temporarily held by another patient."}
+            )
 
         # 8) Follow-up gate (requires approved files)
         # NEW policy: allow booking (pending) if there are open orders,
@@ -455,6 +486,8 @@ class AppointmentCreateSerializer(serializers.Serializer):
         attrs["duration_minutes"] = duration_minutes
         return attrs
 
+
+class AppointmentCreateSerializer(BookingSlotValidationMixin):
     def create(self, validated_data):
         patient = self.context["request"].user
         doctor = validated_data["doctor_obj"]
@@ -476,19 +509,22 @@ class AppointmentCreateSerializer(serializers.Serializer):
         # ---------------------------------------------
         # Consume rebooking priority token (one-time use)
         # If the patient has an active token for this doctor, consume the oldest valid one.
+        # (cached lookup first: no token -> no locking query)
         # ---------------------------------------------
         now = timezone.now()
-        tok = (
-            RebookingPriorityToken.objects.select_for_update()
-            .filter(
-                patient_id=patient.id,
-                doctor_id=doctor.id,
-                is_active=True,
-                expires_at__gt=now,
+        tok = None
+        if rebooking_tokens.active_expiry(patient.id, doctor.id, now) is not None:
+            tok = (
+                RebookingPriorityToken.objects.select_for_update()
+                .filter(
+                    patient_id=patient.id,
+                    doctor_id=doctor.id,
+                    is_active=True,
+                    expires_at__gt=now,
+                )
+                .order_by("issued_at")
+                .first()
             )
-            .order_by("issued_at")
-            .first()
-        )
 
         if tok is not None:
             tok.is_active = False
@@ -524,6 +560,26 @@ class AppointmentCreateSerializer(serializers.Serializer):
 
 
 
+class SlotHoldCreateSerializer(BookingSlotValidationMixin):
+    """
+    Same validation as booking, but nothing is written to the DB:
+    the view only calls is_valid() and places a cache hold.
+    """
+
+
+class SlotHoldReleaseSerializer(serializers.Serializer):
+    doctor_id = serializers.IntegerField()
+    date_time = serializers.DateTimeField()
+
+    def validate(self, attrs):
+        tz = timezone.get_current_timezone()
+        start_dt = attrs["date_time"]
+        if timezone.is_naive(start_dt):
+            start_dt = timezone.make_aware(start_dt, tz)
+        attrs["date_time"] = start_dt.astimezone(tz)
+        return attrs
+
+
 class DoctorSlotsQuerySerializer(serializers.Serializer):
     date = serializers.DateField()
     appointment_type_id = serializers.IntegerField(min_value=1)
@@ -0,0 +1,282 @@
+"""
+In-process specialty / doctor-name autocomplete (no DB on the lookup path).
+
+- Built from DoctorDetails.specialty + CustomUser.username (active doctors only)
+  when a server process starts (warm(), called from medical_app/wsgi.py / asgi.py),
+  so no request pays for it; other processes build on first use. Each entry keeps
+  the number of doctors behind it.
+- Writes (signals) append the doctor's new state to a delta log in the shared
+  cache and bump a version stamp. Every process notices the new version on its
+  next lookup (checked at most once per second) and replays only the missing
+  deltas; if the log has a gap (evicted / truncated) it rebuilds from scratch.
+- Each trie node caches its top suggestions; a change clears the cache only
+  along the paths of the entries it touched.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from accounts.models import CustomUser, DoctorDetails
+
+from .caching import bump_version, get_version
+from .doctor_search import _strip_article, normalize_search_text
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_NAME = "doctor_autocomplete"
+DELTA_LOG_KEY = "doctor_autocomplete:delta"
+DELTA_LOG_MAX = 500
+DELTA_LOG_TTL_SECONDS = 24 * 60 * 60
+
+VERSION_CHECK_INTERVAL_SECONDS = 1.0
+
+TOP_CACHE_SIZE = 20
+
+KIND_SPECIALTY = "specialty"
+KIND_NAME = "name"
+
+
+# -----------------------------
+# Trie
+# -----------------------------
+class _Node:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()
+        self.top = None
+
+
+class _Entry:
+    __slots__ = ("kind", "key", "labels")
+
+    def __init__(self, kind: str, key: str):
+        self.kind = kind
+        self.key = key
+        self.labels = Counter()
+
+    @property
+    def count(self) -> int:
+        return sum(self.labels.values())
+
+    @property
+    def label(self) -> str:
+        return self.labels.most_common(1)[0][0]
+
+
+def _index_paths(key: str) -> set[str]:
+    """Every word suffix of key, with and without the Arabic article."""
+    tokens = key.split()
+    paths = set()
+    for i in range(len(tokens)):
+        rest = tokens[i:]
+        paths.add(" ".join(rest))
+        stripped = _strip_article(rest[0])
+        if stripped != rest[0]:
+            paths.add(" ".join([stripped] + rest[1:]))
+    return paths
+
+
+class SuggestionTrie:
+    def __init__(self):
+        self.root = _Node()
+        self.entries = {}
+
+    def _walk(self, path: str, create: bool = False):
+        node = self.root
+        for ch in path:
+            nxt = node.children.get(ch)
+            if nxt is None:
+                if not create:
+                    return None
+                nxt = node.children[ch] = _Node()
+            node = nxt
+        return node
+
+    def _touch(self, entry: _Entry) -> None:
+        # Drop cached top lists on every prefix of every path of this entry
+        for path in _index_paths(entry.key):
+            node = self.root
+            node.top = None
+            for ch in path:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                node.top = None
+
+    def add(self, kind: str, label: str) -> None:
+        key = normalize_search_text(label)
+        if not key:
+            return
+        entry = self.entries.get((kind, key))
+        if entry is None:
+            entry = self.entries[(kind, key)] = _Entry(kind, key)
+            for path in _index_paths(key):
+                self._walk(path, create=True).entries.add((kind, key))
+        entry.labels[label.strip()] += 1
+        self._touch(entry)
+
+    def remove(self, kind: str, label: str) -> None:
+        key = normalize_search_text(label)
+        entry = self.entries.get((kind, key))
+        if entry is None:
+            return
+        label = label.strip()
+        entry.labels[label] -= 1
+        if entry.labels[label] <= 0:
+            del entry.labels[label]
+        self._touch(entry)
+        if not entry.labels:
+            for path in _index_paths(key):
+                node = self._walk(path)
+                if node is not None:
+                    node.entries.discard((kind, key))
+            del self.entries[(kind, key)]
+
+    def _collect(self, node: _Node) -> list:
+        found = set()
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            found.update(n.entries)
+            stack.extend(n.children.values())
+        ranked = [self.entries[k] for k in found]
+        ranked.sort(key=lambda e: (-e.count, e.kind != KIND_SPECIALTY, e.key))
+        return [
+            {"kind": e.kind, "label": e.label, "doctor_count": e.count}
+            for e in ranked[:TOP_CACHE_SIZE]
+        ]
+
+    def lookup(self, prefix: str, limit: int = 10) -> list:
+        node = self._walk(normalize_search_text(prefix))
+        if node is None:
+            return []
+        if node.top is None:
+            node.top = self._collect(node)
+        return node.top[:limit]
+
+
+# -----------------------------
+# Per-process state
+# -----------------------------
+_lock = threading.Lock()
+_trie = None
+_version = None
+_contrib = {}  # doctor_id -> (username, specialty) currently counted
+_last_check = 0.0
+
+
+def _apply(trie: SuggestionTrie, contrib: dict, doctor_id: int, state) -> None:
+    """Replace a doctor's contribution with state (None = not listed)."""
+    old = contrib.pop(doctor_id, None)
+    if old is not None:
+        trie.remove(KIND_NAME, old[0])
+        if old[1]:
+            trie.remove(KIND_SPECIALTY, old[1])
+    if state is not None:
+        trie.add(KIND_NAME, state[0])
+        if state[1]:
+            trie.add(KIND_SPECIALTY, state[1])
+        contrib[doctor_id] = state
+
+
+def _full_build():
+    global _trie, _version, _contrib
+
+    version = get_version(VERSION_NAME)
+
+    specialties = dict(DoctorDetails.objects.values_list("user_id", "specialty"))
+    trie = SuggestionTrie()
+    contrib = {}
+    for doctor_id, username in CustomUser.objects.filter(
+        role="doctor", is_active=True
+    ).values_list("id", "username"):
+        _apply(trie, contrib, doctor_id, (username or "", specialties.get(doctor_id) or ""))
+
+    _trie, _version, _contrib = trie, version, contrib
+
+
+def _refresh_if_needed():
+    global _version, _last_check
+
+    now = time.monotonic()
+    if _trie is not None and now - _last_check < VERSION_CHECK_INTERVAL_SECONDS:
+        return
+    _last_check = now
+
+    current = get_version(VERSION_NAME)
+    if _trie is not None and current == _version:
+        return
+
+    if _trie is None or current < _version or current - _version > DELTA_LOG_MAX:
+        _full_build()
+        return
+
+    log = {seq: (doctor_id, state) for seq, doctor_id, state in (cache.get(DELTA_LOG_KEY) or [])}
+    missing = [seq for seq in range(_version + 1, current + 1) if seq not in log]
+    if missing:
+        _full_build()
+        return
+
+    for seq in range(_version + 1, current + 1):
+        doctor_id, state = log[seq]
+        _apply(_trie, _contrib, doctor_id, state)
+    _version = current
+
+
+def warm() -> None:
+    """Build the index now (server start); a failure leaves it to the first lookup."""
+    global _last_check
+    with _lock:
+        if _trie is not None:
+            return
+        try:
+            _full_build()
+        except DatabaseError:
+            logger.warning("Doctor autocomplete warm-up failed; building on first use.", exc_info=True)
+            return
+        _last_check = time.monotonic()
+
+
+def suggest(prefix: str, limit: int = 10) -> list:
+    """[{kind, label, doctor_count}] for specialties / doctor names starting with prefix."""
+    with _lock:
+        _refresh_if_needed()
+        return _trie.lookup(prefix, limit)
+
+
+# -----------------------------
+# Write side (signals)
+# -----------------------------
+def _publish_doctor_state(doctor_id: int) -> None:
+    row = (
+        CustomUser.objects.filter(id=doctor_id, role="doctor", is_active=True)
+        .values_list("username", flat=True)
+        .first()
+    )
+    state = None
+    if row is not None:
+        specialty = (
+            DoctorDetails.objects.filter(user_id=doctor_id)
+            .values_list("specialty", flat=True)
+            .first()
+        )
+        state = (row or "", specialty or "")
+
+    seq = bump_version(VERSION_NAME)
+    log = cache.get(DELTA_LOG_KEY) or []
+    log.append((seq, doctor_id, state))
+    cache.set(DELTA_LOG_KEY, log[-DELTA_LOG_MAX:], DELTA_LOG_TTL_SECONDS)
+
+
+def record_doctor_change(doctor_id: int) -> None:
+    """Publish a doctor's committed autocomplete state to all processes."""
+    transaction.on_commit(lambda: _publish_doctor_state(doctor_id))
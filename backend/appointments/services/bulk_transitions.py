@@ -0,0 +1,218 @@
+"""
+Bulk confirm / cancel of appointments (doctor's day setup in one request).
+
+Same rules and per-item outcomes as confirm_appointment / cancel_appointment, applied
+set-wise inside one transaction:
+- one SELECT (FOR UPDATE) for all rows + their patients / doctors / types
+- confirm: one query for the follow-up gate (ClinicalOrder.files_state) of every pair
+- cancel:  one query each for recorded orders / prescriptions
+- one UPDATE for all accepted rows, one bulk_create for the outbox events
+
+QuerySet.update() skips post_save, so the schedule caches of every touched doctor are
+refreshed explicitly (appointments/signals.py); cancelled slots go to the urgent matcher
+and the doctor-patient links of cancelled pairs are recounted (clinical/links.py).
+"""
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Appointment
+from clinical.links import refresh_link
+from clinical.models import ClinicalOrder, OutboxEvent, Prescription
+from notifications.services.outbox_payload import build_outbox_event
+
+from ..signals import schedule_doctor_refresh
+from . import urgent_matcher
+
+
+ACTIONS = ("confirm", "cancel")
+MAX_BULK_IDS = 200
+
+_NOT_FOUND = {"status_code": 404, "detail": "Not found."}
+
+
+def parse_ids(raw) -> list[int]:
+    """Distinct ids in request order; ValueError if not a list of integers."""
+    if not isinstance(raw, (list, tuple)):
+        raise ValueError("ids must be a list.")
+    ids = []
+    seen = set()
+    for value in raw:
+        if isinstance(value, str) and value.strip().isdecimal():
+            value = int(value)
+        elif isinstance(value, bool) or not isinstance(value, int):
+            # no silent truncation: 1.7 is not appointment 1
+            raise ValueError("ids must be integers.")
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    return ids
+
+
+def _confirm_outcome(appointment, blocking_by_pair) -> dict | None:
+    """Item result, or None when the row should be confirmed."""
+    if appointment.status in ("cancelled", "no_show"):
+        return {"status_code": 400, "detail": "This appointment cannot be confirmed."}
+    if appointment.status == "confirmed":
+        return {"status_code": 200, "status": appointment.status, "version": appointment.version}
+    if appointment.status != "pending":
+        return {"status_code": 400, "detail": "Only pending appointments can be confirmed."}
+
+    if getattr(appointment.appointment_type, "requires_approved_files", False):
+        blocking = blocking_by_pair.get((appointment.doctor_id, appointment.patient_id))
+        if blocking is not None:
+            if blocking["files_state"] == ClinicalOrder.FilesState.NO_FILES:
+                detail = "Cannot confirm follow-up: missing required files."
+            else:
+                detail = "Cannot confirm follow-up: some files are not approved yet."
+            return {"status_code": 409, "detail": detail, "order_id": blocking["id"]}
+    return None
+
+
+def _cancel_outcome(appointment, with_clinical_actions) -> dict | None:
+    if appointment.status == "no_show":
+        return {"status_code": 400, "detail": "no_show appointments cannot be cancelled."}
+    if appointment.status == "cancelled":
+        return {"status_code": 200, "status": appointment.status, "version": appointment.version}
+    if appointment.id in with_clinical_actions:
+        return {"status_code": 409, "detail": "Cannot cancel appointment after clinical actions were recorded."}
+    return None
+
+
+def _blocking_by_pair(appointments) -> dict:
+    """{(doctor_id, patient_id): first open order not ready} for follow-up rows, one query."""
+    pairs = {
+        (a.doctor_id, a.patient_id)
+        for a in appointments
+        if a.status == "pending" and getattr(a.appointment_type, "requires_approved_files", False)
+    }
+    if not pairs:
+        return {}
+
+    rows = (
+        ClinicalOrder.objects.filter(
+            doctor_id__in={d for d, _ in pairs},
+            patient_id__in={p for _, p in pairs},
+            status=ClinicalOrder.Status.OPEN,
+        )
+        .exclude(files_state=ClinicalOrder.FilesState.APPROVED)
+        .order_by("id")
+        .values("id", "doctor_id", "patient_id", "files_state")
+    )
+    blocking = {}
+    for row in rows:
+        pair = (row["doctor_id"], row["patient_id"])
+        if pair in pairs:
+            blocking.setdefault(pair, row)
+    return blocking
+
+
+def _with_clinical_actions(appointment_ids) -> set[int]:
+    if not appointment_ids:
+        return set()
+    ids = set(
+        ClinicalOrder.objects.filter(appointment_id__in=appointment_ids).values_list("appointment_id", flat=True)
+    )
+    ids.update(
+        Prescription.objects.filter(appointment_id__in=appointment_ids).values_list("appointment_id", flat=True)
+    )
+    return ids
+
+
+def _event(action: str, *, actor, recipient, appointment, new_status: str) -> OutboxEvent:
+    payload = {
+        "appointment_id": appointment.id,
+        "status": new_status,
+        "patient_id": appointment.patient_id,
+        "doctor_id": appointment.doctor_id,
+        "date_time": appointment.date_time.isoformat() if appointment.date_time else None,
+    }
+    if action == "confirm":
+        event_type = "appointment_confirmed"
+        payload.update({"title": "تم تأكيد الموعد", "message": "تم تأكيد موعدك."})
+    else:
+        event_type = "appointment_cancelled"
+        payload.update(
+            {
+                "cancelled_by_role": getattr(actor, "role", None),
+                "title": "تم إلغاء الموعد",
+                "message": "تم إلغاء الموعد.",
+            }
+        )
+    return build_outbox_event(
+        event_type=event_type,
+        actor=actor,
+        recipient=recipient,
+        obj=appointment,
+        entity_type="appointment",
+        entity_id=appointment.id,
+        route="/app/appointments",
+        payload=payload,
+    )
+
+
+def apply(*, actor, is_admin: bool, action: str, ids: list[int]) -> list[dict]:
+    """Per-id outcomes ({"id", "status_code", "status" | "detail"[, "order_id"]}) in request order."""
+    new_status = "confirmed" if action == "confirm" else "cancelled"
+
+    with transaction.atomic():
+        qs = Appointment.objects.select_for_update().select_related("patient", "doctor", "appointment_type")
+        if not is_admin:
+            # other doctors' rows look missing, as in the single endpoints
+            qs = qs.filter(doctor_id=actor.id)
+        by_id = {a.id: a for a in qs.filter(id__in=ids)}
+        rows = list(by_id.values())
+
+        if action == "confirm":
+            blocking = _blocking_by_pair(rows)
+            decide = lambda a: _confirm_outcome(a, blocking)
+        else:
+            with_actions = _with_clinical_actions([a.id for a in rows if a.status not in ("cancelled", "no_show")])
+            decide = lambda a: _cancel_outcome(a, with_actions)
+
+        results = []
+        accepted = []
+        for appointment_id in ids:
+            appointment = by_id.get(appointment_id)
+            outcome = _NOT_FOUND if appointment is None else decide(appointment)
+            if outcome is None:
+                accepted.append(appointment)
+                outcome = {"status_code": 200, "status": new_status, "version": appointment.version + 1}
+            results.append({"id": appointment_id, **outcome})
+
+        if not accepted:
+            return results
+
+        Appointment.objects.filter(id__in=[a.id for a in accepted]).update(
+            status=new_status,
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+
+        events = []
+        for appointment in accepted:
+            if action == "confirm" or getattr(actor, "role", "") == "doctor":
+                recipients = [appointment.patient]
+            else:
+                recipients = [appointment.patient, appointment.doctor]
+            for recipient in recipients:
+                try:
+                    events.append(
+                        _event(action, actor=actor, recipient=recipient, appointment=appointment, new_status=new_status)
+                    )
+                except Exception:
+                    # fail-safe like create_outbox_event: notifications never block the transition
+                    pass
+        OutboxEvent.objects.bulk_create(events)
+
+        for doctor_id in {a.doctor_id for a in accepted}:
+            schedule_doctor_refresh(doctor_id)
+        if action == "cancel":
+            for appointment in accepted:
+                urgent_matcher.schedule_match(appointment)
+            for doctor_id, patient_id in {(a.doctor_id, a.patient_id) for a in accepted}:
+                refresh_link(doctor_id=doctor_id, patient_id=patient_id)
+
+    return results
@@ -0,0 +1,116 @@
+"""
+Cache helpers shared by the scheduling / search endpoints.
+
+- Version stamps: callers put get_version(...) in their cache keys and call
+  bump_version(...) on writes, so invalidation is O(1) and never needs key scans.
+  Writers inside a transaction use bump_version_on_commit(): bumping before commit
+  lets a concurrent reader cache pre-commit rows under the new version.
+- single_flight(): read-through cache where exactly one worker rebuilds a missing
+  or expiring value (per-key lock in the cache backend); the others wait briefly
+  and reuse its result. Entries are refreshed early with probability growing
+  towards expiry (XFetch), so hot keys are rebuilt before they fall out.
+"""
+from __future__ import annotations
+
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# ---------------------------------------------------------------------------
+# Version stamps
+# ---------------------------------------------------------------------------
+
+def _version_key(name: str) -> str:
+    return f"v:{name}"
+
+
+def get_version(name: str) -> int:
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock: if the stamp is evicted it can never come back
+        # with a value that matches entries built before the eviction.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return int(version or 0)
+
+
+def bump_version(name: str) -> int:
+    key = _version_key(name)
+    try:
+        return int(cache.incr(key))
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+        return int(cache.get(key) or 0)
+
+
+def bump_version_on_commit(name: str) -> None:
+    """bump_version() once the current transaction commits (at once outside one)."""
+    transaction.on_commit(lambda: bump_version(name))
+
+
+# ---------------------------------------------------------------------------
+# Single-flight read-through cache
+# ---------------------------------------------------------------------------
+
+def _lock_key(key: str) -> str:
+    return f"sf-lock:{key}"
+
+
+def _build_and_store(key: str, builder, ttl: int):
+    t0 = time.time()
+    value = builder()
+    delta = max(time.time() - t0, 0.001)
+    cache.set(key, (value, delta, time.time() + ttl), ttl)
+    return value
+
+
+def _build_locked(key: str, builder, ttl: int):
+    try:
+        return _build_and_store(key, builder, ttl)
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def single_flight(
+    key: str,
+    builder,
+    *,
+    ttl: int = 300,
+    lock_ttl: int = 10,
+    wait_timeout: float = 2.0,
+    poll_interval: float = 0.05,
+    beta: float = 1.0,
+):
+    """
+    Return cached value for key, building it with builder() when needed.
+
+    - miss: lock winner builds; others poll up to wait_timeout for its result,
+      then build themselves (the winner may have crashed or be too slow).
+    - hit close to expiry: lock winner rebuilds early; others keep serving the
+      current value, so a hot key never has a cold moment.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at:
+            return value
+        if not cache.add(_lock_key(key), 1, lock_ttl):
+            return value
+        return _build_locked(key, builder, ttl)
+
+    if cache.add(_lock_key(key), 1, lock_ttl):
+        return _build_locked(key, builder, ttl)
+
+    deadline = time.time() + wait_timeout
+    while time.time() < deadline:
+        time.sleep(poll_interval)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    return _build_and_store(key, builder, ttl)
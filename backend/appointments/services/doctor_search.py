@@ -0,0 +1,242 @@
+"""
+Doctor search index: Arabic normalization + ranked prefix search.
+
+- DoctorSearchEntry holds normalized name / specialty / governorate per doctor.
+- SQLite: FTS5 table (appointments_doctorsearch_fts) kept in sync by triggers,
+  queried with prefix tokens and ranked with bm25 (name > specialty > governorate).
+- Postgres: LIKE on search_text backed by a pg_trgm GIN index, ranked by word_similarity.
+- Anything else (or FTS5 missing): plain contains on search_text.
+"""
+from __future__ import annotations
+
+import re
+
+from django.db import DatabaseError, connection
+
+from accounts.models import CustomUser, DoctorDetails
+
+from ..models import DoctorSearchEntry
+
+
+FTS_TABLE = "appointments_doctorsearch_fts"
+
+# bm25 column weights: name_text, specialty_text, governorate_text
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+MAX_QUERY_TOKENS = 6
+
+
+# -----------------------------
+# Arabic normalization
+# -----------------------------
+_TASHKEEL_RE = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+_CHAR_MAP = str.maketrans(
+    {
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ى": "ي",
+        "ئ": "ي",
+        "ؤ": "و",
+        "ة": "ه",
+        "٠": "0",
+        "١": "1",
+        "٢": "2",
+        "٣": "3",
+        "٤": "4",
+        "٥": "5",
+        "٦": "6",
+        "٧": "7",
+        "٨": "8",
+        "٩": "9",
+    }
+)
+
+
+def normalize_search_text(text: str | None) -> str:
+    """
+    Lowercase, drop diacritics/tatweel, unify alef/yaa/taa-marbuta forms,
+    map Arabic-Indic digits, and collapse punctuation to single spaces.
+    """
+    if not text:
+        return ""
+    text = _TASHKEEL_RE.sub("", str(text))
+    text = text.translate(_CHAR_MAP).lower()
+    text = _NON_WORD_RE.sub(" ", text).replace("_", " ")
+    return " ".join(text.split())
+
+
+def _strip_article(token: str) -> str:
+    # "القلبية" -> "قلبية" (keep short words intact)
+    if token.startswith("ال") and len(token) > 4:
+        return token[2:]
+    return token
+
+
+def _index_text(text: str | None) -> str:
+    """Normalized text + article-less variants, so "قلب" also hits "القلبية"."""
+    tokens = normalize_search_text(text).split()
+    out = list(tokens)
+    for t in tokens:
+        stripped = _strip_article(t)
+        if stripped != t:
+            out.append(stripped)
+    return " ".join(out)
+
+
+def query_tokens(q: str) -> list[str]:
+    tokens = [_strip_article(t) for t in normalize_search_text(q).split()]
+    return [t for t in tokens if t][:MAX_QUERY_TOKENS]
+
+
+# -----------------------------
+# Index maintenance
+# -----------------------------
+def refresh_doctor_entry(doctor_id: int) -> None:
+    """Rebuild (or drop) one doctor's entry. Safe to call for non-doctors."""
+    user = (
+        CustomUser.objects.filter(id=doctor_id)
+        .select_related("governorate")
+        .only("id", "username", "role", "is_active", "governorate__name")
+        .first()
+    )
+    if user is None or user.role != "doctor":
+        DoctorSearchEntry.objects.filter(doctor_id=doctor_id).delete()
+        return
+
+    specialty = (
+        DoctorDetails.objects.filter(user_id=doctor_id)
+        .values_list("specialty", flat=True)
+        .first()
+    )
+    governorate_name = getattr(user.governorate, "name", None)
+
+    name_text = _index_text(user.username)
+    specialty_text = _index_text(specialty)
+    governorate_text = _index_text(governorate_name)
+
+    DoctorSearchEntry.objects.update_or_create(
+        doctor_id=doctor_id,
+        defaults={
+            "governorate_id": user.governorate_id,
+            "is_active": bool(user.is_active),
+            "name_text": name_text,
+            "specialty_text": specialty_text,
+            "governorate_text": governorate_text,
+            "search_text": " ".join(p for p in (name_text, specialty_text, governorate_text) if p),
+        },
+    )
+
+
+def refresh_governorate_entries(governorate_id: int | None) -> int:
+    """Governorate renamed/removed -> rebuild entries of doctors that pointed at it."""
+    if governorate_id is None:
+        doctor_ids = DoctorSearchEntry.objects.filter(
+            governorate__isnull=True
+        ).exclude(governorate_text="").values_list("doctor_id", flat=True)
+    else:
+        doctor_ids = CustomUser.objects.filter(
+            role="doctor", governorate_id=governorate_id
+        ).values_list("id", flat=True)
+
+    count = 0
+    for doctor_id in list(doctor_ids):
+        refresh_doctor_entry(doctor_id)
+        count += 1
+    return count
+
+
+def rebuild_all() -> int:
+    count = 0
+    for doctor_id in CustomUser.objects.filter(role="doctor").values_list("id", flat=True):
+        refresh_doctor_entry(doctor_id)
+        count += 1
+    # Drop leftovers of users that are no longer doctors
+    DoctorSearchEntry.objects.exclude(doctor__role="doctor").delete()
+
+    if connection.vendor == "sqlite":
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        except DatabaseError:
+            pass
+    return count
+
+
+# -----------------------------
+# Query
+# -----------------------------
+def _search_sqlite(tokens, governorate_id, limit):
+    match = " ".join('"{}"*'.format(t.replace('"', "")) for t in tokens)
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+
+    sql = (
+        f"SELECT e.doctor_id FROM {FTS_TABLE} "
+        f"JOIN appointments_doctorsearchentry e ON e.doctor_id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND e.is_active = 1"
+    )
+    params = [match]
+    if governorate_id is not None:
+        sql += " AND e.governorate_id = %s"
+        params.append(governorate_id)
+    sql += f" ORDER BY bm25({FTS_TABLE}, {weights}), e.doctor_id LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_postgres(tokens, governorate_id, limit):
+    where = ["is_active"]
+    params = []
+    for t in tokens:
+        where.append("search_text LIKE %s")
+        params.append(f"%{t}%")
+    if governorate_id is not None:
+        where.append("governorate_id = %s")
+        params.append(governorate_id)
+
+    sql = (
+        "SELECT doctor_id FROM appointments_doctorsearchentry "
+        f"WHERE {' AND '.join(where)} "
+        "ORDER BY word_similarity(%s, name_text) DESC, "
+        "word_similarity(%s, search_text) DESC, doctor_id LIMIT %s"
+    )
+    q = " ".join(tokens)
+    params.extend([q, q, limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_fallback(tokens, governorate_id, limit):
+    qs = DoctorSearchEntry.objects.filter(is_active=True)
+    for t in tokens:
+        qs = qs.filter(search_text__contains=t)
+    if governorate_id is not None:
+        qs = qs.filter(governorate_id=governorate_id)
+    return list(qs.order_by("name_text", "doctor_id").values_list("doctor_id", flat=True)[:limit])
+
+
+def search_doctor_ids(q: str, *, governorate_id: int | None = None, limit: int = 50) -> list[int]:
+    """Doctor ids matching every token of q (as prefixes), best match first."""
+    tokens = query_tokens(q)
+    if not tokens:
+        return []
+
+    if connection.vendor == "sqlite":
+        try:
+            return _search_sqlite(tokens, governorate_id, limit)
+        except DatabaseError:
+            # SQLite built without FTS5 -> index table was never created
+            return _search_fallback(tokens, governorate_id, limit)
+
+    if connection.vendor == "postgresql":
+        return _search_postgres(tokens, governorate_id, limit)
+
+    return _search_fallback(tokens, governorate_id, limit)
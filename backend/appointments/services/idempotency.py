@@ -0,0 +1,150 @@
+"""
+Idempotency-Key support for POSTs that create things (bookings, urgent requests).
+
+- No header -> the handler just runs.
+- A stored response for (user, scope, key) -> replayed as-is (Idempotent-Replayed: true)
+  without validating or scoring again; the same key with a different body -> 422.
+- Parallel duplicates are collapsed by a per-key cache lock: one runs the handler,
+  the others wait for its stored response. The unique (user, scope, key) constraint
+  is the final guard: the record is written in the handler's transaction, so a
+  duplicate that slips past the lock rolls back entirely and replays the winner.
+- Only 2xx responses are stored; errors are cheap to recompute and may not repeat
+  (a slot hold expiring, ...). Records live IDEMPOTENCY_KEY_TTL_SECONDS
+  (purge_idempotency_records removes expired rows).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..models import IdempotencyRecord
+
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 128
+
+
+def ttl_seconds() -> int:
+    return int(getattr(settings, "IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 3600) or 24 * 3600)
+
+
+def fingerprint(request) -> str:
+    data = request.data
+    if hasattr(data, "lists"):
+        # QueryDict (form posts): keep repeated values
+        data = {k: v if len(v) > 1 else v[0] for k, v in data.lists()}
+    body = json.dumps(data, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(f"{request.method} {request.path}\n{body}".encode("utf-8")).hexdigest()
+
+
+def _lock_key(user_id: int, scope: str, key: str) -> str:
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return f"idem-lock:{user_id}:{scope}:{digest}"
+
+
+def _stored(user_id: int, scope: str, key: str):
+    return (
+        IdempotencyRecord.objects.filter(user_id=user_id, scope=scope, key=key, expires_at__gt=timezone.now())
+        .only("fingerprint", "response_status", "response_body")
+        .first()
+    )
+
+
+def _replay(record, request_fingerprint: str) -> Response:
+    if record.fingerprint != request_fingerprint:
+        return Response(
+            {"detail": "Idempotency-Key was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(record.response_body, status=record.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def run(
+    request,
+    *,
+    scope: str,
+    handler,
+    lock_ttl: int = 30,
+    wait_timeout: float = 10.0,
+    poll_interval: float = 0.1,
+) -> Response:
+    """Response of handler() (run in a transaction), or the stored one for a retried key."""
+    key = (request.headers.get(HEADER) or "").strip()
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    user_id = request.user.id
+    request_fingerprint = fingerprint(request)
+
+    record = _stored(user_id, scope, key)
+    if record is not None:
+        return _replay(record, request_fingerprint)
+
+    lock_key = _lock_key(user_id, scope, key)
+    if not cache.add(lock_key, 1, lock_ttl):
+        # Same key in flight: wait for its stored response
+        deadline = time.time() + wait_timeout
+        while time.time() < deadline:
+            time.sleep(poll_interval)
+            record = _stored(user_id, scope, key)
+            if record is not None:
+                return _replay(record, request_fingerprint)
+            if cache.add(lock_key, 1, lock_ttl):
+                break  # the other attempt finished without storing (error) -> run ours
+        else:
+            return Response(
+                {"detail": "A request with this Idempotency-Key is still being processed."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+    try:
+        # Finished between our lookup and taking the lock
+        record = _stored(user_id, scope, key)
+        if record is not None:
+            return _replay(record, request_fingerprint)
+
+        try:
+            with transaction.atomic():
+                response = handler()
+                if 200 <= response.status_code < 300:
+                    now = timezone.now()
+                    # an expired record keeps the key taken until purged
+                    IdempotencyRecord.objects.filter(user_id=user_id, scope=scope, key=key).delete()
+                    IdempotencyRecord.objects.create(
+                        user_id=user_id,
+                        scope=scope,
+                        key=key,
+                        fingerprint=request_fingerprint,
+                        response_status=response.status_code,
+                        response_body=response.data,
+                        expires_at=now + timedelta(seconds=ttl_seconds()),
+                    )
+        except IntegrityError:
+            # A duplicate won the race past the lock: our writes are rolled back
+            record = _stored(user_id, scope, key)
+            if record is None:
+                raise
+            return _replay(record, request_fingerprint)
+        return response
+    finally:
+        cache.delete(lock_key)
+
+
+def purge_expired(now=None) -> int:
+    return IdempotencyRecord.objects.filter(expires_at__lte=now or timezone.now()).delete()[0]
@@ -0,0 +1,74 @@
+"""
+Lock-free appointment status transitions (confirm / cancel / no_show).
+
+Appointment.version is compared and bumped in the same statement:
+    UPDATE accounts_appointment SET status=?, version=version+1 WHERE id=? AND version=?
+Zero rows updated means another writer got there first -> the caller answers 409.
+Readers never wait; there is no SELECT ... FOR UPDATE.
+
+Clients may send the version they last saw ("version" in the body or If-Match) to make
+the transition conditional on their own view of the row.
+"""
+from __future__ import annotations
+
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Appointment
+from clinical.links import refresh_link
+
+from ..signals import schedule_doctor_refresh
+from . import urgent_matcher
+
+
+CONFLICT_DETAIL = "Appointment was modified concurrently. Reload and try again."
+
+
+def expected_version(request) -> int | None:
+    """Version the client based its action on, or None; ValueError if malformed."""
+    raw = None
+    data = getattr(request, "data", None)
+    if hasattr(data, "get"):
+        raw = data.get("version")
+    if raw in (None, ""):
+        raw = (request.headers.get("If-Match") or "").strip().removeprefix("W/").strip('"')
+    if raw in (None, ""):
+        return None
+    if isinstance(raw, bool):
+        raise ValueError("version must be an integer.")
+    version = int(raw)
+    if version < 0:
+        raise ValueError("version must be an integer.")
+    return version
+
+
+def conflict_data(appointment) -> dict:
+    current = Appointment.objects.filter(id=appointment.id).values("status", "version").first() or {}
+    return {
+        "detail": CONFLICT_DETAIL,
+        "id": appointment.id,
+        "status": current.get("status"),
+        "version": current.get("version"),
+    }
+
+
+def transition(appointment, new_status: str) -> bool:
+    """CAS on appointment.version; updates the instance and returns True on success."""
+    now = timezone.now()
+    updated = Appointment.objects.filter(id=appointment.id, version=appointment.version).update(
+        status=new_status,
+        version=F("version") + 1,
+        updated_at=now,
+    )
+    if not updated:
+        return False
+
+    appointment.status = new_status
+    appointment.version += 1
+    appointment.updated_at = now
+    # QuerySet.update() skips post_save -> slot caches are refreshed here
+    schedule_doctor_refresh(appointment.doctor_id)
+    if new_status == "cancelled":
+        refresh_link(doctor_id=appointment.doctor_id, patient_id=appointment.patient_id)
+        urgent_matcher.schedule_match(appointment)
+    return True
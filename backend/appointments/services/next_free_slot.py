@@ -0,0 +1,126 @@
+"""
+Materialized next free slot per (doctor, appointment type).
+
+refresh_doctor() loads the doctor's schedule once for the whole horizon and
+walks days until the first free slot for each appointment type. It runs after
+commit whenever the doctor's schedule changes (signals), and sweep() catches
+up with time passing (slots that slid into the past, horizon moving forward).
+Holds are ignored: they are short-lived and per patient.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from accounts.reference_data import appointment_types, resolve_duration
+
+from ..models import DoctorNextFreeSlot
+from .caching import bump_version
+from .scheduling import busy_intervals, day_window, free_slots, get_doctor_schedule
+
+
+# Bumped on every refresh; part of the doctor search cache key
+NEXT_FREE_SLOT_VERSION = "doctor_next_free_slot"
+
+
+def horizon_days() -> int:
+    return int(getattr(settings, "NEXT_FREE_SLOT_HORIZON_DAYS", 30) or 30)
+
+
+def default_appointment_type_id() -> int | None:
+    """Type used when search asks for availability without an explicit type."""
+    configured = getattr(settings, "DEFAULT_APPOINTMENT_TYPE_ID", None)
+    if configured:
+        return int(configured)
+    return min((t.id for t in appointment_types()), default=None)
+
+
+def first_free_slot(schedule: dict, from_date, days: int, duration_minutes: int, default_minutes: int, now_local):
+    for offset in range(days + 1):
+        day_date = from_date + timedelta(days=offset)
+        availability = schedule["availability"].get(day_date.strftime("%A"))
+        if not availability:
+            continue
+
+        start_dt, end_dt = day_window(day_date, availability, now_local)
+        if start_dt >= end_dt:
+            continue
+
+        intervals = busy_intervals(schedule, start_dt, end_dt, default_minutes)
+        slots = free_slots(start_dt, end_dt, intervals, duration_minutes)
+        if slots:
+            return slots[0]
+    return None
+
+
+def refresh_doctor(doctor_id: int) -> int:
+    """Recompute all appointment types for one doctor. Returns rows written."""
+    is_doctor = CustomUser.objects.filter(id=doctor_id, role="doctor", is_active=True).exists()
+    if not is_doctor:
+        if DoctorNextFreeSlot.objects.filter(doctor_id=doctor_id).delete()[0]:
+            bump_version(NEXT_FREE_SLOT_VERSION)
+        return 0
+
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    now_local = now.astimezone(tz)
+    days = horizon_days()
+    from_date = now_local.date()
+
+    schedule = get_doctor_schedule(doctor_id, from_date, from_date + timedelta(days=days))
+
+    rows = []
+    for appt_type in appointment_types():
+        default_minutes, duration_minutes = resolve_duration(doctor_id, appt_type)
+        rows.append(
+            DoctorNextFreeSlot(
+                doctor_id=doctor_id,
+                appointment_type_id=appt_type.id,
+                next_free_slot_at=first_free_slot(
+                    schedule, from_date, days, duration_minutes, default_minutes, now_local
+                ),
+                computed_at=now,
+            )
+        )
+
+    DoctorNextFreeSlot.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["doctor", "appointment_type"],
+        update_fields=["next_free_slot_at", "computed_at"],
+    )
+    bump_version(NEXT_FREE_SLOT_VERSION)
+    return len(rows)
+
+
+def sweep(*, refresh_all: bool = False, stale_after_hours: int = 24) -> int:
+    """
+    Refresh doctors whose stored slot is already in the past, whose "none found"
+    result is older than stale_after_hours, or who miss a row for some type.
+    Returns number of doctors refreshed.
+    """
+    doctors = CustomUser.objects.filter(role="doctor", is_active=True)
+
+    if not refresh_all:
+        now = timezone.now()
+        stale = DoctorNextFreeSlot.objects.filter(
+            Q(next_free_slot_at__lte=now)
+            | Q(next_free_slot_at__isnull=True, computed_at__lte=now - timedelta(hours=stale_after_hours))
+        ).values("doctor_id")
+        type_count = len(appointment_types())
+        doctors = doctors.annotate(n_rows=Count("next_free_slots")).filter(
+            Q(id__in=stale) | Q(n_rows__lt=type_count)
+        )
+
+    count = 0
+    for doctor_id in doctors.values_list("id", flat=True):
+        refresh_doctor(doctor_id)
+        count += 1
+
+    # Rows of users that are no longer active doctors
+    DoctorNextFreeSlot.objects.exclude(doctor__role="doctor", doctor__is_active=True).delete()
+    return count
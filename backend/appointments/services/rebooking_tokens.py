@@ -0,0 +1,83 @@
+"""
+Rebooking priority tokens (emergency absence): cached lookups + expiry sweep.
+
+- active_expiry(patient, doctor): expires_at of the patient's latest active token for
+  that doctor, or None. Cached per (patient, doctor), negative results included, so
+  the common case (no token) costs no query on slots / booking requests. Entries are
+  dropped after commit of every token write (post_save / post_delete in
+  appointments/signals.py: issue, consume, admin edits) and never outlive the token.
+- sweep_expired(): bulk-deactivates expired tokens in batches
+  (`manage.py sweep_rebooking_tokens`, run periodically), keeping the is_active=True
+  partial indexes small. Expired tokens are already ignored by every lookup, so the
+  sweep needs no cache invalidation.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import RebookingPriorityToken
+
+
+SWEEP_BATCH_SIZE = 1000
+
+_NONE = "none"
+
+
+def cache_ttl_seconds() -> int:
+    return int(getattr(settings, "REBOOKING_TOKEN_CACHE_TTL_SECONDS", 3600) or 3600)
+
+
+def _key(patient_id: int, doctor_id: int) -> str:
+    return f"rebook-token:{patient_id}:{doctor_id}"
+
+
+def active_expiry(patient_id: int, doctor_id: int, now=None):
+    now = now or timezone.now()
+    key = _key(patient_id, doctor_id)
+    cached = cache.get(key)
+    if cached == _NONE:
+        return None
+    if cached is not None and cached > now:
+        return cached
+
+    expires_at = (
+        RebookingPriorityToken.objects.filter(
+            patient_id=patient_id,
+            doctor_id=doctor_id,
+            is_active=True,
+            expires_at__gt=now,
+        )
+        .order_by("-issued_at")
+        .values_list("expires_at", flat=True)
+        .first()
+    )
+    if expires_at is None:
+        cache.set(key, _NONE, cache_ttl_seconds())
+    else:
+        ttl = min(cache_ttl_seconds(), int((expires_at - now).total_seconds()))
+        if ttl > 0:
+            cache.set(key, expires_at, ttl)
+    return expires_at
+
+
+def invalidate(patient_id: int, doctor_id: int) -> None:
+    # After commit: a reader in between would otherwise re-cache the old state
+    transaction.on_commit(lambda: cache.delete(_key(patient_id, doctor_id)))
+
+
+def sweep_expired(now=None, *, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Deactivate active tokens past expires_at; returns the number of rows updated."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            RebookingPriorityToken.objects.filter(is_active=True, expires_at__lte=now)
+            .order_by()
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += RebookingPriorityToken.objects.filter(id__in=ids, is_active=True).update(is_active=False)
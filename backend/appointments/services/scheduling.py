@@ -0,0 +1,172 @@
+"""
+Doctor schedule snapshot + slot generation (shared by slots / slots-range).
+
+The snapshot (weekly availability, blocking appointments, absences) is the
+expensive DB part; it is cached per doctor and date range behind single_flight()
+and keyed by a per-doctor version stamp that signals bump on every change.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from accounts.models import Appointment, DoctorAbsence, DoctorAvailability
+
+from .caching import bump_version, get_version, single_flight
+from .slot_holds import overlaps_hold
+
+
+BLOCKING_STATUSES = ["pending", "Pending", "confirmed", "Confirmed"]
+
+SCHEDULE_CACHE_TTL_SECONDS = 300
+
+# Version name for the cached doctor search results
+DOCTOR_SEARCH_VERSION = "doctor_search"
+
+
+def _schedule_version_name(doctor_id: int) -> str:
+    return f"doctor_schedule:{doctor_id}"
+
+
+def invalidate_doctor_schedule(doctor_id: int) -> None:
+    bump_version(_schedule_version_name(doctor_id))
+
+
+def _to_local(dt, tz):
+    if timezone.is_naive(dt):
+        return timezone.make_aware(dt, tz)
+    return dt.astimezone(tz)
+
+
+def _load_schedule(doctor_id: int, from_date, to_date) -> dict:
+    tz = timezone.get_current_timezone()
+    range_start_dt = timezone.make_aware(datetime.combine(from_date, datetime.min.time()), tz)
+    range_end_dt = timezone.make_aware(datetime.combine(to_date, datetime.max.time()), tz)
+
+    availability = {
+        a.day_of_week: (a.start_time, a.end_time)
+        for a in DoctorAvailability.objects.filter(doctor_id=doctor_id).only(
+            "day_of_week", "start_time", "end_time"
+        )
+    }
+
+    appointments = [
+        (_to_local(ap.date_time, tz), int(ap.duration_minutes or 0))
+        for ap in Appointment.objects.filter(
+            doctor_id=doctor_id,
+            status__in=BLOCKING_STATUSES,
+            date_time__lt=range_end_dt,
+            date_time__gte=range_start_dt - timedelta(days=1),
+        ).only("date_time", "duration_minutes")
+    ]
+
+    absences = [
+        (_to_local(ab.start_time, tz), _to_local(ab.end_time, tz))
+        for ab in DoctorAbsence.objects.filter(
+            doctor_id=doctor_id,
+            start_time__lt=range_end_dt,
+            end_time__gt=range_start_dt,
+        ).only("start_time", "end_time")
+    ]
+
+    return {
+        "availability": availability,
+        "appointments": appointments,
+        "absences": absences,
+    }
+
+
+def get_doctor_schedule(doctor_id: int, from_date, to_date) -> dict:
+    """
+    {"availability": {day_name: (start_time, end_time)},
+     "appointments": [(start_dt, duration_minutes_or_0)],
+     "absences": [(start_dt, end_dt)]}
+    """
+    version = get_version(_schedule_version_name(doctor_id))
+    key = f"doctor_schedule:{doctor_id}:{version}:{from_date.isoformat()}:{to_date.isoformat()}"
+    return single_flight(
+        key,
+        lambda: _load_schedule(doctor_id, from_date, to_date),
+        ttl=SCHEDULE_CACHE_TTL_SECONDS,
+    )
+
+
+def day_window(day_date, availability, now_local):
+    """
+    Bookable [start, end) for a day, clamped to "now" for today.
+    availability is a (start_time, end_time) tuple.
+    """
+    tz = now_local.tzinfo
+    start_dt = timezone.make_aware(datetime.combine(day_date, availability[0]), tz)
+    end_dt = timezone.make_aware(datetime.combine(day_date, availability[1]), tz)
+
+    if day_date == now_local.date() and now_local > start_dt:
+        start_dt = now_local.replace(second=0, microsecond=0)
+
+    return start_dt, end_dt
+
+
+def busy_intervals(schedule: dict, start_dt, end_dt, default_minutes: int) -> list:
+    """
+    Appointments + absences clipped to [start_dt, end_dt), sorted by start.
+    Appointments without a stored duration use the requested type's default.
+    """
+    intervals = []
+
+    for ap_start, ap_minutes in schedule["appointments"]:
+        ap_end = ap_start + timedelta(minutes=ap_minutes or default_minutes)
+        intervals.append((ap_start, ap_end))
+
+    intervals.extend(schedule["absences"])
+
+    clipped = []
+    for a_start, a_end in intervals:
+        if a_start < start_dt:
+            a_start = start_dt
+        if a_end > end_dt:
+            a_end = end_dt
+        if a_start < a_end:
+            clipped.append((a_start, a_end))
+
+    clipped.sort(key=lambda x: x[0])
+    return clipped
+
+
+def free_slots(start_dt, end_dt, intervals, duration_minutes: int, held=()) -> list:
+    """
+    Walk the window in duration-sized steps; on a collision jump to the end
+    of the blocking interval. Slots overlapping someone else's hold are skipped.
+    Returns slot start datetimes.
+    """
+    def find_first_overlap(a_start, a_end):
+        for b_start, b_end in intervals:
+            if b_start < a_end and a_start < b_end:
+                return (b_start, b_end)
+        return None
+
+    slots = []
+    step = timedelta(minutes=duration_minutes)
+    cursor = start_dt.replace(second=0, microsecond=0)
+
+    while cursor + step <= end_dt:
+        candidate_end = cursor + step
+        hit = find_first_overlap(cursor, candidate_end)
+
+        if hit is None:
+            if not overlaps_hold(cursor, candidate_end, held):
+                slots.append(cursor)
+            cursor = cursor + step
+            continue
+
+        _, hit_end = hit
+        jump_to = hit_end.replace(second=0, microsecond=0)
+
+        if jump_to <= cursor:
+            jump_to = cursor + step
+
+        cursor = jump_to
+        if cursor >= end_dt:
+            break
+
+    return slots
@@ -0,0 +1,200 @@
+"""
+Short-lived slot holds (cache only, no DB rows).
+
+- One key per slot  -> ownership is taken with cache.add() (atomic).
+- One index per doctor -> {start_epoch: (patient_id, end_epoch, expires_epoch)}
+  used to hide held slots from other patients' slot listings.
+- Index writes are serialized per doctor (cache.add lock), and place_hold() checks
+  overlaps with other patients' holds under that lock: two holds on overlapping
+  intervals with different starts cannot both succeed, and concurrent writers
+  never drop each other's entries.
+
+Entries expire with the cache TTL; the index is pruned lazily on every write/read.
+If the lock cannot be taken in time, place_hold() raises HoldBusy (retryable) rather
+than reporting the slot as held.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+LOCK_TTL_SECONDS = 5
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_SECONDS = 0.01
+BUSY_RETRY_AFTER_SECONDS = 1
+
+
+class HoldBusy(Exception):
+    """The doctor's hold index stayed locked past LOCK_WAIT_SECONDS; retry shortly."""
+
+
+def hold_ttl_seconds() -> int:
+    return int(getattr(settings, "SLOT_HOLD_TTL_SECONDS", 120) or 120)
+
+
+def _epoch(dt: datetime) -> int:
+    return int(dt.replace(second=0, microsecond=0).timestamp())
+
+
+def _slot_key(doctor_id: int, start_epoch: int) -> str:
+    return f"slot_hold:{doctor_id}:{start_epoch}"
+
+
+def _index_key(doctor_id: int) -> str:
+    return f"slot_holds:{doctor_id}"
+
+
+def _lock_key(doctor_id: int) -> str:
+    return f"slot_holds_lock:{doctor_id}"
+
+
+@contextmanager
+def _index_lock(doctor_id: int):
+    """Yields True once the doctor's index lock is held, False if it could not be taken in time."""
+    key = _lock_key(doctor_id)
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    acquired = cache.add(key, 1, LOCK_TTL_SECONDS)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_SECONDS)
+        acquired = cache.add(key, 1, LOCK_TTL_SECONDS)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def _live_index(doctor_id: int, now_epoch: int) -> dict:
+    index = cache.get(_index_key(doctor_id)) or {}
+    return {start: entry for start, entry in index.items() if entry[2] > now_epoch}
+
+
+def _save_index(doctor_id: int, index: dict, now_epoch: int) -> None:
+    if not index:
+        cache.delete(_index_key(doctor_id))
+        return
+    ttl = max(entry[2] for entry in index.values()) - now_epoch
+    cache.set(_index_key(doctor_id), index, max(ttl, 1))
+
+
+def place_hold(
+    *,
+    doctor_id: int,
+    patient_id: int,
+    start_dt: datetime,
+    duration_minutes: int,
+    ttl: int | None = None,
+) -> dict | None:
+    """
+    Hold [start_dt, start_dt + duration) for patient_id.
+    Returns the hold, or None if another patient holds an overlapping interval.
+    A patient keeps at most one hold per doctor (a new hold replaces the old one).
+    Raises HoldBusy on lock contention (nothing is known about the slot then).
+    """
+    ttl = int(ttl or hold_ttl_seconds())
+    now = int(time.time())
+    patient_id = int(patient_id)
+
+    start = _epoch(start_dt)
+    end = start + int(duration_minutes) * 60
+    entry = (patient_id, end, now + ttl)
+
+    with _index_lock(doctor_id) as locked:
+        if not locked:
+            raise HoldBusy()
+
+        index = _live_index(doctor_id, now)
+        for other_start, other in index.items():
+            if other[0] != patient_id and other_start < end and start < other[1]:
+                return None
+
+        key = _slot_key(doctor_id, start)
+        if not cache.add(key, entry, ttl):
+            current = cache.get(key)
+            if current is not None and current[0] != patient_id:
+                return None
+            cache.set(key, entry, ttl)
+
+        for other_start, other in list(index.items()):
+            if other[0] == patient_id and other_start != start:
+                index.pop(other_start)
+                cache.delete(_slot_key(doctor_id, other_start))
+        index[start] = entry
+        _save_index(doctor_id, index, now)
+
+    return {
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "start_epoch": start,
+        "end_epoch": end,
+        "expires_epoch": entry[2],
+        "ttl_seconds": ttl,
+    }
+
+
+def release_hold(*, doctor_id: int, patient_id: int, start_dt: datetime) -> bool:
+    """
+    Drop the patient's hold on this slot (no-op if not held by them).
+    Used on explicit release and when the booking that consumed the hold commits.
+    """
+    now = int(time.time())
+    patient_id = int(patient_id)
+    start = _epoch(start_dt)
+
+    key = _slot_key(doctor_id, start)
+    current = cache.get(key)
+    if current is None or current[0] != patient_id:
+        return False
+
+    cache.delete(key)
+    with _index_lock(doctor_id) as locked:
+        if locked:
+            index = _live_index(doctor_id, now)
+            index.pop(start, None)
+            _save_index(doctor_id, index, now)
+        # else: the entry stays until it expires; held_intervals() ignores it (slot key gone)
+    return True
+
+
+def held_intervals(doctor_id: int, *, exclude_patient_id: int | None = None) -> list:
+    """
+    Live holds for a doctor as (start, end) aware datetimes in the current tz,
+    excluding the requesting patient's own hold.
+    """
+    now = int(time.time())
+    tz = timezone.get_current_timezone()
+
+    index = _live_index(doctor_id, now)
+    if not index:
+        return []
+    # the slot key is the source of truth (released / replaced holds)
+    slots = cache.get_many([_slot_key(doctor_id, start) for start in index])
+
+    out = []
+    for start, (patient_id, end, _) in index.items():
+        if exclude_patient_id is not None and patient_id == int(exclude_patient_id):
+            continue
+        current = slots.get(_slot_key(doctor_id, start))
+        if current is None or current[0] != patient_id:
+            continue
+        out.append(
+            (
+                datetime.fromtimestamp(start, tz),
+                datetime.fromtimestamp(end, tz),
+            )
+        )
+    out.sort(key=lambda x: x[0])
+    return out
+
+
+def overlaps_hold(start_dt: datetime, end_dt: datetime, held: list) -> bool:
+    for h_start, h_end in held:
+        if h_start < end_dt and start_dt < h_end:
+            return True
+    return False
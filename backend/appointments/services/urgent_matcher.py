@@ -0,0 +1,201 @@
+"""
+Offer slots freed by cancellations to the doctor's open urgent requests.
+
+- Triggered after commit of a cancellation (lifecycle.transition, bulk cancel,
+  emergency absence) via schedule_match(); nothing waits for the doctor to poll.
+- Candidates come from urgent_doctor_priority_idx (stored effective_priority, see
+  urgent_queue.py), bounded by MATCH_SCAN_LIMIT, and are popped from a heap on the
+  priority recomputed at match time: triage score plus an aging bonus per hour waited
+  (capped), so old low-score requests are not starved by a stream of new high-score ones.
+- The first candidate whose visit fits gets a slot hold (slot_holds.place_hold, with
+  URGENT_OFFER_TTL_SECONDS) and an "urgent_slot_offered" outbox event; the request
+  records the offer so the same slot is not offered twice. Booking that slot marks
+  the request handled (claim_offer()).
+- The freed interval is re-checked against the database (blocking appointments,
+  absences, availability), so a slot inside an emergency absence is never offered.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import Appointment, DoctorAbsence, DoctorAvailability, UrgentRequest
+from accounts.reference_data import resolve_duration
+from notifications.services.outbox_payload import create_outbox_event
+
+from .scheduling import BLOCKING_STATUSES
+from .slot_holds import HoldBusy, held_intervals, overlaps_hold, place_hold, release_hold
+from .urgent_queue import effective_priority
+
+
+logger = logging.getLogger(__name__)
+
+MATCH_SCAN_LIMIT = 200
+
+
+def offer_ttl_seconds() -> int:
+    return int(getattr(settings, "URGENT_OFFER_TTL_SECONDS", 900) or 900)
+
+
+# -----------------------------
+# Trigger
+# -----------------------------
+def schedule_match(appointment) -> None:
+    """After commit: offer the slot `appointment` just released."""
+    doctor_id = appointment.doctor_id
+    start_dt = appointment.date_time
+    minutes = int(appointment.duration_minutes or 0)
+
+    def run():
+        try:
+            match_freed_slot(doctor_id=doctor_id, start_dt=start_dt, duration_minutes=minutes)
+        except Exception:
+            # never break the cancellation that triggered us
+            logger.exception("Urgent matching failed for doctor %s at %s", doctor_id, start_dt)
+
+    transaction.on_commit(run)
+
+
+# -----------------------------
+# Matching
+# -----------------------------
+def _slot_is_free(doctor_id: int, start_dt, end_dt, patient_id: int) -> bool:
+    tz = timezone.get_current_timezone()
+    local_start = start_dt.astimezone(tz)
+    local_end = end_dt.astimezone(tz)
+    if local_start.date() != local_end.date():
+        return False
+
+    window = (
+        DoctorAvailability.objects.filter(doctor_id=doctor_id, day_of_week=local_start.strftime("%A"))
+        .values_list("start_time", "end_time")
+        .first()
+    )
+    if window is None or not (window[0] <= local_start.time() and local_end.time() <= window[1]):
+        return False
+
+    if DoctorAbsence.objects.filter(doctor_id=doctor_id, start_time__lt=end_dt, end_time__gt=start_dt).exists():
+        return False
+
+    for ap_start, ap_minutes in Appointment.objects.filter(
+        doctor_id=doctor_id,
+        status__in=BLOCKING_STATUSES,
+        date_time__lt=end_dt,
+        date_time__gte=start_dt - timedelta(days=1),
+    ).values_list("date_time", "duration_minutes"):
+        ap_end = ap_start + timedelta(minutes=int(ap_minutes or 0))
+        if ap_start >= start_dt or ap_end > start_dt:
+            return False
+
+    return not overlaps_hold(start_dt, end_dt, held_intervals(doctor_id, exclude_patient_id=patient_id))
+
+
+def _candidates(doctor_id: int, now):
+    qs = (
+        UrgentRequest.objects.filter(doctor_id=doctor_id, status="open")
+        .filter(Q(offer_expires_at__isnull=True) | Q(offer_expires_at__lte=now))
+        .select_related("appointment_type", "patient", "doctor")
+        .order_by("-effective_priority", "-created_at", "-id")[:MATCH_SCAN_LIMIT]
+    )
+    heap = [(-effective_priority(r.score, r.created_at, now), r.created_at, r.id, r) for r in qs]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[3]
+
+
+def match_freed_slot(*, doctor_id: int, start_dt, duration_minutes: int):
+    """Offer [start_dt, start_dt + duration) to the best fitting urgent request; returns it or None."""
+    now = timezone.now()
+    if start_dt <= now:
+        return None
+
+    free_by_minutes = {}
+    for urgent in _candidates(doctor_id, now):
+        _, minutes = resolve_duration(doctor_id, urgent.appointment_type)
+        if duration_minutes and minutes > duration_minutes:
+            continue
+
+        end_dt = start_dt + timedelta(minutes=minutes)
+        if minutes not in free_by_minutes:
+            free_by_minutes[minutes] = _slot_is_free(doctor_id, start_dt, end_dt, urgent.patient_id)
+        if not free_by_minutes[minutes]:
+            # re-booked meanwhile / inside an absence / outside hours
+            continue
+
+        ttl = offer_ttl_seconds()
+        try:
+            hold = place_hold(
+                doctor_id=doctor_id,
+                patient_id=urgent.patient_id,
+                start_dt=start_dt,
+                duration_minutes=minutes,
+                ttl=ttl,
+            )
+        except HoldBusy:
+            return None  # hold index contended: skip, as for a slot being booked
+        if hold is None:
+            return None  # another patient is booking it right now
+
+        expires_at = now + timedelta(seconds=ttl)
+        claimed = (
+            UrgentRequest.objects.filter(id=urgent.id, status="open")
+            .filter(Q(offer_expires_at__isnull=True) | Q(offer_expires_at__lte=now))
+            .update(offer_date_time=start_dt, offer_expires_at=expires_at)
+        )
+        if not claimed:
+            release_hold(doctor_id=doctor_id, patient_id=urgent.patient_id, start_dt=start_dt)
+            continue
+
+        urgent.offer_date_time = start_dt
+        urgent.offer_expires_at = expires_at
+        _notify_offer(urgent, minutes)
+        return urgent
+
+    return None
+
+
+def _notify_offer(urgent, minutes: int) -> None:
+    create_outbox_event(
+        event_type="urgent_slot_offered",
+        actor=urgent.doctor,
+        recipient=urgent.patient,
+        obj=None,
+        entity_type="urgent_request",
+        entity_id=urgent.id,
+        route="/app/appointments",
+        payload={
+            "urgent_request_id": urgent.id,
+            "doctor_id": urgent.doctor_id,
+            "patient_id": urgent.patient_id,
+            "appointment_type_id": urgent.appointment_type_id,
+            "date_time": urgent.offer_date_time.isoformat(),
+            "duration_minutes": minutes,
+            "offer_expires_at": urgent.offer_expires_at.isoformat(),
+            "title": "موعد متاح لطلبك العاجل",
+            "message": "أصبح موعد متاحاً لدى الطبيب وتم حجزه مؤقتاً لك. أكمل الحجز قبل انتهاء المهلة.",
+        },
+    )
+
+
+# -----------------------------
+# Booking the offered slot closes the request
+# -----------------------------
+def claim_offer(appointment) -> None:
+    UrgentRequest.objects.filter(
+        patient_id=appointment.patient_id,
+        doctor_id=appointment.doctor_id,
+        status="open",
+        offer_date_time=appointment.date_time,
+    ).update(
+        status="handled",
+        handled_type="scheduled",
+        scheduled_appointment=appointment,
+        handled_at=timezone.now(),
+        offer_expires_at=None,
+    )
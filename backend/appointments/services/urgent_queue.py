@@ -0,0 +1,190 @@
+"""
+Doctor's urgent inbox: stored, aged priority + keyset pages.
+
+- UrgentRequest.effective_priority = triage score + an aging bonus per hour waited
+  (URGENT_AGING_POINTS_PER_HOUR, capped at URGENT_AGING_MAX_BONUS). It is set to the
+  score on create and refreshed periodically (refresh_urgent_priorities, e.g. every
+  15 minutes); only open rows that have not reached the cap are rewritten.
+- The inbox reads straight from urgent_doctor_priority_idx
+  (doctor, status, -effective_priority, -created_at, -id): no sort step, no OFFSET;
+  the next page starts after the last row's (effective_priority, created_at, id).
+- Rows are projected with values() (no model instances, no doctor join).
+"""
+from __future__ import annotations
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import UrgentRequest
+
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 200
+REFRESH_BATCH_SIZE = 500
+
+STATUS_GROUPS = {
+    "open": ["open"],
+    # "handled" in UI means: processed (scheduled OR rejected OR cancelled)
+    "handled": ["handled", "rejected", "cancelled"],
+    "rejected": ["rejected"],
+    "cancelled": ["cancelled"],
+    "all": None,
+}
+
+INBOX_FIELDS = (
+    "id",
+    "patient_id",
+    "doctor_id",
+    "appointment_type_id",
+    "symptoms_text",
+    "temperature_c",
+    "bp_systolic",
+    "bp_diastolic",
+    "heart_rate",
+    "score",
+    "confidence",
+    "missing_fields",
+    "score_version",
+    "effective_priority",
+    "notes",
+    "status",
+    "created_at",
+    "handled_at",
+    "handled_by_id",
+    "rejected_reason",
+    "handled_type",
+    "scheduled_appointment_id",
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# -----------------------------
+# Priority
+# -----------------------------
+def aging_points_per_hour() -> float:
+    return float(getattr(settings, "URGENT_AGING_POINTS_PER_HOUR", 0.25))
+
+
+def aging_max_bonus() -> float:
+    return float(getattr(settings, "URGENT_AGING_MAX_BONUS", 3.0))
+
+
+def effective_priority(score, created_at, now) -> float:
+    waited_hours = max((now - created_at).total_seconds() / 3600.0, 0.0)
+    bonus = min(waited_hours * aging_points_per_hour(), aging_max_bonus())
+    # rounded: the stored value is compared exactly by the keyset cursor
+    return round(float(score or 0) + bonus, 4)
+
+
+def refresh_priorities(now=None, *, doctor_id: int | None = None) -> int:
+    """Re-age open requests still below the cap; returns the number of rows rewritten."""
+    now = now or timezone.now()
+    qs = UrgentRequest.objects.filter(
+        status="open",
+        effective_priority__lt=Coalesce(F("score"), 0) + aging_max_bonus(),
+    )
+    if doctor_id is not None:
+        qs = qs.filter(doctor_id=doctor_id)
+
+    changed = []
+    updated = 0
+    rows = qs.values_list("id", "score", "created_at", "effective_priority").order_by("id")
+    for pk, score, created_at, current in rows.iterator(chunk_size=REFRESH_BATCH_SIZE):
+        value = effective_priority(score, created_at, now)
+        if value != current:
+            changed.append(UrgentRequest(id=pk, effective_priority=value))
+        if len(changed) >= REFRESH_BATCH_SIZE:
+            updated += UrgentRequest.objects.bulk_update(changed, ["effective_priority"])
+            changed = []
+    if changed:
+        updated += UrgentRequest.objects.bulk_update(changed, ["effective_priority"])
+    return updated
+
+
+# -----------------------------
+# Keyset pages
+# -----------------------------
+def encode_cursor(row: dict, status_group: str) -> str:
+    values = [row["created_at"].isoformat(), row["id"]]
+    if status_group == "open":
+        values.insert(0, row["effective_priority"])
+    raw = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str, status_group: str) -> list:
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if status_group == "open":
+            priority, ts_raw, pk = values
+            priority = float(priority)
+        else:
+            ts_raw, pk = values
+        ts = parse_datetime(ts_raw)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor.")
+    if ts is None:
+        raise InvalidCursor("Invalid cursor.")
+    return [priority, ts, pk] if status_group == "open" else [ts, pk]
+
+
+def parse_limit(raw) -> int:
+    """Page size from ?limit= (default / clamped); ValueError on non-integers."""
+    raw = (raw or "").strip()
+    if not raw:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(raw), MAX_PAGE_SIZE))
+
+
+def _after(cursor: list, status_group: str) -> Q:
+    if status_group == "open":
+        priority, ts, pk = cursor
+        return (
+            Q(effective_priority__lt=priority)
+            | Q(effective_priority=priority, created_at__lt=ts)
+            | Q(effective_priority=priority, created_at=ts, id__lt=pk)
+        )
+    ts, pk = cursor
+    return Q(created_at__lt=ts) | Q(created_at=ts, id__lt=pk)
+
+
+def inbox_page(*, doctor_id: int, status_group: str, limit: int, cursor: str | None = None):
+    """(rows, next_cursor) for the doctor's inbox; InvalidCursor on a bad cursor."""
+    qs = UrgentRequest.objects.filter(doctor_id=doctor_id)
+    statuses = STATUS_GROUPS[status_group]
+    if statuses is not None:
+        qs = qs.filter(status__in=statuses) if len(statuses) > 1 else qs.filter(status=statuses[0])
+
+    # - open: aged triage priority first, then newest
+    # - others: newest first
+    if status_group == "open":
+        qs = qs.order_by("-effective_priority", "-created_at", "-id")
+    else:
+        qs = qs.order_by("-created_at", "-id")
+
+    if cursor:
+        qs = qs.filter(_after(decode_cursor(cursor, status_group), status_group))
+
+    rows = list(
+        qs.values(
+            *INBOX_FIELDS,
+            patient_name=F("patient__username"),
+            appointment_type_name=F("appointment_type__type_name"),
+        )[: limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1], status_group)
+    return rows, next_cursor
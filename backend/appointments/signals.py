@@ -0,0 +1,162 @@
+"""
+Cache invalidation for the appointments read endpoints.
+
+Every write that can change a doctor's slots / search rows bumps the matching
+version stamp; cached entries keyed by the old stamp are simply
+never read again and expire on their own.
+
+Doctor/profile/governorate writes also rebuild the DoctorSearchEntry rows.
+Rebooking token writes drop the cached per-patient token lookup.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import (
+    Appointment,
+    CustomUser,
+    DoctorAbsence,
+    DoctorAppointmentType,
+    DoctorAvailability,
+    DoctorDetails,
+    Governorate,
+    RebookingPriorityToken,
+)
+
+from .models import DoctorSearchEntry
+from .services.autocomplete import record_doctor_change
+from .services.caching import bump_version_on_commit
+from .services.doctor_search import refresh_doctor_entry, refresh_governorate_entries
+from .services.next_free_slot import refresh_doctor as refresh_next_free_slot
+from .services.rebooking_tokens import invalidate as invalidate_rebooking_token
+from .services.scheduling import DOCTOR_SEARCH_VERSION, invalidate_doctor_schedule
+
+
+# -----------------------------
+# Doctor schedule (slots / slots-range)
+# -----------------------------
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=DoctorAbsence)
+@receiver(post_delete, sender=DoctorAbsence)
+@receiver(post_save, sender=DoctorAvailability)
+@receiver(post_delete, sender=DoctorAvailability)
+def _invalidate_schedule(sender, instance, **kwargs):
+    doctor_id = getattr(instance, "doctor_id", None)
+    if doctor_id:
+        schedule_doctor_refresh(doctor_id)
+
+
+class _DoctorRefreshBatch:
+    """The single on_commit callback of a transaction: refreshes each doctor once."""
+
+    def __init__(self):
+        self.doctor_ids = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        for doctor_id in sorted(self.doctor_ids):
+            invalidate_doctor_schedule(doctor_id)
+            refresh_next_free_slot(doctor_id)
+
+
+def _pending_batch(connection):
+    # Still queued? (rollbacks drop the callbacks, and the batch with them)
+    for _sids, func, _robust in connection.run_on_commit:
+        if isinstance(func, _DoctorRefreshBatch) and not func.done:
+            return func
+    return None
+
+
+def schedule_doctor_refresh(doctor_id: int) -> None:
+    # After commit: a reader rebuilding in between would otherwise cache the
+    # pre-commit schedule under the new version; the recompute must see it too.
+    # One recompute per doctor per transaction however many rows were written
+    # (e.g. an emergency absence cancelling N appointments).
+    connection = transaction.get_connection()
+    batch = _pending_batch(connection) if connection.in_atomic_block else None
+    if batch is not None:
+        batch.doctor_ids.add(doctor_id)
+        return
+    batch = _DoctorRefreshBatch()
+    batch.doctor_ids.add(doctor_id)
+    transaction.on_commit(batch)  # runs at once outside a transaction
+
+
+# -----------------------------
+# Duration overrides -> next free slot may move
+# -----------------------------
+@receiver(post_save, sender=DoctorAppointmentType)
+@receiver(post_delete, sender=DoctorAppointmentType)
+def _refresh_for_override(sender, instance, **kwargs):
+    doctor_id = getattr(instance, "doctor_id", None)
+    if doctor_id:
+        transaction.on_commit(lambda: refresh_next_free_slot(doctor_id))
+
+
+# -----------------------------
+# Rebooking priority tokens (issue / consume)
+# -----------------------------
+@receiver(post_save, sender=RebookingPriorityToken)
+@receiver(post_delete, sender=RebookingPriorityToken)
+def _invalidate_rebooking_token(sender, instance, **kwargs):
+    invalidate_rebooking_token(instance.patient_id, instance.doctor_id)
+
+
+# -----------------------------
+# Doctor search
+# -----------------------------
+# login / password writes never change search rows
+_NON_SEARCH_USER_FIELDS = {"last_login", "password", "updated_at"}
+
+
+def _bump_search() -> None:
+    bump_version_on_commit(DOCTOR_SEARCH_VERSION)
+
+
+@receiver(post_save, sender=CustomUser)
+def _reindex_user(sender, instance, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= _NON_SEARCH_USER_FIELDS:
+        return
+
+    if getattr(instance, "role", None) == "doctor":
+        refresh_doctor_entry(instance.id)
+        record_doctor_change(instance.id)
+        schedule_doctor_refresh(instance.id)
+        _bump_search()
+    elif DoctorSearchEntry.objects.filter(doctor_id=instance.id).delete()[0]:
+        # Role changed away from doctor
+        record_doctor_change(instance.id)
+        schedule_doctor_refresh(instance.id)
+        _bump_search()
+
+
+@receiver(post_delete, sender=CustomUser)
+def _invalidate_search_for_user(sender, instance, **kwargs):
+    if getattr(instance, "role", None) == "doctor":
+        record_doctor_change(instance.id)
+        _bump_search()
+
+
+@receiver(post_save, sender=DoctorDetails)
+@receiver(post_delete, sender=DoctorDetails)
+def _reindex_doctor_details(sender, instance, **kwargs):
+    refresh_doctor_entry(instance.user_id)
+    record_doctor_change(instance.user_id)
+    _bump_search()
+
+
+@receiver(post_save, sender=Governorate)
+def _reindex_governorate(sender, instance, **kwargs):
+    if not kwargs.get("created"):
+        refresh_governorate_entries(instance.id)
+    _bump_search()
+
+
+@receiver(post_delete, sender=Governorate)
+def _reindex_deleted_governorate(sender, instance, **kwargs):
+    # users/entries were SET_NULL by the delete -> rebuild the orphaned ones
+    refresh_governorate_entries(None)
+    _bump_search()
@@ -1,3 +1,286 @@
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Appointment, AppointmentType, CustomUser, DoctorAvailability
+
+from .services import lifecycle
+from .services import autocomplete, slot_holds
+from .services.slot_holds import held_intervals, place_hold
+from .signals import schedule_doctor_refresh
+
+
+def _user(email, role, **extra):
+    return CustomUser.objects.create_user(
+        email=email, password="x", username=email.split("@")[0], role=role, is_active=True, **extra
+    )
+
+
+def _client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _tomorrow_at(hour, minute=0):
+    tz = timezone.get_current_timezone()
+    day = timezone.now().astimezone(tz).date() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)), tz)
+
+
+class AppointmentTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = _user("doc@example.com", "doctor")
+        self.patient = _user("pat@example.com", "patient")
+        self.other_patient = _user("pat2@example.com", "patient")
+        self.appt_type = AppointmentType.objects.create(type_name="Consult", default_duration_minutes=30)
+        for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]:
+            DoctorAvailability.objects.create(doctor=self.doctor, day_of_week=day, start_time=time(9), end_time=time(17))
+
+    def _appointment(self, hour=10, status="pending", patient=None):
+        return Appointment.objects.create(
+            patient=patient or self.patient,
+            doctor=self.doctor,
+            appointment_type=self.appt_type,
+            date_time=_tomorrow_at(hour),
+            duration_minutes=30,
+            status=status,
+        )
+
+
+# -----------------------------
+# Version compare-and-swap (lifecycle.transition / Appointment.save)
+# -----------------------------
+class AppointmentVersionTests(AppointmentTestCase):
+    def test_stale_version_in_body_returns_409(self):
+        ap = self._appointment()
+        _client(self.doctor).post(f"/api/appointments/{ap.id}/confirm/", {"version": 0}, format="json")
+
+        response = _client(self.patient).post(f"/api/appointments/{ap.id}/cancel/", {"version": 0}, format="json")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], "confirmed")
+        self.assertEqual(response.data["version"], 1)
+        self.assertEqual(Appointment.objects.get(id=ap.id).status, "confirmed")
+
+    def test_stale_if_match_returns_409_and_current_one_succeeds(self):
+        ap = self._appointment(status="confirmed")
+        client = _client(self.patient)
+
+        self.assertEqual(client.post(f"/api/appointments/{ap.id}/cancel/", HTTP_IF_MATCH='"5"').status_code, 409)
+
+        response = client.post(f"/api/appointments/{ap.id}/cancel/", HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 1)
+
+    def test_second_transition_from_stale_instance_loses(self):
+        ap = self._appointment()
+        first = Appointment.objects.get(id=ap.id)
+        second = Appointment.objects.get(id=ap.id)
+
+        self.assertTrue(lifecycle.transition(first, "confirmed"))
+        self.assertFalse(lifecycle.transition(second, "cancelled"))
+        self.assertEqual(
+            Appointment.objects.values_list("status", "version").get(id=ap.id),
+            ("confirmed", 1),
+        )
+
+    def test_save_bumps_version_without_rolling_back_from_stale_instance(self):
+        ap = self._appointment()
+        stale = Appointment.objects.get(id=ap.id)
+        lifecycle.transition(ap, "confirmed")
+
+        stale.notes = "edited"
+        stale.save(update_fields=["notes"])
+
+        self.assertEqual(stale.version, 2)
+        self.assertEqual(Appointment.objects.get(id=ap.id).version, 2)
+
+    def test_emergency_absence_cancellation_bumps_version(self):
+        ap = self._appointment(hour=10, status="confirmed")
+        start = _tomorrow_at(9)
+
+        response = _client(self.doctor).post(
+            "/api/appointments/absences/emergency/",
+            {"start_time": start.isoformat(), "end_time": (start + timedelta(hours=3)).isoformat()},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Appointment.objects.values_list("status", "version").get(id=ap.id), ("cancelled", 1))
+
+
+# -----------------------------
+# Schedule / next free slot refresh after commit
+# -----------------------------
+class DoctorRefreshTests(AppointmentTestCase):
+    def setUp(self):
+        # run (and close) the refresh batch the fixtures opened
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+
+    def test_emergency_absence_recomputes_next_free_slot_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for hour in (10, 11, 12):
+                self._appointment(hour=hour, status="confirmed")
+        start = _tomorrow_at(9)
+
+        with mock.patch("appointments.signals.refresh_next_free_slot") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = _client(self.doctor).post(
+                    "/api/appointments/absences/emergency/",
+                    {"start_time": start.isoformat(), "end_time": (start + timedelta(hours=4)).isoformat()},
+                    format="json",
+                )
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Appointment.objects.filter(status="cancelled").count(), 3)
+        refresh.assert_called_once_with(self.doctor.id)
+
+    def test_rolled_back_transaction_does_not_swallow_later_refreshes(self):
+        with mock.patch("appointments.signals.refresh_next_free_slot") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        schedule_doctor_refresh(self.doctor.id)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                schedule_doctor_refresh(self.doctor.id)
+                schedule_doctor_refresh(self.doctor.id)
+
+        refresh.assert_called_once_with(self.doctor.id)
+
+
+# -----------------------------
+# Bulk confirm / cancel
+# -----------------------------
+class BulkTransitionTests(AppointmentTestCase):
+    def test_per_item_outcomes(self):
+        pending = self._appointment(hour=10)
+        no_show = self._appointment(hour=11, status="no_show")
+
+        response = _client(self.doctor).post(
+            "/api/appointments/bulk/",
+            {"action": "cancel", "ids": [pending.id, no_show.id, 999999]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        codes = {item["id"]: item["status_code"] for item in response.data["results"]}
+        self.assertEqual(codes, {pending.id: 200, no_show.id: 400, 999999: 404})
+        self.assertEqual(Appointment.objects.values_list("status", "version").get(id=pending.id), ("cancelled", 1))
+
+    def test_non_integer_ids_rejected(self):
+        ap = self._appointment()
+
+        response = _client(self.doctor).post(
+            "/api/appointments/bulk/", {"action": "confirm", "ids": [ap.id + 0.7]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.get(id=ap.id).status, "pending")
+
+
+# -----------------------------
+# Slot holds
+# -----------------------------
+class SlotHoldTests(AppointmentTestCase):
+    def test_overlapping_hold_of_another_patient_is_refused(self):
+        start = _tomorrow_at(10)
+        self.assertIsNotNone(
+            place_hold(doctor_id=self.doctor.id, patient_id=self.patient.id, start_dt=start, duration_minutes=30)
+        )
+
+        later_start = start + timedelta(minutes=15)
+        self.assertIsNone(
+            place_hold(doctor_id=self.doctor.id, patient_id=self.other_patient.id, start_dt=later_start, duration_minutes=30)
+        )
+        self.assertEqual(held_intervals(self.doctor.id), [(start, start + timedelta(minutes=30))])
+
+    def test_booking_over_someone_elses_hold_is_rejected(self):
+        start = _tomorrow_at(10)
+        place_hold(doctor_id=self.doctor.id, patient_id=self.patient.id, start_dt=start, duration_minutes=30)
+
+        response = _client(self.other_patient).post(
+            "/api/appointments/",
+            {"doctor_id": self.doctor.id, "appointment_type_id": self.appt_type.id, "date_time": start.isoformat()},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Appointment.objects.exists())
+
+
+    def test_lock_contention_is_a_retryable_503_not_a_held_slot(self):
+        start = _tomorrow_at(10)
+        cache.add(slot_holds._lock_key(self.doctor.id), 1, 30)
+
+        with mock.patch.object(slot_holds, "LOCK_WAIT_SECONDS", 0.05):
+            response = _client(self.patient).post(
+                "/api/appointments/slot-holds/",
+                {"doctor_id": self.doctor.id, "appointment_type_id": self.appt_type.id, "date_time": start.isoformat()},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 503, response.data)
+        self.assertEqual(response["Retry-After"], str(slot_holds.BUSY_RETRY_AFTER_SECONDS))
+        self.assertEqual(held_intervals(self.doctor.id), [])
+
+
+# -----------------------------
+# Idempotency-Key
+# -----------------------------
+class IdempotentBookingTests(AppointmentTestCase):
+    def _book(self, key, hour=10):
+        return _client(self.patient).post(
+            "/api/appointments/",
+            {
+                "doctor_id": self.doctor.id,
+                "appointment_type_id": self.appt_type.id,
+                "date_time": _tomorrow_at(hour).isoformat(),
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_stored_response(self):
+        first = self._book("booking-1")
+        retry = self._book("booking-1")
+
+        self.assertEqual(first.status_code, 201, first.data)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_same_key_with_another_body_returns_422(self):
+        self._book("booking-2", hour=10)
+
+        response = self._book("booking-2", hour=11)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+
+# -----------------------------
+# Autocomplete warm-up
+# -----------------------------
+class AutocompleteWarmTests(AppointmentTestCase):
+    def setUp(self):
+        super().setUp()
+        autocomplete._trie = None
+
+    def test_warm_builds_the_index_so_lookups_run_no_query(self):
+        autocomplete.warm()
+
+        with self.assertNumQueries(0):
+            suggestions = autocomplete.suggest("do")
 
-# Create your tests here.
+        self.assertEqual([s["label"] for s in suggestions if s["kind"] == "name"], ["doc"])
@@ -1,11 +1,14 @@
 from django.urls import path
 from .views import (
     AppointmentCreateView,
+    SlotHoldView,
+    DoctorAutocompleteView,
     DoctorSearchView,
     DoctorVisitTypesView,
     mark_no_show,
     cancel_appointment,
     confirm_appointment,
+    AppointmentBulkTransitionView,
     DoctorAvailableSlotsView,
     DoctorAvailableSlotsRangeView,
     MyAppointmentsView,
@@ -29,6 +32,9 @@ urlpatterns = [
     # Create appointment (Patient)
     path("", AppointmentCreateView.as_view(), name="appointment-create"),
 
+    # Short-lived slot hold before booking (Patient)
+    path("slot-holds/", SlotHoldView.as_view(), name="slot-hold"),
+
     # My appointments (Patient / Doctor)
     path("my/", MyAppointmentsView.as_view(), name="my-appointments"),
 
@@ -36,6 +42,7 @@ urlpatterns = [
     path("<int:pk>/mark-no-show/", mark_no_show, name="appointment-mark-no-show"),
     path("<int:pk>/cancel/", cancel_appointment, name="appointment-cancel"),
     path("<int:pk>/confirm/", confirm_appointment, name="appointment-confirm"),
+    path("bulk/", AppointmentBulkTransitionView.as_view(), name="appointment-bulk-transition"),
 
     # -----------------------------
     # Doctors & booking helpers
@@ -43,6 +50,7 @@ urlpatterns = [
 
     # Doctor search
     path("doctors/search/", DoctorSearchView.as_view(), name="doctor-search"),
+    path("doctors/autocomplete/", DoctorAutocompleteView.as_view(), name="doctor-autocomplete"),
 
     # Doctor visit types (central + specific)
     path(
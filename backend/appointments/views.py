@@ -1,8 +1,7 @@
-from collections import defaultdict
+import hashlib
 from datetime import datetime, timedelta
 
 from django.db import transaction
-from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -14,9 +13,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from clinical.permissions import IsPatient, IsDoctor
+from clinical.readiness import blocking_order
 from clinical.models import (
     ClinicalOrder,
-    MedicalRecordFile,
     Prescription,
     MedicationAdherence,
     OutboxEvent,
@@ -30,31 +29,52 @@ from notifications.services.outbox import try_send_event
 
 from accounts.models import (
     Appointment,
-    AppointmentType,
     CustomUser,
     DoctorAbsence,
-    DoctorAppointmentType,
-    DoctorAvailability,
     DoctorDetails,
-    DoctorSpecificVisitType,
     UrgentRequest,
     RebookingPriorityToken,
     AbsenceCancellationLog,   
 )
 
+from accounts.reference_data import doctor_visit_types, get_appointment_type, resolve_duration
+
+from .models import DoctorNextFreeSlot
 from .permissions import IsDoctorOrAdmin
 from .serializers import (
     AppointmentCreateSerializer,
     DoctorAbsenceSerializer,
     DoctorSlotsQuerySerializer,
     DoctorSlotsRangeQuerySerializer,
+    SlotHoldCreateSerializer,
+    SlotHoldReleaseSerializer,
     UrgentRequestCreateSerializer,
-    UrgentRequestReadSerializer,        # NEW
+    UrgentRequestInboxSerializer,
     UrgentRequestRejectSerializer,      # NEW
     UrgentRequestScheduleSerializer,    # NEW    
 )
 
 from notifications.services.outbox_payload import create_outbox_event
+from .services import bulk_transitions, idempotency, lifecycle, rebooking_tokens, urgent_matcher, urgent_queue
+from .services.autocomplete import suggest
+from .services.caching import get_version, single_flight
+from .services.doctor_search import query_tokens, search_doctor_ids
+from .services.next_free_slot import NEXT_FREE_SLOT_VERSION, default_appointment_type_id
+from .services.scheduling import (
+    DOCTOR_SEARCH_VERSION,
+    busy_intervals,
+    day_window,
+    free_slots,
+    get_doctor_schedule,
+)
+from .services.slot_holds import (
+    BUSY_RETRY_AFTER_SECONDS,
+    HoldBusy,
+    held_intervals,
+    hold_ttl_seconds,
+    place_hold,
+    release_hold,
+)
 
 
 # -----------------------------
@@ -119,8 +139,6 @@ class DoctorSearchView(APIView):
 
     def get(self, request):
         q = (request.query_params.get("q") or "").strip()
-        if not q:
-            return Response({"results": []})
 
         raw_gov_id = (request.query_params.get("governorate_id") or "").strip()
 
@@ -135,39 +153,128 @@ class DoctorSearchView(APIView):
                     status=400,
                 )
 
+        # Availability ranking / filtering (materialized next free slot)
+        sort = (request.query_params.get("sort") or "relevance").strip().lower()
+        if sort not in ("relevance", "availability"):
+            return Response(
+                {"detail": "Invalid sort. Use relevance or availability."},
+                status=400,
+            )
+
+        raw_type_id = (request.query_params.get("appointment_type_id") or "").strip()
+        raw_within = (request.query_params.get("available_within_days") or "").strip()
+        try:
+            type_id = int(raw_type_id) if raw_type_id else default_appointment_type_id()
+            within_days = int(raw_within) if raw_within else None
+        except ValueError:
+            return Response(
+                {"detail": "Invalid appointment_type_id or available_within_days. Use integer."},
+                status=400,
+            )
+        if within_days is not None and within_days < 0:
+            return Response(
+                {"detail": "available_within_days must be >= 0."},
+                status=400,
+            )
+
+        availability_mode = sort == "availability" or within_days is not None
+
+        # Without a query we only list doctors when ranking by availability
+        if not q and not availability_mode:
+            return Response({"results": []})
+
         # Patient governorate (for distance_hint only)
         patient_gov_id = getattr(request.user, "governorate_id", None)
 
-        # Search by specialty
-        doctor_ids_by_specialty = DoctorDetails.objects.filter(
-            specialty__icontains=q
-        ).values_list("user_id", flat=True)
+        def build_results():
+            ranked_ids = None
+            if q:
+                # Ranked ids from the search index (name / specialty / governorate)
+                ranked_ids = search_doctor_ids(
+                    q,
+                    governorate_id=governorate_id,
+                    limit=200 if availability_mode else 50,
+                )
 
-        # Base doctors queryset
-        doctors_qs = (
-            CustomUser.objects.filter(role="doctor", is_active=True)
-            .filter(Q(username__icontains=q) | Q(id__in=doctor_ids_by_specialty))
-        )
+            next_free = {}
+            if availability_mode:
+                nfs = DoctorNextFreeSlot.objects.filter(
+                    appointment_type_id=type_id,
+                    doctor__role="doctor",
+                    doctor__is_active=True,
+                )
+                if ranked_ids is not None:
+                    nfs = nfs.filter(doctor_id__in=ranked_ids)
+                elif governorate_id is not None:
+                    nfs = nfs.filter(doctor__governorate_id=governorate_id)
+                if within_days is not None:
+                    nfs = nfs.filter(next_free_slot_at__lte=timezone.now() + timedelta(days=within_days))
+
+                if sort == "availability" or ranked_ids is None:
+                    # no query to rank by relevance -> soonest availability first
+                    nfs = nfs.order_by(F("next_free_slot_at").asc(nulls_last=True), "doctor_id")[:50]
+                    next_free = dict(nfs.values_list("doctor_id", "next_free_slot_at"))
+                    ranked_ids = list(next_free.keys())
+                else:
+                    next_free = dict(nfs.values_list("doctor_id", "next_free_slot_at"))
+                    ranked_ids = [i for i in ranked_ids if i in next_free][:50]
+            elif ranked_ids and type_id is not None:
+                next_free = dict(
+                    DoctorNextFreeSlot.objects.filter(
+                        appointment_type_id=type_id,
+                        doctor_id__in=ranked_ids,
+                    ).values_list("doctor_id", "next_free_slot_at")
+                )
 
-        # Optional filter by governorate
-        if governorate_id is not None:
-            doctors_qs = doctors_qs.filter(governorate_id=governorate_id)
+            doctors_by_id = {
+                d.id: d
+                for d in CustomUser.objects.filter(id__in=ranked_ids, role="doctor", is_active=True)
+                .select_related("governorate")
+            }
+            doctors = [doctors_by_id[i] for i in ranked_ids if i in doctors_by_id]
 
-        doctors = (
-            doctors_qs
-            .select_related("governorate")
-            .order_by("username")[:50]
-        )
+            doctor_ids = [d.id for d in doctors]
 
-        doctor_ids = [d.id for d in doctors]
+            # Fetch details in one query
+            details_map = {
+                row["user_id"]: row
+                for row in DoctorDetails.objects.filter(user_id__in=doctor_ids).values(
+                    "user_id", "specialty", "experience_years"
+                )
+            }
 
-        # Fetch details in one query
-        details_map = {
-            row["user_id"]: row
-            for row in DoctorDetails.objects.filter(user_id__in=doctor_ids).values(
-                "user_id", "specialty", "experience_years"
-            )
-        }
+            tz = timezone.get_current_timezone()
+            rows = []
+            for d in doctors:
+                det = details_map.get(d.id, {})
+                slot_at = next_free.get(d.id)
+                rows.append(
+                    {
+                        "id": d.id,
+                        "username": d.username,
+                        "email": d.email,
+                        "governorate_id": d.governorate_id,
+                        "governorate_name": getattr(d.governorate, "name", None),
+                        "specialty": det.get("specialty"),
+                        "experience_years": det.get("experience_years"),
+                        "next_free_slot_at": slot_at.astimezone(tz).isoformat() if slot_at else None,
+                    }
+                )
+            return rows
+
+        # Same query from many patients -> one shared, single-flight cached result
+        normalized_q = " ".join(query_tokens(q))
+        q_digest = hashlib.sha1(normalized_q.encode("utf-8")).hexdigest()
+        cache_key = "doctor_search:{}:{}:{}:{}:{}:{}:{}".format(
+            get_version(DOCTOR_SEARCH_VERSION),
+            get_version(NEXT_FREE_SLOT_VERSION),
+            governorate_id,
+            sort,
+            type_id,
+            within_days,
+            q_digest,
+        )
+        rows = single_flight(cache_key, build_results, ttl=120)
 
         def distance_hint_for(doctor_gov_id: int | None) -> str:
             if patient_gov_id is None or doctor_gov_id is None:
@@ -175,19 +282,12 @@ class DoctorSearchView(APIView):
             return "same_governorate" if patient_gov_id == doctor_gov_id else "different_governorate"
 
         results = []
-        for d in doctors:
-            det = details_map.get(d.id, {})
+        for row in rows:
             results.append(
                 {
-                    "id": d.id,
-                    "username": d.username,
-                    "email": d.email,
-                    "governorate_id": d.governorate_id,
-                    "governorate_name": getattr(d.governorate, "name", None),
-                    "specialty": det.get("specialty"),
-                    "experience_years": det.get("experience_years"),
+                    **row,
                     # NEW (UI helper only, does not affect scheduling)
-                    "distance_hint": distance_hint_for(d.governorate_id),
+                    "distance_hint": distance_hint_for(row["governorate_id"]),
                 }
             )
 
@@ -195,65 +295,44 @@ class DoctorSearchView(APIView):
 
 
 # -----------------------------
-# Doctor visit types (central + specific)
+# Doctor autocomplete (specialties + names, in-process trie)
 # -----------------------------
 
-class DoctorVisitTypesView(APIView):
+class DoctorAutocompleteView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, doctor_id: int):
-        doctor = get_object_or_404(CustomUser, id=doctor_id, role="doctor")
+    def get(self, request):
+        q = (request.query_params.get("q") or "").strip()
+        if not q:
+            return Response({"results": []})
 
-        types = AppointmentType.objects.all().order_by("type_name")
+        raw_limit = (request.query_params.get("limit") or "").strip()
+        limit = 10
+        if raw_limit:
+            try:
+                limit = max(1, min(int(raw_limit), 20))
+            except ValueError:
+                return Response(
+                    {"detail": "Invalid limit. Use integer."},
+                    status=400,
+                )
 
-        overrides = {
-            row["appointment_type_id"]: row["duration_minutes"]
-            for row in DoctorAppointmentType.objects.filter(doctor_id=doctor.id).values(
-                "appointment_type_id",
-                "duration_minutes",
-            )
-        }
+        return Response({"results": suggest(q, limit)})
 
-        central = []
-        for t in types:
-            default_minutes = int(getattr(t, "default_duration_minutes", 15) or 15)
-            resolved = int(overrides.get(t.id, default_minutes))
 
-            central.append(
-                {
-                    "appointment_type_id": t.id,
-                    "type_name": t.type_name,
-                    "description": t.description,
-                    "resolved_duration_minutes": resolved,
-                    "default_duration_minutes": default_minutes,
-                    "requires_approved_files": bool(getattr(t, "requires_approved_files", False)),
-                    "has_doctor_override": t.id in overrides,
-                }
-            )
+# -----------------------------
+# Doctor visit types (central + specific)
+# -----------------------------
 
-        specific_qs = DoctorSpecificVisitType.objects.filter(
-            doctor_id=doctor.id
-        ).order_by("name")
+class DoctorVisitTypesView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        specific = [
-            {
-                "id": s.id,
-                "name": s.name,
-                "duration_minutes": s.duration_minutes,
-                "description": s.description,
-            }
-            for s in specific_qs
-        ]
+    def get(self, request, doctor_id: int):
+        doctor = get_object_or_404(CustomUser, id=doctor_id, role="doctor")
+
+        # Served from the per-process reference data snapshot (no type queries)
+        return Response(doctor_visit_types(doctor.id), status=status.HTTP_200_OK)
 
-        return Response(
-            {
-                "doctor_id": doctor.id,
-                "central": central,
-                "specific": specific,
-                "specific_booking_enabled": False,
-            },
-            status=status.HTTP_200_OK,
-        )
 
 # -----------------------------
 # Create appointment (patient)
@@ -262,8 +341,12 @@ class DoctorVisitTypesView(APIView):
 class AppointmentCreateView(APIView):
     permission_classes = [IsPatient]
 
-    @transaction.atomic
     def post(self, request):
+        # Retries with the same Idempotency-Key get the stored response back
+        return idempotency.run(request, scope="appointment_create", handler=lambda: self._create(request))
+
+    @transaction.atomic
+    def _create(self, request):
         serializer = AppointmentCreateSerializer(
             data=request.data,
             context={"request": request},
@@ -271,6 +354,18 @@ class AppointmentCreateView(APIView):
         serializer.is_valid(raise_exception=True)
         appointment = serializer.save()
 
+        # Booking a slot offered by the urgent matcher closes that urgent request
+        urgent_matcher.claim_offer(appointment)
+
+        # The booked row now blocks the slot; drop the patient's hold once it is committed.
+        transaction.on_commit(
+            lambda: release_hold(
+                doctor_id=appointment.doctor_id,
+                patient_id=appointment.patient_id,
+                start_dt=appointment.date_time,
+            )
+        )
+
         # -----------------------------
         # Notifications: appointment_created
         # Recipient: doctor
@@ -342,11 +437,81 @@ class AppointmentCreateView(APIView):
         )
 
 
+# -----------------------------
+# Slot holds (patient, ~2 minutes, cache only)
+# -----------------------------
+
+class SlotHoldView(APIView):
+    """
+    POST   -> hold a slot while the patient completes the booking form.
+    DELETE -> release it (booking releases it automatically).
+    Held slots are hidden from other patients' slot listings.
+    """
+    permission_classes = [IsPatient]
+
+    def post(self, request):
+        serializer = SlotHoldCreateSerializer(
+            data=request.data,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        v = serializer.validated_data
+
+        start_dt = v["date_time"]
+        try:
+            hold = place_hold(
+                doctor_id=v["doctor_obj"].id,
+                patient_id=request.user.id,
+                start_dt=start_dt,
+                duration_minutes=v["duration_minutes"],
+            )
+        except HoldBusy:
+            return Response(
+                {"detail": "Slot holds are busy for this doctor. Please retry."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)},
+            )
+        if hold is None:
+            return Response(
+                {"detail": "This time slot is temporarily held by another patient."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        tz = timezone.get_current_timezone()
+        return Response(
+            {
+                "doctor_id": hold["doctor_id"],
+                "appointment_type_id": v["appointment_type_obj"].id,
+                "date_time": start_dt.astimezone(tz).isoformat(),
+                "duration_minutes": v["duration_minutes"],
+                "expires_at": datetime.fromtimestamp(hold["expires_epoch"], tz).isoformat(),
+                "ttl_seconds": hold_ttl_seconds(),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def delete(self, request):
+        serializer = SlotHoldReleaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        v = serializer.validated_data
+
+        release_hold(
+            doctor_id=v["doctor_id"],
+            patient_id=request.user.id,
+            start_dt=v["date_time"],
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class UrgentRequestCreateView(APIView):
     permission_classes = [IsPatient]
 
-    @transaction.atomic
     def post(self, request):
+        # Retries with the same Idempotency-Key get the stored response back (no second triage run)
+        return idempotency.run(request, scope="urgent_request_create", handler=lambda: self._create(request))
+
+    @transaction.atomic
+    def _create(self, request):
         serializer = UrgentRequestCreateSerializer(
             data=request.data,
             context={"request": request},
@@ -404,6 +569,11 @@ class UrgentRequestCreateView(APIView):
 
 
 class MyUrgentRequestsView(APIView):
+    """
+    Doctor's urgent inbox, keyset-paginated (appointments/services/urgent_queue.py):
+    ?status=open|handled|rejected|cancelled|all&limit=&cursor=
+    Response: {"results": [...], "next_cursor": str | null}
+    """
     permission_classes = [IsDoctor]
 
     def get(self, request):
@@ -413,45 +583,34 @@ class MyUrgentRequestsView(APIView):
         # but implement "handled" as a group (handled + rejected + cancelled).
         status_q = (request.query_params.get("status") or "open").strip().lower()
 
-        allowed_statuses = {"open", "handled", "rejected", "cancelled", "all"}
-        if status_q not in allowed_statuses:
+        if status_q not in urgent_queue.STATUS_GROUPS:
             return Response(
                 {"detail": "Invalid status. Use status=open|handled|rejected|cancelled|all"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        qs = UrgentRequest.objects.select_related(
-            "patient", "doctor", "appointment_type"
-        ).filter(doctor_id=user.id)
-
-        if status_q == "open":
-            qs = qs.filter(status="open")
-
-        elif status_q == "handled":
-            # "handled" in UI means: processed (scheduled OR rejected OR cancelled)
-            qs = qs.filter(status__in=["handled", "rejected", "cancelled"])
-
-        elif status_q == "rejected":
-            qs = qs.filter(status="rejected")
-
-        elif status_q == "cancelled":
-            qs = qs.filter(status="cancelled")
-
-        elif status_q == "all":
-            # no filter
-            pass
+        try:
+            limit = urgent_queue.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Ordering:
-        # - open: triage-first (score desc), then newest
-        # - others: newest first
-        if status_q == "open":
-            qs = qs.order_by(F("score").desc(nulls_last=True), "-created_at")
-        else:
-            qs = qs.order_by("-created_at")
+        try:
+            rows, next_cursor = urgent_queue.inbox_page(
+                doctor_id=user.id,
+                status_group=status_q,
+                limit=limit,
+                cursor=(request.query_params.get("cursor") or "").strip() or None,
+            )
+        except urgent_queue.InvalidCursor as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        qs = qs[:200]
         return Response(
-            {"results": UrgentRequestReadSerializer(qs, many=True).data},
+            {
+                "results": UrgentRequestInboxSerializer(
+                    rows, many=True, context={"doctor_name": user.username}
+                ).data,
+                "next_cursor": next_cursor,
+            },
             status=status.HTTP_200_OK,
         )
 
@@ -652,6 +811,11 @@ def mark_no_show(request, pk: int):
     if appointment.doctor_id != user.id:
         return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        expected = lifecycle.expected_version(request)
+    except (TypeError, ValueError):
+        return Response({"version": "version must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
     if appointment.status == "cancelled":
         return Response(
             {"detail": "Cancelled appointments cannot be marked as no_show."},
@@ -659,7 +823,7 @@ def mark_no_show(request, pk: int):
         )
 
     if appointment.status == "no_show":
-        return Response({"id": appointment.id, "status": appointment.status}, status=status.HTTP_200_OK)
+        return Response({"id": appointment.id, "status": appointment.status, "version": appointment.version}, status=status.HTTP_200_OK)
 
     if appointment.status != "confirmed":
         return Response(
@@ -686,8 +850,11 @@ def mark_no_show(request, pk: int):
             status=status.HTTP_409_CONFLICT,
         )
 
-    appointment.status = "no_show"
-    appointment.save(update_fields=["status", "updated_at"])
+    # Compare-and-swap on version: no row lock, a concurrent transition -> 409
+    if expected is not None and expected != appointment.version:
+        return Response(lifecycle.conflict_data(appointment), status=status.HTTP_409_CONFLICT)
+    if not lifecycle.transition(appointment, "no_show"):
+        return Response(lifecycle.conflict_data(appointment), status=status.HTTP_409_CONFLICT)
 
     # -----------------------------
     # Notifications: appointment_no_show
@@ -716,7 +883,7 @@ def mark_no_show(request, pk: int):
     except Exception:
         pass
 
-    return Response({"id": appointment.id, "status": appointment.status}, status=status.HTTP_200_OK)
+    return Response({"id": appointment.id, "status": appointment.status, "version": appointment.version}, status=status.HTTP_200_OK)
 
 
 # -----------------------------
@@ -736,6 +903,11 @@ def cancel_appointment(request, pk: int):
     if not (is_admin_flag or is_owner_patient or is_owner_doctor):
         return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        expected = lifecycle.expected_version(request)
+    except (TypeError, ValueError):
+        return Response({"version": "version must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
     if appointment.status == "no_show":
         return Response(
             {"detail": "no_show appointments cannot be cancelled."},
@@ -744,7 +916,7 @@ def cancel_appointment(request, pk: int):
 
     if appointment.status == "cancelled":
         return Response(
-            {"id": appointment.id, "status": appointment.status},
+            {"id": appointment.id, "status": appointment.status, "version": appointment.version},
             status=status.HTTP_200_OK,
         )
 
@@ -757,8 +929,11 @@ def cancel_appointment(request, pk: int):
             status=status.HTTP_409_CONFLICT,
         )
 
-    appointment.status = "cancelled"
-    appointment.save(update_fields=["status", "updated_at"])
+    # Compare-and-swap on version: no row lock, a concurrent transition -> 409
+    if expected is not None and expected != appointment.version:
+        return Response(lifecycle.conflict_data(appointment), status=status.HTTP_409_CONFLICT)
+    if not lifecycle.transition(appointment, "cancelled"):
+        return Response(lifecycle.conflict_data(appointment), status=status.HTTP_409_CONFLICT)
 
     # -----------------------------
     # Notifications: appointment_cancelled
@@ -799,7 +974,7 @@ def cancel_appointment(request, pk: int):
     except Exception:
         pass
 
-    return Response({"id": appointment.id, "status": appointment.status}, status=status.HTTP_200_OK)
+    return Response({"id": appointment.id, "status": appointment.status, "version": appointment.version}, status=status.HTTP_200_OK)
 
 
 # -----------------------------
@@ -818,6 +993,11 @@ def confirm_appointment(request, pk: int):
     if not (is_admin_flag or is_owner_doctor):
         return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        expected = lifecycle.expected_version(request)
+    except (TypeError, ValueError):
+        return Response({"version": "version must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
     if appointment.status in ["cancelled", "no_show"]:
         return Response(
             {"detail": "This appointment cannot be confirmed."},
@@ -826,7 +1006,7 @@ def confirm_appointment(request, pk: int):
 
     if appointment.status == "confirmed":
         return Response(
-            {"id": appointment.id, "status": appointment.status},
+            {"id": appointment.id, "status": appointment.status, "version": appointment.version},
             status=status.HTTP_200_OK,
         )
 
@@ -838,41 +1018,23 @@ def confirm_appointment(request, pk: int):
 
     appt_type = appointment.appointment_type
     if bool(getattr(appt_type, "requires_approved_files", False)):
-        open_orders = ClinicalOrder.objects.filter(
-            doctor_id=appointment.doctor_id,
-            patient_id=appointment.patient_id,
-            status=ClinicalOrder.Status.OPEN,
-        ).only("id")
-
-        if open_orders.exists():
-            for order in open_orders:
-                files_qs = MedicalRecordFile.objects.filter(
-                    order_id=order.id,
-                    patient_id=appointment.patient_id,
-                ).only("id", "review_status")
-
-                if not files_qs.exists():
-                    return Response(
-                        {
-                            "detail": "Cannot confirm follow-up: missing required files.",
-                            "order_id": order.id,
-                        },
-                        status=status.HTTP_409_CONFLICT,
-                    )
-
-                if files_qs.exclude(
-                    review_status=MedicalRecordFile.ReviewStatus.APPROVED
-                ).exists():
-                    return Response(
-                        {
-                            "detail": "Cannot confirm follow-up: some files are not approved yet.",
-                            "order_id": order.id,
-                        },
-                        status=status.HTTP_409_CONFLICT,
-                    )
+        # One indexed query on the maintained ClinicalOrder.files_state
+        blocking = blocking_order(doctor_id=appointment.doctor_id, patient_id=appointment.patient_id)
+        if blocking is not None:
+            if blocking["files_state"] == ClinicalOrder.FilesState.NO_FILES:
+                detail = "Cannot confirm follow-up: missing required files."
+            else:
+                detail = "Cannot confirm follow-up: some files are not approved yet."
+            return Response(
+                {"detail": detail, "order_id": blocking["id"]},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-    appointment.status = "confirmed"
-    appointment.save(update_fields=["status", "updated_at"])
+    # Compare-and-swap on version: no row lock, a concurrent transition -> 409
+    if expected is not None and expected != appointment.version:
+        return Response(lifecycle.conflict_data(appointment), status=status.HTTP_409_CONFLICT)
+    if not lifecycle.transition(appointment, "confirmed"):
+        return Response(lifecycle.conflict_data(appointment), status=status.HTTP_409_CONFLICT)
 
     # -----------------------------
     # Notifications: appointment_confirmed
@@ -902,11 +1064,56 @@ def confirm_appointment(request, pk: int):
         pass
 
     return Response(
-        {"id": appointment.id, "status": appointment.status},
+        {"id": appointment.id, "status": appointment.status, "version": appointment.version},
         status=status.HTTP_200_OK,
     )
 
 
+# -----------------------------
+# Bulk confirm / cancel (doctor/admin)
+# -----------------------------
+
+class AppointmentBulkTransitionView(APIView):
+    """
+    POST /api/appointments/bulk/  {"action": "confirm" | "cancel", "ids": [..]}
+    Same rules as the single confirm / cancel endpoints, applied in one transaction;
+    returns one outcome per id: {"id", "status_code", "status" | "detail"}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        is_admin_flag = _is_admin(user)
+        if not (is_admin_flag or getattr(user, "role", "") == "doctor"):
+            return Response({"detail": "Only doctors can update appointments in bulk."}, status=status.HTTP_403_FORBIDDEN)
+
+        action = (request.data.get("action") or "").strip().lower()
+        if action not in bulk_transitions.ACTIONS:
+            return Response({"action": "action must be 'confirm' or 'cancel'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            ids = bulk_transitions.parse_ids(request.data.get("ids"))
+        except (TypeError, ValueError):
+            return Response({"ids": "ids must be a list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"ids": "ids must not be empty."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > bulk_transitions.MAX_BULK_IDS:
+            return Response(
+                {"ids": f"At most {bulk_transitions.MAX_BULK_IDS} appointments per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = bulk_transitions.apply(actor=user, is_admin=is_admin_flag, action=action, ids=ids)
+        return Response(
+            {
+                "action": action,
+                "updated": sum(1 for r in results if r["status_code"] == 200),
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 # -----------------------------
 # Slots (single day)
 # -----------------------------
@@ -921,25 +1128,21 @@ class DoctorAvailableSlotsView(APIView):
         appointment_type_id = qs.validated_data["appointment_type_id"]
 
         doctor = get_object_or_404(CustomUser, id=doctor_id, role="doctor")
-        appt_type = get_object_or_404(AppointmentType, id=appointment_type_id)
-
-        override = DoctorAppointmentType.objects.filter(
-            doctor_id=doctor.id,
-            appointment_type_id=appt_type.id,
-        ).first()
+        appt_type = get_appointment_type(appointment_type_id)
+        if appt_type is None:
+            raise Http404
 
-        default_minutes = int(getattr(appt_type, "default_duration_minutes", 15) or 15)
-        duration_minutes = int(override.duration_minutes) if override else default_minutes
+        default_minutes, duration_minutes = resolve_duration(doctor.id, appt_type)
         if duration_minutes <= 0:
             return Response({"detail": "Invalid duration."}, status=status.HTTP_400_BAD_REQUEST)
 
         tz = timezone.get_current_timezone()
 
+        # Cached per doctor/day (single-flight, invalidated by signals)
+        schedule = get_doctor_schedule(doctor.id, day_date, day_date)
+
         day_name = day_date.strftime("%A")
-        availability = DoctorAvailability.objects.filter(
-            doctor_id=doctor.id,
-            day_of_week=day_name,
-        ).first()
+        availability = schedule["availability"].get(day_name)
 
         if not availability:
             return Response(
@@ -955,12 +1158,8 @@ class DoctorAvailableSlotsView(APIView):
                 status=status.HTTP_200_OK,
             )
 
-        start_dt = timezone.make_aware(datetime.combine(day_date, availability.start_time), tz)
-        end_dt = timezone.make_aware(datetime.combine(day_date, availability.end_time), tz)
-
         now_local = timezone.now().astimezone(tz)
-        if day_date == now_local.date() and now_local > start_dt:
-            start_dt = now_local.replace(second=0, microsecond=0)
+        start_dt, end_dt = day_window(day_date, availability, now_local)
 
         if start_dt >= end_dt:
             return Response(
@@ -970,8 +1169,8 @@ class DoctorAvailableSlotsView(APIView):
                     "appointment_type_id": appt_type.id,
                     "duration_minutes": duration_minutes,
                     "availability": {
-                        "start": availability.start_time.strftime("%H:%M"),
-                        "end": availability.end_time.strftime("%H:%M"),
+                        "start": availability[0].strftime("%H:%M"),
+                        "end": availability[1].strftime("%H:%M"),
                     },
                     "slots": [],
                     "timezone": str(tz),
@@ -979,97 +1178,21 @@ class DoctorAvailableSlotsView(APIView):
                 status=status.HTTP_200_OK,
             )
 
-        blocking_statuses = ["pending", "Pending", "confirmed", "Confirmed"]
-
-        existing = Appointment.objects.filter(
-            doctor_id=doctor.id,
-            status__in=blocking_statuses,
-            date_time__lt=end_dt,
-            date_time__gte=start_dt - timedelta(days=1),
-        ).only("date_time", "duration_minutes")
-
-        intervals = []
+        intervals = busy_intervals(schedule, start_dt, end_dt, default_minutes)
 
-        for ap in existing:
-            ap_start = ap.date_time
-            if timezone.is_naive(ap_start):
-                ap_start = timezone.make_aware(ap_start, tz)
-            else:
-                ap_start = ap_start.astimezone(tz)
+        # Slots held by other patients are hidden (own hold stays visible)
+        held = held_intervals(doctor.id, exclude_patient_id=request.user.id)
 
-            ap_dur = int(ap.duration_minutes or 0) or default_minutes
-            ap_end = ap_start + timedelta(minutes=ap_dur)
-            intervals.append((ap_start, ap_end))
-
-        absences = DoctorAbsence.objects.filter(
-            doctor_id=doctor.id,
-            start_time__lt=end_dt,
-            end_time__gt=start_dt,
-        ).only("start_time", "end_time")
-
-        for ab in absences:
-            ab_start = ab.start_time
-            ab_end = ab.end_time
-
-            if timezone.is_naive(ab_start):
-                ab_start = timezone.make_aware(ab_start, tz)
-            else:
-                ab_start = ab_start.astimezone(tz)
-
-            if timezone.is_naive(ab_end):
-                ab_end = timezone.make_aware(ab_end, tz)
-            else:
-                ab_end = ab_end.astimezone(tz)
-
-            if ab_start < start_dt:
-                ab_start = start_dt
-            if ab_end > end_dt:
-                ab_end = end_dt
-
-            if ab_start < ab_end:
-                intervals.append((ab_start, ab_end))
-
-        intervals.sort(key=lambda x: x[0])
-
-        def find_first_overlap(a_start, a_end):
-            for b_start, b_end in intervals:
-                if b_start < a_end and a_start < b_end:
-                    return (b_start, b_end)
-            return None
-
-        slots = []
-        step = timedelta(minutes=duration_minutes)
-        cursor = start_dt.replace(second=0, microsecond=0)
-
-        while cursor + step <= end_dt:
-            candidate_end = cursor + step
-            hit = find_first_overlap(cursor, candidate_end)
-
-            if hit is None:
-                slots.append(cursor.strftime("%H:%M"))
-                cursor = cursor + step
-                continue
-
-            _, hit_end = hit
-            jump_to = hit_end.replace(second=0, microsecond=0)
-
-            if jump_to <= cursor:
-                jump_to = cursor + step
+        slots = [
+            s.strftime("%H:%M")
+            for s in free_slots(start_dt, end_dt, intervals, duration_minutes, held)
+        ]
 
-            cursor = jump_to
-            if cursor >= end_dt:
-                break
-        
         priority = None
         if getattr(request.user, "role", "") == "patient":
-            tok = RebookingPriorityToken.objects.filter(
-                patient_id=request.user.id,
-                doctor_id=doctor.id,
-                is_active=True,
-                expires_at__gt=timezone.now(),
-            ).order_by("-issued_at").first()
-            if tok:
-                priority = {"active": True, "expires_at": tok.expires_at.astimezone(tz).isoformat()}
+            token_expires_at = rebooking_tokens.active_expiry(request.user.id, doctor.id)
+            if token_expires_at:
+                priority = {"active": True, "expires_at": token_expires_at.astimezone(tz).isoformat()}
 
 
         return Response(
@@ -1079,8 +1202,8 @@ class DoctorAvailableSlotsView(APIView):
                 "appointment_type_id": appt_type.id,
                 "duration_minutes": duration_minutes,
                 "availability": {
-                    "start": availability.start_time.strftime("%H:%M"),
-                    "end": availability.end_time.strftime("%H:%M"),
+                    "start": availability[0].strftime("%H:%M"),
+                    "end": availability[1].strftime("%H:%M"),
                 },
                 "slots": slots,
                 "rebooking_priority": priority,
@@ -1103,15 +1226,11 @@ class DoctorAvailableSlotsRangeView(APIView):
         v = qs.validated_data
 
         doctor = get_object_or_404(CustomUser, id=doctor_id, role="doctor")
-        appt_type = get_object_or_404(AppointmentType, id=v["appointment_type_id"])
-
-        override = DoctorAppointmentType.objects.filter(
-            doctor_id=doctor.id,
-            appointment_type_id=appt_type.id,
-        ).first()
+        appt_type = get_appointment_type(v["appointment_type_id"])
+        if appt_type is None:
+            raise Http404
 
-        default_minutes = int(getattr(appt_type, "default_duration_minutes", 15) or 15)
-        duration_minutes = int(override.duration_minutes) if override else default_minutes
+        default_minutes, duration_minutes = resolve_duration(doctor.id, appt_type)
         if duration_minutes <= 0:
             return Response({"detail": "Invalid duration."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1121,66 +1240,12 @@ class DoctorAvailableSlotsRangeView(APIView):
         start_date = v["from_date"]
         end_date = v["to_date"]
 
-        avail_qs = DoctorAvailability.objects.filter(doctor_id=doctor.id).only(
-            "day_of_week", "start_time", "end_time"
-        )
-        availability_by_dayname = {a.day_of_week: a for a in avail_qs}
-
-        blocking_statuses = ["pending", "Pending", "confirmed", "Confirmed"]
-
-        range_start_dt = timezone.make_aware(datetime.combine(start_date, datetime.min.time()), tz)
-        range_end_dt = timezone.make_aware(datetime.combine(end_date, datetime.max.time()), tz)
-
-        absences_qs = DoctorAbsence.objects.filter(
-            doctor_id=doctor.id,
-            start_time__lt=range_end_dt,
-            end_time__gt=range_start_dt,
-        ).only("start_time", "end_time")
-
-        existing = Appointment.objects.filter(
-            doctor_id=doctor.id,
-            status__in=blocking_statuses,
-            date_time__lt=range_end_dt,
-            date_time__gte=range_start_dt - timedelta(days=1),
-        ).only("date_time", "duration_minutes")
-
-        intervals_by_date = defaultdict(list)
-
-        for ap in existing:
-            ap_start = ap.date_time
-            if timezone.is_naive(ap_start):
-                ap_start = timezone.make_aware(ap_start, tz)
-            else:
-                ap_start = ap_start.astimezone(tz)
-
-            ap_dur = int(ap.duration_minutes or 0) or default_minutes
-            ap_end = ap_start + timedelta(minutes=ap_dur)
-
-            cur_date = ap_start.date()
-            end_touch = ap_end.date()
-            while cur_date <= end_touch:
-                intervals_by_date[cur_date].append((ap_start, ap_end))
-                cur_date = cur_date + timedelta(days=1)
+        # Cached per doctor/range (single-flight, invalidated by signals)
+        schedule = get_doctor_schedule(doctor.id, start_date, end_date)
+        availability_by_dayname = schedule["availability"]
 
-        for ab in absences_qs:
-            ab_start = ab.start_time
-            ab_end = ab.end_time
-
-            if timezone.is_naive(ab_start):
-                ab_start = timezone.make_aware(ab_start, tz)
-            else:
-                ab_start = ab_start.astimezone(tz)
-
-            if timezone.is_naive(ab_end):
-                ab_end = timezone.make_aware(ab_end, tz)
-            else:
-                ab_end = ab_end.astimezone(tz)
-
-            cur_date = ab_start.date()
-            end_touch = ab_end.date()
-            while cur_date <= end_touch:
-                intervals_by_date[cur_date].append((ab_start, ab_end))
-                cur_date = cur_date + timedelta(days=1)
+        # Slots held by other patients are hidden (own hold stays visible)
+        held = held_intervals(doctor.id, exclude_patient_id=request.user.id)
 
         def compute_day_slots(day_date):
             day_name = day_date.strftime("%A")
@@ -1194,86 +1259,32 @@ class DoctorAvailableSlotsRangeView(APIView):
                     "slots": [],
                 }
 
-            start_dt = timezone.make_aware(
-                datetime.combine(day_date, availability.start_time), tz
-            )
-            end_dt = timezone.make_aware(
-                datetime.combine(day_date, availability.end_time), tz
-            )
-
             # Clamp لليوم الحالي
-            if day_date == now_local.date() and now_local > start_dt:
-                start_dt = now_local.replace(second=0, microsecond=0)
+            start_dt, end_dt = day_window(day_date, availability, now_local)
 
             # إذا صار الدوام غير صالح بعد الـ clamp → نعيد اليوم مع slots فارغة
             if start_dt >= end_dt:
                 return {
                     "date": day_date.isoformat(),
                     "availability": {
-                        "start": availability.start_time.strftime("%H:%M"),
-                        "end": availability.end_time.strftime("%H:%M"),
+                        "start": availability[0].strftime("%H:%M"),
+                        "end": availability[1].strftime("%H:%M"),
                     },
                     "slots": [],
                 }
 
-            raw_intervals = intervals_by_date.get(day_date, [])
-            intervals = []
+            intervals = busy_intervals(schedule, start_dt, end_dt, default_minutes)
 
-            for a_start, a_end in raw_intervals:
-                if timezone.is_naive(a_start):
-                    a_start = timezone.make_aware(a_start, tz)
-                else:
-                    a_start = a_start.astimezone(tz)
-
-                if timezone.is_naive(a_end):
-                    a_end = timezone.make_aware(a_end, tz)
-                else:
-                    a_end = a_end.astimezone(tz)
-
-                if a_start < start_dt:
-                    a_start = start_dt
-                if a_end > end_dt:
-                    a_end = end_dt
-
-                if a_start < a_end:
-                    intervals.append((a_start, a_end))
-
-            intervals.sort(key=lambda x: x[0])
-
-            def find_first_overlap(a_start, a_end):
-                for b_start, b_end in intervals:
-                    if b_start < a_end and a_start < b_end:
-                        return (b_start, b_end)
-                return None
-
-            slots = []
-            step = timedelta(minutes=duration_minutes)
-            cursor = start_dt.replace(second=0, microsecond=0)
-
-            while cursor + step <= end_dt:
-                candidate_end = cursor + step
-                hit = find_first_overlap(cursor, candidate_end)
-
-                if hit is None:
-                    slots.append(cursor.strftime("%H:%M"))
-                    cursor = cursor + step
-                    continue
-
-                _, hit_end = hit
-                jump_to = hit_end.replace(second=0, microsecond=0)
-
-                if jump_to <= cursor:
-                    jump_to = cursor + step
-
-                cursor = jump_to
-                if cursor >= end_dt:
-                    break
+            slots = [
+                s.strftime("%H:%M")
+                for s in free_slots(start_dt, end_dt, intervals, duration_minutes, held)
+            ]
 
             return {
                 "date": day_date.isoformat(),
                 "availability": {
-                    "start": availability.start_time.strftime("%H:%M"),
-                    "end": availability.end_time.strftime("%H:%M"),
+                    "start": availability[0].strftime("%H:%M"),
+                    "end": availability[1].strftime("%H:%M"),
                 },
                 "slots": slots,
             }
@@ -1281,17 +1292,12 @@ class DoctorAvailableSlotsRangeView(APIView):
         # Optional: Rebooking priority info (patient only)
         priority = None
         if getattr(request.user, "role", "") == "patient":
-            tok = RebookingPriorityToken.objects.filter(
-                patient_id=request.user.id,
-                doctor_id=doctor.id,
-                is_active=True,
-                expires_at__gt=timezone.now(),
-            ).order_by("-issued_at").first()
+            token_expires_at = rebooking_tokens.active_expiry(request.user.id, doctor.id)
 
-            if tok:
+            if token_expires_at:
                 priority = {
                     "active": True,
-                    "expires_at": tok.expires_at.astimezone(tz).isoformat(),
+                    "expires_at": token_expires_at.astimezone(tz).isoformat(),
                 }
 
         # IMPORTANT: return ALL days in range (including empty slots days)
@@ -1515,6 +1521,7 @@ class MyAppointmentsView(APIView):
                     "date_time": ap.date_time.astimezone(tz).isoformat(),
                     "duration_minutes": ap.duration_minutes,
                     "status": ap.status,
+                    "version": ap.version,
                     "notes": ap.notes,
                     "created_at": ap.created_at.astimezone(tz).isoformat(),
                     "has_any_orders": has_any_orders,
@@ -1682,7 +1689,7 @@ class EmergencyAbsenceCreateView(APIView):
             status__in=blocking_statuses,
             date_time__lt=absence.end_time,
             date_time__gte=absence.start_time - timedelta(days=1),
-        ).only("id", "patient_id", "date_time", "duration_minutes", "status")
+        ).only("id", "patient_id", "doctor_id", "date_time", "duration_minutes", "status")
 
         affected = []
         for ap in qs:
@@ -1709,6 +1716,7 @@ class EmergencyAbsenceCreateView(APIView):
             ap.status = "cancelled"
             ap.save(update_fields=["status", "updated_at"])
             cancelled_ids.append(ap.id)
+            urgent_matcher.schedule_match(ap)
 
             AbsenceCancellationLog.objects.create(absence=absence, appointment=ap)
 
@@ -0,0 +1,235 @@
+"""
+Medication adherence: listing projection, rollups and offline sync.
+
+- with_projection(): annotates the fields the adherence serializer shows
+  (medicine / dosage / frequency / prescription / appointment / patient display
+  name) so a listing is one joined SELECT and no per-row traversal.
+- rollups(): taken / skipped counts and rates per prescription item per day or
+  week, computed by the DB (GROUP BY) and cached per patient. The per-patient
+  version stamp is bumped on commit of any adherence write (clinical/signals.py).
+- sync_entries(): offline batch replay keyed by client UUIDs; a fixed number of
+  queries per batch whatever its size.
+"""
+from __future__ import annotations
+
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import CharField, Count, F, Q, Value
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf, TruncDate, TruncWeek
+from django.utils import timezone
+from rest_framework import serializers
+
+from appointments.services.caching import bump_version, get_version, single_flight
+
+from .models import MedicationAdherence, PrescriptionItem
+
+
+PERIODS = ("day", "week")
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 365
+ROLLUPS_CACHE_TTL_SECONDS = 10 * 60
+
+SYNC_MAX_ENTRIES = 500
+
+
+def with_projection(qs):
+    return qs.annotate(
+        medicine_name=F("prescription_item__medicine_name"),
+        dosage=F("prescription_item__dosage"),
+        frequency=F("prescription_item__frequency"),
+        prescription_id=F("prescription_item__prescription_id"),
+        appointment_id=F("prescription_item__prescription__appointment_id"),
+        patient_display_name=Coalesce(
+            NullIf(F("patient__username"), Value("")),
+            NullIf(F("patient__email"), Value("")),
+            Concat(Value("Patient #"), Cast("patient_id", output_field=CharField())),
+            output_field=CharField(),
+        ),
+    )
+
+
+# -----------------------------
+# Rollups
+# -----------------------------
+def _version_name(patient_id: int) -> str:
+    return f"adherence:{patient_id}"
+
+
+def invalidate_patient(patient_id: int) -> None:
+    transaction.on_commit(lambda: bump_version(_version_name(patient_id)))
+
+
+def _compute(patient_id: int, period: str, days: int, doctor_id) -> list:
+    since = timezone.now() - timedelta(days=days)
+    trunc = TruncDate("taken_at") if period == "day" else TruncWeek("taken_at")
+
+    qs = MedicationAdherence.objects.filter(patient_id=patient_id, taken_at__gte=since)
+    if doctor_id is not None:
+        qs = qs.filter(prescription_item__prescription__doctor_id=doctor_id)
+
+    rows = (
+        qs.annotate(period_start=trunc)
+        .values("prescription_item_id", "period_start")
+        .annotate(
+            medicine_name=F("prescription_item__medicine_name"),
+            taken=Count("id", filter=Q(status=MedicationAdherence.Status.TAKEN)),
+            skipped=Count("id", filter=Q(status=MedicationAdherence.Status.SKIPPED)),
+            total=Count("id"),
+        )
+        .order_by("prescription_item_id", "period_start")
+    )
+
+    result = []
+    for row in rows:
+        period_start = row["period_start"]
+        if hasattr(period_start, "date"):
+            period_start = timezone.localtime(period_start).date()
+        total = row["total"] or 0
+        result.append(
+            {
+                "prescription_item_id": row["prescription_item_id"],
+                "medicine_name": row["medicine_name"],
+                "period_start": period_start.isoformat(),
+                "taken": row["taken"],
+                "skipped": row["skipped"],
+                "total": total,
+                "taken_rate": round(row["taken"] / total, 4) if total else None,
+            }
+        )
+    return result
+
+
+def rollups(patient_id: int, *, period: str = "day", days: int = DEFAULT_WINDOW_DAYS, doctor_id=None) -> list:
+    """[{prescription_item_id, medicine_name, period_start, taken, skipped, total, taken_rate}]."""
+    version = get_version(_version_name(patient_id))
+    key = f"adherence-rollups:{patient_id}:{version}:{period}:{days}:{doctor_id or 0}"
+    return single_flight(
+        key,
+        lambda: _compute(patient_id, period, days, doctor_id),
+        ttl=ROLLUPS_CACHE_TTL_SECONDS,
+    )
+
+
+# -----------------------------
+# Offline batch sync
+# -----------------------------
+def _parse_entry(raw, taken_at_field, now):
+    """(client_uuid, item_id, status, taken_at) or raises ValueError(errors dict)."""
+    if not isinstance(raw, dict):
+        raise ValueError({"detail": "Entry must be an object."})
+
+    errors = {}
+    client_uuid = item_id = taken_at = None
+
+    try:
+        client_uuid = uuid.UUID(str(raw.get("client_uuid") or ""))
+    except ValueError:
+        errors["client_uuid"] = "A valid UUID is required."
+
+    try:
+        item_id = int(raw.get("prescription_item"))
+    except (TypeError, ValueError):
+        errors["prescription_item"] = "prescription_item must be an integer."
+
+    status = str(raw.get("status") or MedicationAdherence.Status.TAKEN).strip().lower()
+    if status not in MedicationAdherence.Status.values:
+        errors["status"] = f"status must be one of: {', '.join(MedicationAdherence.Status.values)}."
+
+    try:
+        taken_at = taken_at_field.run_validation(raw.get("taken_at"))
+    except serializers.ValidationError as exc:
+        errors["taken_at"] = exc.detail
+    else:
+        if taken_at > now:
+            errors["taken_at"] = "taken_at cannot be in the future."
+
+    if errors:
+        raise ValueError(errors)
+    return client_uuid, item_id, status, taken_at
+
+
+def sync_entries(patient, entries: list) -> tuple[list, int]:
+    """
+    Insert a patient's offline adherence logs.
+    Returns (results in input order, number of rows created); each result is
+    {"index", "client_uuid", "result": created|duplicate|error, "id"?, "errors"?}.
+
+    Queries: owned items (1) + existing UUIDs (1) + bulk insert (1) + ids of the
+    inserted UUIDs (1), regardless of the batch size.
+    """
+    now = timezone.now()
+    taken_at_field = serializers.DateTimeField()
+
+    results = []
+    parsed = []
+    for index, raw in enumerate(entries):
+        try:
+            parsed.append((index, *_parse_entry(raw, taken_at_field, now)))
+            results.append(None)
+        except ValueError as exc:
+            results.append(
+                {
+                    "index": index,
+                    "client_uuid": raw.get("client_uuid") if isinstance(raw, dict) else None,
+                    "result": "error",
+                    "errors": exc.args[0],
+                }
+            )
+
+    if parsed:
+        owned = set(
+            PrescriptionItem.objects.filter(
+                id__in={item_id for _i, _u, item_id, _s, _t in parsed},
+                prescription__patient_id=patient.id,
+            ).values_list("id", flat=True)
+        )
+        existing = dict(
+            MedicationAdherence.objects.filter(
+                patient_id=patient.id,
+                client_uuid__in=[client_uuid for _i, client_uuid, _it, _s, _t in parsed],
+            ).values_list("client_uuid", "id")
+        )
+    else:
+        owned, existing = set(), {}
+
+    to_create = {}
+    for index, client_uuid, item_id, status, taken_at in parsed:
+        result = {"index": index, "client_uuid": str(client_uuid)}
+
+        if item_id not in owned:
+            result.update(result="error", errors={"prescription_item": "Not found."})
+        elif client_uuid in existing:
+            result.update(result="duplicate", id=existing[client_uuid])
+        elif client_uuid in to_create:
+            result.update(result="duplicate")
+        else:
+            result.update(result="created")
+            to_create[client_uuid] = MedicationAdherence(
+                patient_id=patient.id,
+                prescription_item_id=item_id,
+                status=status,
+                taken_at=taken_at,
+                client_uuid=client_uuid,
+            )
+        results[index] = result
+
+    created_ids = {}
+    if to_create:
+        # ignore_conflicts: a concurrent replay of the same UUIDs is not an error
+        MedicationAdherence.objects.bulk_create(to_create.values(), ignore_conflicts=True)
+        created_ids = dict(
+            MedicationAdherence.objects.filter(
+                patient_id=patient.id,
+                client_uuid__in=list(to_create),
+            ).values_list("client_uuid", "id")
+        )
+        # bulk_create skips post_save -> invalidate the rollups here
+        invalidate_patient(patient.id)
+
+    for result in results:
+        if result["result"] != "error" and result.get("id") is None:
+            result["id"] = created_ids.get(uuid.UUID(result["client_uuid"]))
+
+    return results, len(to_create)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ClinicalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clinical'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,144 @@
+"""
+Content-addressed, deduplicated storage for medical record files.
+
+- Content is stored once (in the medical file storage, clinical/storage.py) under
+  medical_records/blobs/<aa>/<key><ext> and tracked by a StoredBlob row with a
+  reference count; MedicalRecordFile.file points at that name. key = content_key():
+  an HMAC of the SHA-256, so file URLs / ETags never reveal the digest itself.
+- The SHA-256 is computed while the bytes stream in: Sha256UploadHandler hashes
+  multipart uploads as Django reads them, and file_digest() hashes any file in chunks.
+- acquire() / release() adjust the count with single UPDATEs; the stored file is
+  deleted (after commit) only when the last reference goes.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.crypto import salted_hmac
+
+from .models import StoredBlob
+from .previews import delete_preview
+from .storage import medical_storage
+
+
+BLOB_PREFIX = "medical_records/blobs"
+CONTENT_KEY_SALT = "clinical.blob-name"
+
+
+class Sha256UploadHandler(FileUploadHandler):
+    """
+    Put first in request.upload_handlers: hashes every uploaded file while it is
+    received and passes the data on untouched. Digests end up in
+    request.upload_sha256 = {field_name: (hexdigest, size)}.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        digests = getattr(self.request, "upload_sha256", None)
+        if digests is None:
+            digests = {}
+            setattr(self.request, "upload_sha256", digests)
+        digests[self.field_name] = (self._hash.hexdigest(), file_size)
+        return None
+
+
+def file_digest(fileobj) -> tuple[str, int]:
+    """(sha256 hex, size) reading fileobj in chunks."""
+    h = hashlib.sha256()
+    size = 0
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    chunks = fileobj.chunks() if hasattr(fileobj, "chunks") else iter(lambda: fileobj.read(64 * 1024), b"")
+    for chunk in chunks:
+        h.update(chunk)
+        size += len(chunk)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    return h.hexdigest(), size
+
+
+def content_key(digest: str) -> str:
+    """Public stand-in for a SHA-256 (names, ETags): keyed, so it cannot be derived from content."""
+    return salted_hmac(CONTENT_KEY_SALT, digest, algorithm="sha256").hexdigest()
+
+
+def blob_name(digest: str, filename: str = "", *, suffix: str = "") -> str:
+    ext = os.path.splitext(filename or "")[1].lower()[:10]
+    key = content_key(digest)
+    return f"{BLOB_PREFIX}/{key[:2]}/{key}{suffix}{ext}"
+
+
+def _add_ref(digest: str) -> StoredBlob | None:
+    if StoredBlob.objects.filter(sha256=digest).update(ref_count=F("ref_count") + 1):
+        return StoredBlob.objects.get(sha256=digest)
+    return None
+
+
+def reference(digest: str) -> StoredBlob | None:
+    """One more reference to already-stored content, or None if it is not stored."""
+    return _add_ref(digest)
+
+
+def acquire(fileobj, *, filename: str = "", digest: str | None = None, size: int | None = None) -> StoredBlob:
+    """
+    Reference to the blob holding fileobj's bytes (stored now only if new).
+    Pass digest/size when already computed while streaming.
+    """
+    if digest is None or size is None:
+        digest, size = file_digest(fileobj)
+
+    blob = _add_ref(digest)
+    if blob is not None:
+        return blob
+
+    name = medical_storage().save(blob_name(digest, filename), fileobj)
+    try:
+        with transaction.atomic():
+            return StoredBlob.objects.create(sha256=digest, size=size, name=name, ref_count=1)
+    except IntegrityError:
+        # Same content stored concurrently -> keep theirs
+        medical_storage().delete(name)
+        return _add_ref(digest)
+
+
+def adopt(name: str, *, digest: str, size: int) -> tuple[StoredBlob, bool]:
+    """
+    Register an already-stored file as a blob (backfill). Returns (blob, created);
+    created=False means identical content already existed and `name` is now redundant.
+    """
+    blob = _add_ref(digest)
+    if blob is not None:
+        return blob, False
+    try:
+        with transaction.atomic():
+            return StoredBlob.objects.create(sha256=digest, size=size, name=name, ref_count=1), True
+    except IntegrityError:
+        return _add_ref(digest), False
+
+
+def release(blob_id: int) -> None:
+    """Drop one reference; delete the content when none are left."""
+    StoredBlob.objects.filter(id=blob_id, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+
+    name = StoredBlob.objects.filter(id=blob_id, ref_count=0).values_list("name", flat=True).first()
+    if name is None:
+        return
+    # Single DELETE guarded by ref_count=0: a concurrent acquire() wins over us
+    if StoredBlob.objects.filter(id=blob_id, ref_count=0).delete()[0]:
+        transaction.on_commit(lambda: _delete_content(name))
+
+
+def _delete_content(name: str) -> None:
+    medical_storage().delete(name)
+    delete_preview(medical_storage(), name)
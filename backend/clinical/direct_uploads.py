@@ -0,0 +1,166 @@
+"""
+Direct-to-storage uploads for MedicalRecordFile (storages with presigned URLs, clinical/storage.py).
+
+- initiate(): the client announces filename, size and SHA-256 and gets a presigned PUT
+  for a fresh name (one per upload) plus a signed upload_id. Knowing a digest proves
+  nothing, so the bytes are always uploaded, except when the same patient already
+  has a file with that content (then the new MedicalRecordFile is created at once).
+- The object store checks the body against the SHA-256 (S3 ChecksumSHA256; the local
+  "signed" stand-in hashes while it writes, see receive_signed_put()).
+- complete(upload_id): registers the uploaded object as a blob (clinical/blobs.py), or
+  drops it when identical content is already stored, and creates the
+  MedicalRecordFile. The API node never handles the bytes.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import secrets
+
+from django.core import signing
+from django.core.files.base import File
+from django.db import transaction
+
+from . import blobs
+from .models import MedicalRecordFile
+from .storage import medical_storage, presign_expires, supports_presigned
+from .uploads import UploadError, max_upload_bytes
+
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+UPLOAD_ID_SALT = "clinical.direct-upload"
+# complete() may come a while after the PUT (slow networks, app in background)
+COMPLETE_GRACE_SECONDS = 3600
+
+READ_BLOCK = 64 * 1024
+
+
+def _clean(filename, sha256) -> tuple[str, str]:
+    filename = os.path.basename((filename or "").strip())[:255]
+    if not filename:
+        raise UploadError("filename is required.")
+    digest = (sha256 or "").strip().lower()
+    if not _SHA256_RE.match(digest):
+        raise UploadError("sha256 must be 64 hex characters.")
+    return filename, digest
+
+
+def _create_file(*, order, filename: str, blob) -> MedicalRecordFile:
+    return MedicalRecordFile.objects.create(
+        order_id=order.id,
+        patient_id=order.patient_id,
+        original_filename=filename,
+        file=blob.name,
+        blob=blob,
+    )
+
+
+def initiate(*, order, filename, size: int, sha256) -> tuple[MedicalRecordFile | None, dict | None]:
+    """(file, None) when this patient already has the content, else (None, upload instructions)."""
+    storage = medical_storage()
+    if not supports_presigned(storage):
+        raise UploadError("Direct uploads are not available with this storage.", status=501)
+
+    filename, digest = _clean(filename, sha256)
+    if size <= 0:
+        raise UploadError("size must be a positive integer.")
+    if size > max_upload_bytes():
+        raise UploadError(f"File too large (max {max_upload_bytes()} bytes).", status=413)
+
+    if MedicalRecordFile.objects.filter(patient_id=order.patient_id, blob__sha256=digest).exists():
+        with transaction.atomic():
+            blob = blobs.reference(digest)
+            if blob is not None:
+                return _create_file(order=order, filename=filename, blob=blob), None
+
+    # A fresh name per upload: nothing already stored can satisfy the PUT
+    name = blobs.blob_name(digest, filename, suffix="-" + secrets.token_hex(8))
+    url, headers = storage.presigned_put(name, sha256_hex=digest)
+    upload_id = signing.dumps({"n": name, "h": digest, "o": order.id, "f": filename}, salt=UPLOAD_ID_SALT)
+    return None, {
+        "upload_url": url,
+        "method": "PUT",
+        "headers": headers,
+        "expires_in": presign_expires(),
+        "upload_id": upload_id,
+        "filename": filename,
+    }
+
+
+def _read_upload_id(upload_id, order) -> dict:
+    try:
+        payload = signing.loads(
+            str(upload_id or ""),
+            salt=UPLOAD_ID_SALT,
+            max_age=presign_expires() + COMPLETE_GRACE_SECONDS,
+        )
+    except signing.BadSignature:
+        raise UploadError("Invalid or expired upload_id.")
+    if payload.get("o") != order.id:
+        raise UploadError("Invalid or expired upload_id.")
+    return payload
+
+
+def complete(*, order, upload_id) -> MedicalRecordFile:
+    storage = medical_storage()
+    if not supports_presigned(storage):
+        raise UploadError("Direct uploads are not available with this storage.", status=501)
+
+    payload = _read_upload_id(upload_id, order)
+    name, digest = payload["n"], payload["h"]
+    if not storage.exists(name):
+        raise UploadError("Upload not received yet.", status=409)
+    size = storage.size(name)
+    if size > max_upload_bytes():
+        storage.delete(name)
+        raise UploadError(f"File too large (max {max_upload_bytes()} bytes).", status=413)
+
+    with transaction.atomic():
+        blob, created = blobs.adopt(name, digest=digest, size=size)
+        if not created and blob.name != name:
+            # The verified bytes are already stored -> keep one copy
+            transaction.on_commit(lambda: storage.delete(name))
+        return _create_file(order=order, filename=payload["f"], blob=blob)
+
+
+# -----------------------------
+# Local stand-in: PUT on a signed URL
+# -----------------------------
+class _HashingBody(File):
+    """Request body limited to `length` bytes, hashed while the storage reads it."""
+
+    def __init__(self, stream, length: int):
+        super().__init__(stream)
+        self.length = length
+        self.received = 0
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        while self.received < self.length:
+            block = self.file.read(min(chunk_size or READ_BLOCK, self.length - self.received))
+            if not block:
+                break
+            self.received += len(block)
+            self.sha256.update(block)
+            yield block
+
+
+def receive_signed_put(storage, payload: dict, *, stream, length: int) -> None:
+    """Store the body under the signed name if it matches the signed SHA-256."""
+    if length <= 0:
+        raise UploadError("Content-Length is required.", status=411)
+    if length > max_upload_bytes():
+        raise UploadError(f"File too large (max {max_upload_bytes()} bytes).", status=413)
+
+    name = payload["n"]
+    if storage.exists(name):
+        # One name per upload, only written after the check below: a retried PUT
+        return
+
+    body = _HashingBody(stream, length)
+    saved = storage.save(name, body)
+    if body.received != length or body.sha256.hexdigest() != payload["h"] or saved != name:
+        storage.delete(saved)
+        raise UploadError("Body does not match the signed SHA-256.")
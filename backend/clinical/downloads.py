@@ -0,0 +1,197 @@
+"""
+Serving MedicalRecordFile content after the permission check.
+
+MEDICAL_FILE_SENDFILE selects who moves the bytes:
+- "nginx":  empty response + X-Accel-Redirect: <MEDICAL_FILE_ACCEL_PREFIX><file name>
+            (an `internal` location aliased to MEDIA_ROOT)
+- "apache": empty response + X-Sendfile: <absolute path> (mod_xsendfile / lighttpd)
+- "redirect": 302 to a short-lived presigned URL of the storage (clinical/storage.py),
+  so the object store serves the bytes; the default for storages without local paths.
+- "" (default): streamed by Django in blocks, with single-range Range requests
+  (206 / 416) and conditional GET (ETag / Last-Modified -> 304).
+
+serve(..., preview=True) sends the generated preview image instead (clinical/previews.py).
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from .blobs import content_key
+from .previews import preview_content_type, preview_name
+from .storage import has_local_path, supports_presigned
+
+
+STREAM_BLOCK = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def sendfile_backend() -> str:
+    return (getattr(settings, "MEDICAL_FILE_SENDFILE", "") or "").strip().lower()
+
+
+def accel_prefix() -> str:
+    prefix = getattr(settings, "MEDICAL_FILE_ACCEL_PREFIX", "/protected-media/") or "/protected-media/"
+    return prefix if prefix.endswith("/") else prefix + "/"
+
+
+def _use_redirect(storage) -> bool:
+    backend = sendfile_backend()
+    if backend == "redirect":
+        return supports_presigned(storage)
+    return backend == "" and supports_presigned(storage) and not has_local_path(storage)
+
+
+def _etag(record_file) -> str:
+    blob = getattr(record_file, "blob", None)
+    if blob is not None:
+        return f'"{content_key(blob.sha256)}"'
+    return f'"f{record_file.id}-{int(record_file.uploaded_at.timestamp())}"'
+
+
+def _content_type(record_file) -> str:
+    guessed, _ = mimetypes.guess_type(record_file.original_filename or record_file.file.name)
+    return guessed or "application/octet-stream"
+
+
+def _disposition(record_file, attachment: bool) -> str:
+    filename = record_file.original_filename or os.path.basename(record_file.file.name)
+    kind = "attachment" if attachment else "inline"
+    return f"{kind}; filename*=UTF-8''{quote(filename)}"
+
+
+def parse_range(header: str, size: int):
+    """(start, end) inclusive for a single satisfiable range, None = whole file, False = 416."""
+    match = _RANGE_RE.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_range(fh, start: int, length: int):
+    try:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = fh.read(min(STREAM_BLOCK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        fh.close()
+
+
+def serve(request, record_file, *, attachment: bool = False, preview: bool = False):
+    storage = record_file.file.storage
+    if preview:
+        name = preview_name(record_file.file.name)
+        content_type = preview_content_type()
+        etag = _etag(record_file)[:-1] + '-preview"'
+    else:
+        name = record_file.file.name
+        content_type = _content_type(record_file)
+        etag = _etag(record_file)
+    last_modified = int(record_file.uploaded_at.timestamp())
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    if _use_redirect(storage):
+        filename = None if preview else (record_file.original_filename or os.path.basename(name))
+        response = HttpResponseRedirect(
+            storage.presigned_url(name, filename=filename, content_type=content_type)
+        )
+        response["Cache-Control"] = "private, no-store"
+        return response
+
+    backend = sendfile_backend()
+    if backend in ("nginx", "apache"):
+        response = HttpResponse(content_type=content_type)
+        if backend == "nginx":
+            response["X-Accel-Redirect"] = accel_prefix() + quote(name)
+        else:
+            response["X-Sendfile"] = storage.path(name)
+    else:
+        response = _stream(request, storage, name, content_type, etag, last_modified)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    if not preview:
+        response["Content-Disposition"] = _disposition(record_file, attachment)
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _stream(request, storage, name: str, content_type: str, etag: str, last_modified: int):
+    size = storage.size(name)
+    byte_range = parse_range(request.headers.get("Range", ""), size)
+
+    # If-Range: only honour the range when the client's copy is still current
+    if_range = request.headers.get("If-Range", "").strip()
+    if byte_range and if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+
+    response = StreamingHttpResponse(
+        _iter_range(storage.open(name, "rb"), start, length),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+    )
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def serve_signed(request, storage, payload: dict):
+    """GET on a presigned URL of the local "signed" storage (clinical/storage.py)."""
+    name = payload["n"]
+    if not storage.exists(name):
+        return HttpResponse(status=404)
+
+    content_type = payload.get("t") or mimetypes.guess_type(name)[0] or "application/octet-stream"
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    etag = f'"{os.path.basename(name)}-{last_modified}"'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = _stream(request, storage, name, content_type, etag, last_modified)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    if payload.get("f"):
+        response["Content-Disposition"] = f"inline; filename*=UTF-8''{quote(payload['f'])}"
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,140 @@
+"""
+Doctor <-> patient relationship lookups (DoctorPatientLink).
+
+doctor_is_linked() is one unique-index lookup, memoized on the request object
+so repeated checks inside the same request cost nothing.
+
+A pair is linked while at least one source remains: an order, a prescription or a
+non-cancelled appointment. record_link() adds a reason on create; refresh_link()
+recounts the sources after a delete / cancellation and drops the row when none is left.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Max
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from accounts.models import Appointment
+
+from .models import ClinicalOrder, DoctorPatientLink, Prescription
+
+
+def record_link(*, doctor_id: int, patient_id: int, reason: int, seen_at=None) -> None:
+    """Upsert the pair: OR the reason bit in, widen first/last_seen."""
+    if not doctor_id or not patient_id:
+        return
+    seen_at = seen_at or timezone.now()
+
+    updated = DoctorPatientLink.objects.filter(doctor_id=doctor_id, patient_id=patient_id).update(
+        reasons=F("reasons").bitor(reason),
+        first_seen=Least(F("first_seen"), seen_at),
+        last_seen=Greatest(F("last_seen"), seen_at),
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            DoctorPatientLink.objects.create(
+                doctor_id=doctor_id,
+                patient_id=patient_id,
+                reasons=reason,
+                first_seen=seen_at,
+                last_seen=seen_at,
+            )
+    except IntegrityError:
+        # Created concurrently -> merge into it
+        record_link(doctor_id=doctor_id, patient_id=patient_id, reason=reason, seen_at=seen_at)
+
+
+def _sources():
+    return [
+        (ClinicalOrder.objects.all(), DoctorPatientLink.REASON_ORDER),
+        (Prescription.objects.all(), DoctorPatientLink.REASON_PRESCRIPTION),
+        # a cancelled appointment is no relationship
+        (Appointment.objects.exclude(status="cancelled"), DoctorPatientLink.REASON_APPOINTMENT),
+    ]
+
+
+def refresh_link(*, doctor_id: int, patient_id: int) -> None:
+    """Recompute the pair's reasons from its sources; delete the link when none remains."""
+    if not doctor_id or not patient_id:
+        return
+
+    reasons = 0
+    for manager, reason in _sources():
+        if manager.filter(doctor_id=doctor_id, patient_id=patient_id).exists():
+            reasons |= reason
+
+    links = DoctorPatientLink.objects.filter(doctor_id=doctor_id, patient_id=patient_id)
+    if reasons:
+        links.exclude(reasons=reasons).update(reasons=reasons)
+    else:
+        links.delete()
+
+
+def doctor_is_linked(*, doctor_id: int, patient_id: int, request=None) -> bool:
+    cache = None
+    if request is not None:
+        cache = getattr(request, "_doctor_patient_links", None)
+        if cache is None:
+            cache = {}
+            setattr(request, "_doctor_patient_links", cache)
+        key = (int(doctor_id), int(patient_id))
+        if key in cache:
+            return cache[key]
+
+    linked = DoctorPatientLink.objects.filter(doctor_id=doctor_id, patient_id=patient_id).exists()
+
+    if cache is not None:
+        cache[key] = linked
+    return linked
+
+
+def backfill_links() -> int:
+    """
+    Rebuild every pair from orders, prescriptions and appointments and drop links
+    with no source left. Returns pair count.
+    """
+    pairs = {}
+    for manager, reason in _sources():
+        rows = (
+            manager.values("doctor_id", "patient_id")
+            .annotate(first=Min("created_at"), last=Max("created_at"))
+            .order_by()
+        )
+        for row in rows:
+            key = (row["doctor_id"], row["patient_id"])
+            cur = pairs.get(key)
+            if cur is None:
+                pairs[key] = [reason, row["first"], row["last"]]
+            else:
+                cur[0] |= reason
+                cur[1] = min(cur[1], row["first"])
+                cur[2] = max(cur[2], row["last"])
+
+    links = [
+        DoctorPatientLink(
+            doctor_id=doctor_id,
+            patient_id=patient_id,
+            reasons=reasons,
+            first_seen=first,
+            last_seen=last,
+        )
+        for (doctor_id, patient_id), (reasons, first, last) in pairs.items()
+    ]
+    DoctorPatientLink.objects.bulk_create(
+        links,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["doctor", "patient"],
+        update_fields=["reasons", "first_seen", "last_seen"],
+    )
+
+    stale = [
+        pk
+        for pk, doctor_id, patient_id in DoctorPatientLink.objects.values_list("id", "doctor_id", "patient_id").iterator()
+        if (doctor_id, patient_id) not in pairs
+    ]
+    for start in range(0, len(stale), 500):
+        DoctorPatientLink.objects.filter(id__in=stale[start:start + 500]).delete()
+    return len(links)
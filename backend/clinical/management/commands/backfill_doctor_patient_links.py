@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from clinical.links import backfill_links
+
+
+class Command(BaseCommand):
+    help = "Rebuild DoctorPatientLink rows from existing orders, prescriptions and appointments."
+
+    def handle(self, *args, **options):
+        count = backfill_links()
+        self.stdout.write(self.style.SUCCESS(f"Doctor-patient links backfilled: {count} pairs"))
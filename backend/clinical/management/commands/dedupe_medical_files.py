@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from clinical.blobs import adopt, file_digest
+from clinical.models import MedicalRecordFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Move medical record files stored before dedup into content-addressed blobs: "
+        "the first copy of each content is adopted in place, later copies are deleted."
+    )
+
+    def handle(self, *args, **options):
+        adopted = removed = missing = 0
+
+        qs = MedicalRecordFile.objects.filter(blob__isnull=True).exclude(file="").order_by("id")
+        for record_file in qs.iterator():
+            storage = record_file.file.storage
+            name = record_file.file.name
+            if not storage.exists(name):
+                missing += 1
+                continue
+
+            with storage.open(name, "rb") as fh:
+                digest, size = file_digest(fh)
+
+            blob, created = adopt(name, digest=digest, size=size)
+            MedicalRecordFile.objects.filter(id=record_file.id).update(blob=blob, file=blob.name)
+
+            if created:
+                adopted += 1
+            elif name != blob.name:
+                storage.delete(name)
+                removed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Blobs adopted: {adopted}, duplicate copies removed: {removed}, missing files: {missing}"
+            )
+        )
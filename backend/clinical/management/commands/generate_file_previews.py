@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from clinical.models import MedicalRecordFile
+from clinical.previews import generate
+
+
+class Command(BaseCommand):
+    help = "Queue preview generation for medical record files that have none yet."
+
+    def handle(self, *args, **options):
+        count = 0
+        for record_file in MedicalRecordFile.objects.filter(has_preview=False).exclude(file="").iterator():
+            generate(record_file)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Preview generation queued for {count} files"))
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from clinical.uploads import purge_stale
+
+
+class Command(BaseCommand):
+    help = "Delete unfinished chunked uploads (and their temp parts) idle for longer than --hours."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24)
+
+    def handle(self, *args, **options):
+        count = purge_stale(timezone.now() - timedelta(hours=options["hours"]))
+        self.stdout.write(self.style.SUCCESS(f"Stale chunked uploads removed: {count}"))
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+# Frozen copy of clinical.links.backfill_links as of this migration: later changes
+# to the helper or the REASON_* constants must not change what this step does.
+REASON_ORDER = 1
+REASON_PRESCRIPTION = 2
+REASON_APPOINTMENT = 4
+
+
+def backfill(apps, schema_editor):
+    DoctorPatientLink = apps.get_model("clinical", "DoctorPatientLink")
+    sources = [
+        (apps.get_model("clinical", "ClinicalOrder"), REASON_ORDER),
+        (apps.get_model("clinical", "Prescription"), REASON_PRESCRIPTION),
+        (apps.get_model("accounts", "Appointment"), REASON_APPOINTMENT),
+    ]
+
+    pairs = {}
+    for model, reason in sources:
+        rows = (
+            model.objects.values("doctor_id", "patient_id")
+            .annotate(first=Min("created_at"), last=Max("created_at"))
+            .order_by()
+        )
+        for row in rows:
+            key = (row["doctor_id"], row["patient_id"])
+            cur = pairs.get(key)
+            if cur is None:
+                pairs[key] = [reason, row["first"], row["last"]]
+            else:
+                cur[0] |= reason
+                cur[1] = min(cur[1], row["first"])
+                cur[2] = max(cur[2], row["last"])
+
+    DoctorPatientLink.objects.bulk_create(
+        [
+            DoctorPatientLink(
+                doctor_id=doctor_id,
+                patient_id=patient_id,
+                reasons=reasons,
+                first_seen=first,
+                last_seen=last,
+            )
+            for (doctor_id, patient_id), (reasons, first, last) in pairs.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["doctor", "patient"],
+        update_fields=["reasons", "first_seen", "last_seen"],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_hospital_lab_directory_indexes'),
+        ('clinical', '0003_advicefeedback_advicerun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorPatientLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reasons', models.PositiveSmallIntegerField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_links', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doctor_links', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'patient'), name='uniq_doctor_patient_link')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_hospital_lab_directory_indexes'),
+        ('clinical', '0004_doctorpatientlink'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clinicalorder',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='order_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicationadherence',
+            index=models.Index(fields=['patient', '-taken_at', '-id'], name='adherence_patient_taken_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='rx_patient_created_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinical', '0005_record_section_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecordfile',
+            index=models.Index(fields=['patient', '-uploaded_at', '-id'], name='file_patient_uploaded_idx'),
+        ),
+    ]
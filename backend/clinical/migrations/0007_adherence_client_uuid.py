@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinical', '0006_file_patient_timeline_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationadherence',
+            name='client_uuid',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='medicationadherence',
+            constraint=models.UniqueConstraint(fields=('patient', 'client_uuid'), name='uniq_adherence_patient_client_uuid'),
+        ),
+    ]
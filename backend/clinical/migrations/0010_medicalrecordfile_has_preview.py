@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinical', '0009_storedblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecordfile',
+            name='has_preview',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:47
+
+import clinical.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinical', '0010_medicalrecordfile_has_preview'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicalrecordfile',
+            name='file',
+            field=models.FileField(storage=clinical.storage.medical_storage, upload_to='medical_records/'),
+        ),
+    ]
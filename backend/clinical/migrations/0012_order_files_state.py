@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+
+def backfill_files_state(apps, schema_editor):
+    ClinicalOrder = apps.get_model("clinical", "ClinicalOrder")
+    MedicalRecordFile = apps.get_model("clinical", "MedicalRecordFile")
+
+    files = MedicalRecordFile.objects.filter(order_id=OuterRef("pk"))
+    ClinicalOrder.objects.update(
+        files_state=Case(
+            When(~Exists(files), then=Value("no_files")),
+            When(Exists(files.exclude(review_status="approved")), then=Value("pending")),
+            default=Value("approved"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_appointment_patient_timeline_index'),
+        ('clinical', '0011_medical_file_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clinicalorder',
+            name='files_state',
+            field=models.CharField(choices=[('no_files', 'No files'), ('pending', 'Pending'), ('approved', 'Approved')], default='no_files', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='clinicalorder',
+            index=models.Index(fields=['doctor', 'patient', 'status', 'files_state'], name='order_pair_files_state_idx'),
+        ),
+        migrations.RunPython(backfill_files_state, migrations.RunPython.noop),
+    ]
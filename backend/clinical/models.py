@@ -1,6 +1,10 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
+
+from .storage import medical_storage
 from .models_advice import AdviceRun, AdviceFeedback
 
 class ClinicalOrder(models.Model):
@@ -13,6 +17,11 @@ class ClinicalOrder(models.Model):
         FULFILLED = "fulfilled", "Fulfilled"
         CANCELLED = "cancelled", "Cancelled"
 
+    class FilesState(models.TextChoices):
+        NO_FILES = "no_files", "No files"
+        PENDING = "pending", "Pending"      # at least one file not approved (pending / rejected)
+        APPROVED = "approved", "Approved"   # files present and all approved
+
     doctor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -34,6 +43,13 @@ class ClinicalOrder(models.Model):
         default=Status.OPEN,
     )
 
+    # Readiness of the uploaded files, kept in sync by clinical/readiness.py
+    files_state = models.CharField(
+        max_length=16,
+        choices=FilesState.choices,
+        default=FilesState.NO_FILES,
+    )
+
     # Optional future link (out of scope logic now)
     appointment = models.ForeignKey(
         "accounts.Appointment",
@@ -46,10 +62,35 @@ class ClinicalOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # record aggregation: keyset pages newest first per patient
+            models.Index(fields=["patient", "-created_at", "-id"], name="order_patient_created_idx"),
+            # confirm_appointment follow-up gate: open orders of the pair not ready yet
+            models.Index(fields=["doctor", "patient", "status", "files_state"], name="order_pair_files_state_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.order_category} - {self.title}"
 
 
+class StoredBlob(models.Model):
+    """
+    Content-addressed file content (one copy per SHA-256), shared by every
+    MedicalRecordFile with the same bytes. ref_count = number of rows pointing at it;
+    the stored file is deleted when it drops to zero (clinical/blobs.py).
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()
+    name = models.CharField(max_length=255)  # storage name
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Blob {self.sha256[:12]} x{self.ref_count}"
+
+
 class MedicalRecordFile(models.Model):
     class ReviewStatus(models.TextChoices):
         PENDING = "pending", "Pending"
@@ -68,9 +109,21 @@ class MedicalRecordFile(models.Model):
         related_name="medical_record_files",
     )
 
-    file = models.FileField(upload_to="medical_records/")
+    file = models.FileField(upload_to="medical_records/", storage=medical_storage)
     original_filename = models.CharField(max_length=255, blank=True)
 
+    # Shared content (file.name == blob.name); null for files stored before dedup
+    blob = models.ForeignKey(
+        StoredBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="files",
+    )
+
+    # True once a small preview image exists next to the file (clinical/previews.py)
+    has_preview = models.BooleanField(default=False)
+
     review_status = models.CharField(
         max_length=16,
         choices=ReviewStatus.choices,
@@ -89,10 +142,61 @@ class MedicalRecordFile(models.Model):
 
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # patient timeline: newest first per patient
+            models.Index(fields=["patient", "-uploaded_at", "-id"], name="file_patient_uploaded_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"File #{self.pk} ({self.review_status})"
 
 
+class ChunkedUpload(models.Model):
+    """
+    Resumable upload session for a MedicalRecordFile (initiate -> PUT chunks -> finalize).
+    Bytes go to a temp file under CHUNKED_UPLOAD_DIR; `received` / `checksum`
+    (running adler32 of bytes [0, received)) advance only after a chunk is fully written.
+    """
+
+    class Status(models.TextChoices):
+        OPEN = "open", "Open"
+        COMPLETED = "completed", "Completed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    order = models.ForeignKey(
+        ClinicalOrder,
+        on_delete=models.CASCADE,
+        related_name="chunked_uploads",
+    )
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="chunked_uploads",
+    )
+
+    original_filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    checksum = models.PositiveBigIntegerField(default=1)  # adler32 of empty input
+
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.OPEN)
+    medical_file = models.OneToOneField(
+        MedicalRecordFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="chunked_upload",
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Upload {self.id} ({self.received}/{self.total_size})"
+
+
 class Prescription(models.Model):
     doctor = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -117,6 +221,11 @@ class Prescription(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["patient", "-created_at", "-id"], name="rx_patient_created_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"Rx #{self.pk}"
 
@@ -160,12 +269,67 @@ class MedicationAdherence(models.Model):
     status = models.CharField(max_length=16, choices=Status.choices, default=Status.TAKEN)
     taken_at = models.DateTimeField()
 
+    # UUID generated on the device (offline logging) -> replays are idempotent
+    client_uuid = models.UUIDField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["patient", "client_uuid"],
+                name="uniq_adherence_patient_client_uuid",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["patient", "-taken_at", "-id"], name="adherence_patient_taken_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"Adherence #{self.pk} ({self.status})"
 
 
+class DoctorPatientLink(models.Model):
+    """
+    Materialized "doctor has a clinical relationship with patient" (one row per pair).
+    Maintained by clinical/signals.py + backfill_doctor_patient_links command.
+    A row exists only while an order, prescription or non-cancelled appointment
+    of the pair does (clinical/links.py refresh_link()).
+    """
+
+    REASON_ORDER = 1
+    REASON_PRESCRIPTION = 2
+    REASON_APPOINTMENT = 4
+
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="patient_links",
+    )
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="doctor_links",
+    )
+
+    # bitmask of REASON_* (why they are linked)
+    reasons = models.PositiveSmallIntegerField(default=0)
+
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["doctor", "patient"],
+                name="uniq_doctor_patient_link",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Link doctor={self.doctor_id} patient={self.patient_id} ({self.reasons})"
+
+
 class OutboxEvent(models.Model):
     class Status(models.TextChoices):
         PENDING = "pending", "Pending"
@@ -0,0 +1,173 @@
+"""
+Small JPEG / WebP previews of uploaded medical files (images + first page of PDFs).
+
+- Generated after commit of a new MedicalRecordFile (clinical/signals.py) in a
+  process pool, so neither the upload request nor the worker's GIL pays for decoding.
+- Stored next to the original as "<file name>.preview.<ext>"; deduplicated blobs
+  therefore share one preview, and it goes away with the blob.
+- Optional dependencies: Pillow (images) and PyMuPDF (PDFs). Without them nothing
+  is generated and files simply have no preview.
+- Only storages with local paths (FileSystemStorage) are rendered.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import MedicalRecordFile
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def previews_enabled() -> bool:
+    return bool(getattr(settings, "MEDICAL_FILE_PREVIEWS_ENABLED", True))
+
+
+def preview_format() -> str:
+    fmt = (getattr(settings, "MEDICAL_FILE_PREVIEW_FORMAT", "jpeg") or "jpeg").lower()
+    return "webp" if fmt == "webp" else "jpeg"
+
+
+def preview_name(file_name: str) -> str:
+    ext = "webp" if preview_format() == "webp" else "jpg"
+    return f"{file_name}.preview.{ext}"
+
+
+def preview_content_type() -> str:
+    return "image/webp" if preview_format() == "webp" else "image/jpeg"
+
+
+# -----------------------------
+# Rendering (runs in the pool; no Django access)
+# -----------------------------
+def _is_pdf(path: str) -> bool:
+    with open(path, "rb") as fh:
+        return fh.read(5) == b"%PDF-"
+
+
+def render_preview(src: str, dest: str, max_px: int, fmt: str) -> bool:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return False
+
+    if _is_pdf(src):
+        try:
+            import fitz  # PyMuPDF
+        except ImportError:
+            return False
+        with fitz.open(src) as doc:
+            if doc.page_count == 0:
+                return False
+            page = doc.load_page(0)
+            zoom = max_px / max(page.rect.width, page.rect.height, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    else:
+        try:
+            img = Image.open(src)
+            img.draft("RGB", (max_px, max_px))  # JPEG: decode at reduced scale
+            img = ImageOps.exif_transpose(img)
+        except Exception:
+            return False
+
+    img.thumbnail((max_px, max_px))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    tmp = dest + ".tmp"
+    img.save(tmp, format=fmt.upper(), quality=70)
+    os.replace(tmp, dest)
+    return True
+
+
+# -----------------------------
+# Scheduling (web process)
+# -----------------------------
+def _get_executor():
+    global _executor
+    workers = int(getattr(settings, "MEDICAL_FILE_PREVIEW_WORKERS", 2) or 0)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def _mark_ready(file_name: str) -> None:
+    MedicalRecordFile.objects.filter(file=file_name, has_preview=False).update(has_preview=True)
+
+
+def _on_done(file_name: str, submitter: int, future) -> None:
+    # Normally a pool callback thread, outside any request cycle: its DB connection is
+    # ours to close. A future already done at add_done_callback() runs us in the
+    # submitting (request) thread instead, whose connection must stay open.
+    try:
+        ok = future.result()
+    except Exception:
+        logger.exception("Preview generation failed for %s", file_name)
+        return
+    try:
+        if ok:
+            _mark_ready(file_name)
+    finally:
+        if threading.get_ident() != submitter:
+            connection.close()
+
+
+def generate(record_file) -> None:
+    """Render (or reuse) the preview of record_file's content."""
+    if not previews_enabled() or not record_file.file:
+        return
+
+    storage = record_file.file.storage
+    file_name = record_file.file.name
+    dest_name = preview_name(file_name)
+
+    if storage.exists(dest_name):
+        _mark_ready(file_name)
+        return
+
+    try:
+        src = storage.path(file_name)
+        dest = storage.path(dest_name)
+    except NotImplementedError:
+        return
+
+    max_px = int(getattr(settings, "MEDICAL_FILE_PREVIEW_MAX_PX", 320) or 320)
+    executor = _get_executor()
+    if executor is None:
+        # inline (MEDICAL_FILE_PREVIEW_WORKERS=0): runs in the upload's on_commit,
+        # the file is already saved -> a corrupt file must not fail the request
+        try:
+            ok = render_preview(src, dest, max_px, preview_format())
+        except Exception:
+            logger.exception("Preview generation failed for %s", file_name)
+            return
+        if ok:
+            _mark_ready(file_name)
+        return
+
+    future = executor.submit(render_preview, src, dest, max_px, preview_format())
+    submitter = threading.get_ident()
+    future.add_done_callback(lambda f: _on_done(file_name, submitter, f))
+
+
+def schedule(record_file) -> None:
+    transaction.on_commit(lambda: generate(record_file))
+
+
+def delete_preview(storage, file_name: str) -> None:
+    dest_name = preview_name(file_name)
+    if storage.exists(dest_name):
+        storage.delete(dest_name)
@@ -0,0 +1,41 @@
+"""
+ClinicalOrder.files_state: readiness of an order's uploaded files.
+
+refresh_files_state() recomputes it in one UPDATE (CASE over two EXISTS subqueries),
+called from clinical/signals.py whenever a MedicalRecordFile is created, reviewed or
+deleted - every upload path (multipart, chunked, direct, deduplicated) goes through it.
+blocking_order() is the follow-up confirmation gate: one indexed query.
+"""
+from django.db.models import Case, Exists, OuterRef, Value, When
+
+from .models import ClinicalOrder, MedicalRecordFile
+
+
+def files_state_expression():
+    files = MedicalRecordFile.objects.filter(order_id=OuterRef("pk"))
+    not_approved = files.exclude(review_status=MedicalRecordFile.ReviewStatus.APPROVED)
+    return Case(
+        When(~Exists(files), then=Value(ClinicalOrder.FilesState.NO_FILES)),
+        When(Exists(not_approved), then=Value(ClinicalOrder.FilesState.PENDING)),
+        default=Value(ClinicalOrder.FilesState.APPROVED),
+    )
+
+
+def refresh_files_state(order_id: int) -> None:
+    if order_id:
+        ClinicalOrder.objects.filter(id=order_id).update(files_state=files_state_expression())
+
+
+def blocking_order(*, doctor_id: int, patient_id: int):
+    """First open order of the pair whose files are missing or not all approved: {"id", "files_state"} or None."""
+    return (
+        ClinicalOrder.objects.filter(
+            doctor_id=doctor_id,
+            patient_id=patient_id,
+            status=ClinicalOrder.Status.OPEN,
+        )
+        .exclude(files_state=ClinicalOrder.FilesState.APPROVED)
+        .order_by("id")
+        .values("id", "files_state")
+        .first()
+    )
@@ -0,0 +1,146 @@
+"""
+Section helpers for the clinical record aggregation (orders / prescriptions / adherence).
+
+- Every section is read newest first on (timestamp, id); pages use a keyset cursor
+  on that pair, so page N costs the same as page 1 (indexes in migration 0005).
+- section_counts() returns the three section sizes from one SELECT (scalar subqueries).
+- iter_ndjson() serializes row by row while reading with .iterator(), so memory
+  stays flat whatever the history size.
+"""
+from __future__ import annotations
+
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import (
+    ClinicalOrderSerializer,
+    MedicationAdherenceSerializer,
+    PrescriptionSerializer,
+)
+
+
+SECTIONS = ("orders", "prescriptions", "adherence")
+
+SECTION_TIMESTAMP = {
+    "orders": "created_at",
+    "prescriptions": "created_at",
+    "adherence": "taken_at",
+}
+
+SECTION_SERIALIZER = {
+    "orders": ClinicalOrderSerializer,
+    "prescriptions": PrescriptionSerializer,
+    "adherence": MedicationAdherenceSerializer,
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_CHUNK_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# -----------------------------
+# Keyset cursor
+# -----------------------------
+def encode_cursor(ts, pk: int) -> str:
+    raw = json.dumps([ts.isoformat(), pk]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str):
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        ts_raw, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        ts = parse_datetime(ts_raw)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor.")
+    if ts is None:
+        raise InvalidCursor("Invalid cursor.")
+    return ts, pk
+
+
+def parse_limit(raw) -> int:
+    """Page size from ?limit= (default / clamped); ValueError on non-integers."""
+    raw = (raw or "").strip()
+    if not raw:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(raw), MAX_PAGE_SIZE))
+
+
+def ordered(section: str, qs):
+    ts_field = SECTION_TIMESTAMP[section]
+    return qs.order_by(f"-{ts_field}", "-id")
+
+
+def page(section: str, qs, *, limit: int, cursor: str | None = None, context=None):
+    """(serialized rows, next cursor or None) for one section, newest first."""
+    ts_field = SECTION_TIMESTAMP[section]
+    qs = ordered(section, qs)
+
+    if cursor:
+        ts, pk = decode_cursor(cursor)
+        qs = qs.filter(Q(**{f"{ts_field}__lt": ts}) | Q(**{ts_field: ts, "id__lt": pk}))
+
+    rows = list(qs[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, ts_field), last.id)
+
+    data = SECTION_SERIALIZER[section](rows, many=True, context=context or {}).data
+    return data, next_cursor
+
+
+# -----------------------------
+# Counts (one query)
+# -----------------------------
+def _count_subquery(qs):
+    counted = qs.order_by().values("patient_id").annotate(n=Count("pk")).values("n")[:1]
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def section_counts(patient_id: int, querysets: dict) -> dict:
+    """{section: row count} for the scoped querysets, in a single SELECT."""
+    row = (
+        get_user_model().objects.filter(id=patient_id)
+        .annotate(**{f"{name}_count": _count_subquery(qs) for name, qs in querysets.items()})
+        .values(*[f"{name}_count" for name in querysets])
+        .first()
+    )
+    return {name: int((row or {}).get(f"{name}_count") or 0) for name in querysets}
+
+
+# -----------------------------
+# NDJSON stream
+# -----------------------------
+def _line(obj) -> bytes:
+    return (json.dumps(obj, cls=JSONEncoder, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_ndjson(header: dict, querysets: dict, context=None):
+    """
+    Lines:
+      {"type": "header", ...header}
+      {"type": "row", "section": <name>, "data": {...}}   (newest first, section by section)
+      {"type": "end"}
+    """
+    context = context or {}
+    yield _line({"type": "header", **header})
+
+    for section, qs in querysets.items():
+        serializer_class = SECTION_SERIALIZER[section]
+        for obj in ordered(section, qs).iterator(chunk_size=STREAM_CHUNK_SIZE):
+            yield _line({"type": "row", "section": section, "data": serializer_class(obj, context=context).data})
+
+    yield _line({"type": "end"})
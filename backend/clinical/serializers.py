@@ -1,5 +1,8 @@
+from django.urls import reverse
 from rest_framework import serializers
 from django.utils import timezone
+
+from . import blobs
 from .models import (
     ClinicalOrder,
     MedicalRecordFile,
@@ -30,11 +33,12 @@ class ClinicalOrderSerializer(serializers.ModelSerializer):
             "title",
             "details",
             "status",
+            "files_state",
             "appointment",
             "created_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "created_at", "updated_at", "doctor", "patient"]
+        read_only_fields = ["id", "created_at", "updated_at", "doctor", "patient", "files_state"]
         extra_kwargs = {
             "appointment": {"required": True},
         }
@@ -130,10 +134,28 @@ class MedicalRecordFileCreateSerializer(serializers.ModelSerializer):
         f = validated_data.get("file")
         if f and not validated_data.get("original_filename"):
             validated_data["original_filename"] = getattr(f, "name", "")
+
+        # Content-addressed storage: identical bytes are stored once (clinical/blobs.py).
+        # upload_digest = (sha256, size) computed while the upload streamed in, if any.
+        upload_digest = validated_data.pop("upload_digest", None) or (None, None)
+        if f:
+            blob = blobs.acquire(
+                f,
+                filename=getattr(f, "name", ""),
+                digest=upload_digest[0],
+                size=upload_digest[1],
+            )
+            validated_data["blob"] = blob
+            validated_data["file"] = blob.name
         return super().create(validated_data)
 
 
 class MedicalRecordFileSerializer(serializers.ModelSerializer):
+    # مسار تنزيل محمي بالصلاحيات (بديل MEDIA_URL المباشر)
+    download_url = serializers.SerializerMethodField()
+    # معاينة صغيرة (صورة مصغرة / الصفحة الأولى من PDF) لشاشات المراجعة
+    preview_url = serializers.SerializerMethodField()
+
     class Meta:
         model = MedicalRecordFile
         fields = [
@@ -141,6 +163,9 @@ class MedicalRecordFileSerializer(serializers.ModelSerializer):
             "order",
             "patient",
             "file",
+            "download_url",
+            "preview_url",
+            "has_preview",
             "original_filename",
             "review_status",
             "doctor_note",
@@ -150,6 +175,21 @@ class MedicalRecordFileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "uploaded_at"]
 
+    def _url(self, name, obj):
+        url = reverse(name, args=[obj.id])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_download_url(self, obj):
+        if not obj.file:
+            return None
+        return self._url("clinical-file-download", obj)
+
+    def get_preview_url(self, obj):
+        if not obj.file or not obj.has_preview:
+            return None
+        return self._url("clinical-file-preview", obj)
+
 
 # ---------------------------------------------------------------------------
 # Prescriptions
@@ -276,14 +316,15 @@ class PrescriptionSerializer(serializers.ModelSerializer):
 
 class MedicationAdherenceSerializer(serializers.ModelSerializer):
     # --- حقول مشتقة للعرض فقط ---
-    medicine_name = serializers.SerializerMethodField()
-    dosage = serializers.SerializerMethodField()
-    frequency = serializers.SerializerMethodField()
-    patient_display_name = serializers.SerializerMethodField()
+    # تُقرأ من annotations (clinical.adherence.with_projection) بدون تنقل لكل صف
+    medicine_name = serializers.CharField(read_only=True)
+    dosage = serializers.CharField(read_only=True)
+    frequency = serializers.CharField(read_only=True)
+    patient_display_name = serializers.CharField(read_only=True)
 
     # --- NEW: لتمكين فلتر appointment في Flutter ---
-    appointment_id = serializers.SerializerMethodField()
-    prescription_id = serializers.SerializerMethodField()
+    appointment_id = serializers.IntegerField(read_only=True)
+    prescription_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = MedicationAdherence
@@ -299,6 +340,7 @@ class MedicationAdherenceSerializer(serializers.ModelSerializer):
             "frequency",
             "status",
             "taken_at",
+            "client_uuid",
             "created_at",
         ]
         read_only_fields = [
@@ -313,51 +355,6 @@ class MedicationAdherenceSerializer(serializers.ModelSerializer):
             "appointment_id",
         ]
 
-    # ----------------------------
-    # Serializer methods
-    # ----------------------------
-
-    def _rx(self, obj):
-        item = getattr(obj, "prescription_item", None)
-        return getattr(item, "prescription", None)
-
-    def get_prescription_id(self, obj):
-        rx = self._rx(obj)
-        return getattr(rx, "id", None)
-
-    def get_appointment_id(self, obj):
-        rx = self._rx(obj)
-        return getattr(rx, "appointment_id", None)
-
-    def get_medicine_name(self, obj):
-        item = getattr(obj, "prescription_item", None)
-        return getattr(item, "medicine_name", None)
-
-    def get_dosage(self, obj):
-        item = getattr(obj, "prescription_item", None)
-        return getattr(item, "dosage", None)
-
-    def get_frequency(self, obj):
-        item = getattr(obj, "prescription_item", None)
-        return getattr(item, "frequency", None)
-
-    def get_patient_display_name(self, obj):
-        patient = getattr(obj, "patient", None)
-        if not patient:
-            return None
-
-        full_name = getattr(patient, "get_full_name", None)
-        if callable(full_name) and full_name():
-            return full_name()
-
-        if getattr(patient, "username", None):
-            return patient.username
-
-        if getattr(patient, "email", None):
-            return patient.email
-
-        return f"Patient #{patient.id}"
-
     def validate(self, attrs):
         """
         Fix (D-2.5): منع المريض من تسجيل adherence لعنصر لا يخصه.
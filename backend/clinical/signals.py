@@ -0,0 +1,98 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Appointment
+
+from .adherence import invalidate_patient
+from .blobs import release
+from .previews import schedule as schedule_preview
+from .links import record_link, refresh_link
+from .readiness import refresh_files_state
+from .models import ClinicalOrder, DoctorPatientLink, MedicalRecordFile, MedicationAdherence, Prescription
+
+
+# -----------------------------
+# DoctorPatientLink maintenance
+# (new rows add a reason; deletes / cancellations recount the pair)
+# -----------------------------
+@receiver(post_save, sender=ClinicalOrder)
+def _link_from_order(sender, instance, created, **kwargs):
+    if created:
+        record_link(
+            doctor_id=instance.doctor_id,
+            patient_id=instance.patient_id,
+            reason=DoctorPatientLink.REASON_ORDER,
+            seen_at=instance.created_at,
+        )
+
+
+@receiver(post_save, sender=Prescription)
+def _link_from_prescription(sender, instance, created, **kwargs):
+    if created:
+        record_link(
+            doctor_id=instance.doctor_id,
+            patient_id=instance.patient_id,
+            reason=DoctorPatientLink.REASON_PRESCRIPTION,
+            seen_at=instance.created_at,
+        )
+
+
+@receiver(post_save, sender=Appointment)
+def _link_from_appointment(sender, instance, created, update_fields=None, **kwargs):
+    if instance.status == "cancelled":
+        # status changes through lifecycle.transition() (QuerySet.update) refresh there
+        if created or update_fields is None or "status" in update_fields:
+            refresh_link(doctor_id=instance.doctor_id, patient_id=instance.patient_id)
+    elif created:
+        record_link(
+            doctor_id=instance.doctor_id,
+            patient_id=instance.patient_id,
+            reason=DoctorPatientLink.REASON_APPOINTMENT,
+            seen_at=instance.created_at,
+        )
+
+
+@receiver(post_delete, sender=ClinicalOrder)
+@receiver(post_delete, sender=Prescription)
+@receiver(post_delete, sender=Appointment)
+def _unlink_on_delete(sender, instance, **kwargs):
+    refresh_link(doctor_id=instance.doctor_id, patient_id=instance.patient_id)
+
+
+# -----------------------------
+# Adherence rollups cache (per patient)
+# -----------------------------
+@receiver(post_save, sender=MedicationAdherence)
+@receiver(post_delete, sender=MedicationAdherence)
+def _invalidate_adherence_rollups(sender, instance, **kwargs):
+    invalidate_patient(instance.patient_id)
+
+
+# -----------------------------
+# Deduplicated file content: drop the reference with the row
+# (covers cascades from orders / users, not only the delete endpoint)
+# -----------------------------
+@receiver(post_delete, sender=MedicalRecordFile)
+def _release_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        release(instance.blob_id)
+
+
+@receiver(post_save, sender=MedicalRecordFile)
+def _schedule_preview(sender, instance, created, **kwargs):
+    if created:
+        schedule_preview(instance)
+
+
+# -----------------------------
+# ClinicalOrder.files_state (upload / review / delete, any path)
+# -----------------------------
+@receiver(post_save, sender=MedicalRecordFile)
+def _refresh_order_files_state(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or "review_status" in update_fields:
+        refresh_files_state(instance.order_id)
+
+
+@receiver(post_delete, sender=MedicalRecordFile)
+def _refresh_order_files_state_on_delete(sender, instance, **kwargs):
+    refresh_files_state(instance.order_id)
@@ -0,0 +1,281 @@
+"""
+Storage backends for medical files (MedicalRecordFile.file, blobs, previews).
+
+MEDICAL_FILE_STORAGE selects the backend:
+- "local" (default): Django's default storage (FileSystemStorage under MEDIA_ROOT).
+- "signed": FileSystemStorage plus presigned GET / PUT URLs served by Django
+  (signed-media/<token>/). A local stand-in with the same contract as "s3", for
+  development and single-node setups.
+- "s3": any S3-compatible object store (AWS, MinIO, ...), via boto3 (optional
+  dependency). Writes stream through boto3's managed multipart upload; reads use
+  ranged GETs; clients download and upload directly with presigned URLs, so API
+  nodes keep no local file state.
+
+Presigned-capable backends implement:
+    presigned_url(name, *, filename=None, content_type=None, expires=None) -> str
+    presigned_put(name, *, sha256_hex, content_type=None, expires=None) -> (url, headers)
+"""
+from __future__ import annotations
+
+import base64
+import mimetypes
+import threading
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.urls import reverse
+from django.utils.deconstruct import deconstructible
+
+
+SIGNED_URL_SALT = "clinical.signed-media"
+
+_lock = threading.Lock()
+_storage = None
+
+
+def presign_expires() -> int:
+    return int(getattr(settings, "MEDICAL_FILE_URL_EXPIRES", 300) or 300)
+
+
+def medical_storage():
+    """Storage for medical files (used as FileField(storage=...) callable)."""
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                backend = (getattr(settings, "MEDICAL_FILE_STORAGE", "local") or "local").strip().lower()
+                if backend == "s3":
+                    _storage = S3Storage()
+                elif backend == "signed":
+                    _storage = SignedURLFileSystemStorage()
+                elif backend == "local":
+                    _storage = default_storage
+                else:
+                    raise ImproperlyConfigured(f"Unknown MEDICAL_FILE_STORAGE: {backend!r}")
+    return _storage
+
+
+def supports_presigned(storage) -> bool:
+    return hasattr(storage, "presigned_url") and hasattr(storage, "presigned_put")
+
+
+def has_local_path(storage, name: str = "probe") -> bool:
+    try:
+        storage.path(name)
+    except NotImplementedError:
+        return False
+    return True
+
+
+# -----------------------------
+# Local stand-in: signed URLs served by Django
+# -----------------------------
+@deconstructible
+class SignedURLFileSystemStorage(FileSystemStorage):
+    def _token(self, payload: dict) -> str:
+        return signing.dumps(payload, salt=SIGNED_URL_SALT, compress=True)
+
+    def presigned_url(self, name, *, filename=None, content_type=None, expires=None) -> str:
+        token = self._token(
+            {"m": "GET", "n": name, "f": filename, "t": content_type, "e": expires or presign_expires()}
+        )
+        return reverse("clinical-signed-media", args=[token])
+
+    def presigned_put(self, name, *, sha256_hex, content_type=None, expires=None):
+        token = self._token({"m": "PUT", "n": name, "h": sha256_hex, "e": expires or presign_expires()})
+        return reverse("clinical-signed-media", args=[token]), {}
+
+    @staticmethod
+    def read_token(token: str) -> dict:
+        """Payload of a valid, unexpired token; raises signing.BadSignature."""
+        payload = signing.loads(token, salt=SIGNED_URL_SALT)
+        signing.loads(token, salt=SIGNED_URL_SALT, max_age=int(payload.get("e") or presign_expires()))
+        return payload
+
+
+# -----------------------------
+# S3-compatible object storage
+# -----------------------------
+class _S3ReadFile(File):
+    """Seekable read-only view of an object: each read after a seek is a ranged GET."""
+
+    def __init__(self, storage, name: str):
+        self._storage = storage
+        self._pos = 0
+        self._body = None
+        self._body_pos = None
+        super().__init__(None, name)
+
+    @property
+    def size(self):
+        return self._storage.size(self.name)
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        if self._body is None or self._body_pos != self._pos:
+            self._close_body()
+            self._body = self._storage._get_body(self.name, self._pos)
+            self._body_pos = self._pos
+        data = self._body.read() if size is None or size < 0 else self._body.read(size)
+        self._pos += len(data)
+        self._body_pos = self._pos
+        return data
+
+    def chunks(self, chunk_size=None):
+        chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.seek(0)
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+    def _close_body(self):
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+    def close(self):
+        self._close_body()
+
+    @property
+    def closed(self):
+        return self._body is None
+
+
+@deconstructible
+class S3Storage(Storage):
+    def __init__(self, **options):
+        get = lambda key, default=None: options.get(key, getattr(settings, f"MEDICAL_S3_{key.upper()}", default))
+        self.bucket = get("bucket")
+        self.endpoint_url = get("endpoint_url") or None
+        self.region = get("region") or None
+        self.access_key = get("access_key") or None
+        self.secret_key = get("secret_key") or None
+        self.prefix = (get("prefix", "") or "").strip("/")
+        self.multipart_threshold = int(get("multipart_threshold", 8 * 1024 * 1024))
+        self.multipart_chunksize = int(get("multipart_chunksize", 8 * 1024 * 1024))
+        self._client = None
+        self._client_lock = threading.Lock()
+        if not self.bucket:
+            raise ImproperlyConfigured("MEDICAL_S3_BUCKET is required for MEDICAL_FILE_STORAGE='s3'.")
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    try:
+                        import boto3
+                    except ImportError:
+                        raise ImproperlyConfigured("MEDICAL_FILE_STORAGE='s3' requires boto3.")
+                    self._client = boto3.client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        region_name=self.region,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                    )
+        return self._client
+
+    def _key(self, name: str) -> str:
+        name = name.replace("\\", "/").lstrip("/")
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def _is_missing(self, exc) -> bool:
+        code = str(getattr(exc, "response", {}).get("Error", {}).get("Code", ""))
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def _head(self, name: str):
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as exc:
+            if self._is_missing(exc):
+                return None
+            raise
+
+    def _get_body(self, name: str, start: int = 0):
+        params = {"Bucket": self.bucket, "Key": self._key(name)}
+        if start:
+            params["Range"] = f"bytes={start}-"
+        return self.client.get_object(**params)["Body"]
+
+    # --- Storage API ---
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode or "+" in mode:
+            raise ValueError("S3Storage files are read-only; use save().")
+        return _S3ReadFile(self, name)
+
+    def _save(self, name, content):
+        from boto3.s3.transfer import TransferConfig
+
+        if hasattr(content, "seek"):
+            content.seek(0)
+        extra = {"ContentType": mimetypes.guess_type(name)[0] or "application/octet-stream"}
+        # Streams from the file object; large files go up as a multipart upload
+        self.client.upload_fileobj(
+            content,
+            self.bucket,
+            self._key(name),
+            ExtraArgs=extra,
+            Config=TransferConfig(
+                multipart_threshold=self.multipart_threshold,
+                multipart_chunksize=self.multipart_chunksize,
+            ),
+        )
+        return name
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def size(self, name):
+        head = self._head(name)
+        if head is None:
+            raise FileNotFoundError(name)
+        return int(head["ContentLength"])
+
+    def url(self, name):
+        return self.presigned_url(name)
+
+    # --- Presigned URLs ---
+    def presigned_url(self, name, *, filename=None, content_type=None, expires=None) -> str:
+        params = {"Bucket": self.bucket, "Key": self._key(name)}
+        if filename:
+            params["ResponseContentDisposition"] = f"inline; filename*=UTF-8''{quote(filename)}"
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self.client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=expires or presign_expires()
+        )
+
+    def presigned_put(self, name, *, sha256_hex, content_type=None, expires=None):
+        # S3 verifies the body against ChecksumSHA256, so the object is exactly the announced content
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode("ascii")
+        params = {"Bucket": self.bucket, "Key": self._key(name), "ChecksumSHA256": checksum}
+        headers = {"x-amz-checksum-sha256": checksum}
+        if content_type:
+            params["ContentType"] = content_type
+            headers["Content-Type"] = content_type
+        url = self.client.generate_presigned_url(
+            "put_object", Params=params, ExpiresIn=expires or presign_expires()
+        )
+        return url, headers
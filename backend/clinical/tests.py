@@ -1,3 +1,679 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import time as _time
+import zlib
+from concurrent.futures import Future
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Appointment, AppointmentType, CustomUser
+
+from . import previews, record, storage, uploads
+from .links import doctor_is_linked
+from .models import (
+    ChunkedUpload,
+    ClinicalOrder,
+    DoctorPatientLink,
+    MedicalRecordFile,
+    MedicationAdherence,
+    Prescription,
+    PrescriptionItem,
+    StoredBlob,
+)
+
+
+def _user(email, role, **extra):
+    return CustomUser.objects.create_user(
+        email=email, password="x", username=email.split("@")[0], role=role, is_active=True, **extra
+    )
+
+
+def _client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _body(response) -> bytes:
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def _tomorrow_at(hour, minute=0):
+    tz = timezone.get_current_timezone()
+    day = timezone.now().astimezone(tz).date() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)), tz)
+
+
+class ClinicalTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.doctor = _user("doc@example.com", "doctor")
+        self.patient = _user("pat@example.com", "patient")
+        self.appt_type = AppointmentType.objects.create(type_name="Consult", default_duration_minutes=30)
+
+    def _appointment(self, hour=10, status="pending"):
+        return Appointment.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            appointment_type=self.appt_type,
+            date_time=_tomorrow_at(hour),
+            duration_minutes=30,
+            status=status,
+        )
+
+    def _order(self, title="CBC"):
+        return ClinicalOrder.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            order_category=ClinicalOrder.OrderCategory.LAB_TEST,
+            title=title,
+        )
+
+    def _linked(self):
+        return doctor_is_linked(doctor_id=self.doctor.id, patient_id=self.patient.id)
+
+
+# -----------------------------
+# DoctorPatientLink (record / revoke)
+# -----------------------------
+class DoctorPatientLinkTests(ClinicalTestCase):
+    def test_cancelling_the_only_appointment_revokes_access(self):
+        ap = self._appointment()
+        self.assertTrue(self._linked())
+
+        response = _client(self.patient).post(f"/api/appointments/{ap.id}/cancel/")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertFalse(self._linked())
+        record = _client(self.doctor).get("/api/clinical/record/", {"patient_id": self.patient.id})
+        self.assertEqual(record.data["counts"], {"orders": 0, "prescriptions": 0, "adherence": 0})
+
+    def test_bulk_cancel_revokes_access(self):
+        ap = self._appointment()
+
+        _client(self.doctor).post("/api/appointments/bulk/", {"action": "cancel", "ids": [ap.id]}, format="json")
+
+        self.assertFalse(self._linked())
+
+    def test_deleting_a_source_keeps_the_link_while_another_remains(self):
+        order = self._order()
+        rx = Prescription.objects.create(doctor=self.doctor, patient=self.patient)
+        self.assertEqual(
+            DoctorPatientLink.objects.get(doctor=self.doctor, patient=self.patient).reasons,
+            DoctorPatientLink.REASON_ORDER | DoctorPatientLink.REASON_PRESCRIPTION,
+        )
+
+        order.delete()
+        self.assertEqual(
+            DoctorPatientLink.objects.get(doctor=self.doctor, patient=self.patient).reasons,
+            DoctorPatientLink.REASON_PRESCRIPTION,
+        )
+
+        rx.delete()
+        self.assertFalse(self._linked())
+        timeline = _client(self.doctor).get("/api/clinical/timeline/", {"patient_id": self.patient.id})
+        self.assertEqual(timeline.data, {"results": [], "next": None})
+
+    def test_deleting_an_appointment_revokes_access(self):
+        ap = self._appointment()
+
+        ap.delete()
+
+        self.assertFalse(self._linked())
+
+
+class FileTestCase(ClinicalTestCase):
+    """Media / chunk dirs in a temp dir, previews rendered inline, medical_storage() rebuilt."""
+
+    storage_backend = "local"
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(tmp, "media"),
+            CHUNKED_UPLOAD_DIR=os.path.join(tmp, "chunks"),
+            MEDICAL_FILE_STORAGE=self.storage_backend,
+            MEDICAL_FILE_PREVIEW_WORKERS=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        storage._storage = None
+        self.addCleanup(setattr, storage, "_storage", None)
+        self.storage = storage.medical_storage()
+        # FileField resolves its storage callable once, at import
+        field_storage = mock.patch.object(MedicalRecordFile._meta.get_field("file"), "storage", self.storage)
+        field_storage.start()
+        self.addCleanup(field_storage.stop)
+
+        self.order = self._order()
+
+    def _upload(self, data=b"%PDF-1.4 scan", filename="scan.pdf", order=None, patient=None):
+        order = order or self.order
+        return _client(patient or self.patient).post(
+            f"/api/clinical/orders/{order.id}/files/upload/",
+            {"file": SimpleUploadedFile(filename, data)},
+            format="multipart",
+        )
+
+
+# -----------------------------
+# Direct-to-storage uploads (local "signed" stand-in)
+# -----------------------------
+class DirectUploadTests(FileTestCase):
+    storage_backend = "signed"
+    data = b"%PDF-1.4 direct upload"
+
+    def _initiate(self, data=None, order=None, patient=None, sha256=None):
+        data = self.data if data is None else data
+        order = order or self.order
+        return _client(patient or self.patient).post(
+            f"/api/clinical/orders/{order.id}/files/direct-uploads/",
+            {"filename": "scan.pdf", "size": len(data), "sha256": sha256 or hashlib.sha256(data).hexdigest()},
+            format="json",
+        )
+
+    def _upload_as_other_patient(self):
+        other = _user("pat2@example.com", "patient")
+        order = ClinicalOrder.objects.create(
+            doctor=self.doctor, patient=other, order_category=ClinicalOrder.OrderCategory.LAB_TEST, title="CBC"
+        )
+        self.assertEqual(self._upload(self.data, order=order, patient=other).status_code, 201)
+
+    def _signed_name(self, url):
+        return storage.SignedURLFileSystemStorage.read_token(url.rstrip("/").rsplit("/", 1)[1])["n"]
+
+    def _put(self, url, data):
+        return APIClient().put(url, data=data, content_type="application/octet-stream")
+
+    def _complete(self, upload_id, order=None):
+        order = order or self.order
+        return _client(self.patient).post(
+            f"/api/clinical/orders/{order.id}/files/direct-uploads/complete/",
+            {"upload_id": upload_id},
+            format="json",
+        )
+
+    def test_presigned_put_then_get_round_trip(self):
+        instructions = self._initiate()
+        self.assertEqual(instructions.status_code, 200, instructions.data)
+
+        self.assertEqual(self._put(instructions.data["upload_url"], self.data).status_code, 200)
+        completed = self._complete(instructions.data["upload_id"])
+        self.assertEqual(completed.status_code, 201, completed.data)
+
+        with override_settings(MEDICAL_FILE_SENDFILE="redirect"):
+            redirect = _client(self.patient).get(f"/api/clinical/files/{completed.data['id']}/download/")
+        self.assertEqual(redirect.status_code, 302)
+        download = APIClient().get(redirect["Location"])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(_body(download), self.data)
+
+    def test_tampered_or_expired_signatures_are_rejected(self):
+        url = self._initiate().data["upload_url"]
+        token = url.rstrip("/").rsplit("/", 1)[1]
+        tampered = url.replace(token, token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
+        self.assertEqual(self._put(tampered, self.data).status_code, 403)
+
+        with mock.patch("django.core.signing.time.time", return_value=_time.time() + 3600):
+            self.assertEqual(self._put(url, self.data).status_code, 403)
+
+        # a PUT token does not grant GET, and nothing was stored
+        self.assertEqual(APIClient().get(url).status_code, 403)
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_complete_rejects_unknown_or_foreign_upload_ids(self):
+        instructions = self._initiate()
+        self._put(instructions.data["upload_url"], self.data)
+        other_order = self._order(title="X-ray")
+
+        self.assertEqual(self._complete("not-a-signed-id").status_code, 400)
+        self.assertEqual(self._complete(instructions.data["upload_id"], order=other_order).status_code, 400)
+        self.assertFalse(MedicalRecordFile.objects.exists())
+
+    def test_complete_before_the_put_is_a_conflict(self):
+        instructions = self._initiate()
+
+        self.assertEqual(self._complete(instructions.data["upload_id"]).status_code, 409)
+
+    def test_body_not_matching_the_signed_sha256_is_rejected(self):
+        instructions = self._initiate()
+
+        response = self._put(instructions.data["upload_url"], b"%PDF-1.4 something else")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._complete(instructions.data["upload_id"]).status_code, 409)
+        self.assertFalse(self.storage.exists(self._signed_name(instructions.data["upload_url"])))
+
+    def test_known_digest_from_another_patient_still_requires_the_bytes(self):
+        self._upload_as_other_patient()
+
+        response = self._initiate()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("upload_url", response.data)
+
+    def test_same_patient_content_is_referenced_without_upload(self):
+        self.assertEqual(self._upload(self.data).status_code, 201)
+
+        response = self._initiate()
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 2)
+
+    def test_upload_of_existing_content_is_deduplicated_after_commit(self):
+        self._upload_as_other_patient()
+        blob = StoredBlob.objects.get()
+
+        instructions = self._initiate()
+        self._put(instructions.data["upload_url"], self.data)
+        uploaded_name = self._signed_name(instructions.data["upload_url"])
+        self.assertTrue(self.storage.exists(uploaded_name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            completed = self._complete(instructions.data["upload_id"])
+
+        self.assertEqual(completed.status_code, 201, completed.data)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(MedicalRecordFile.objects.get(id=completed.data["id"]).blob_id, blob.id)
+        self.assertFalse(self.storage.exists(uploaded_name))
+        self.assertTrue(self.storage.exists(blob.name))
+
+
+# -----------------------------
+# Resumable (chunked) uploads
+# -----------------------------
+class ChunkedUploadTests(FileTestCase):
+    data = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.client = _client(self.patient)
+        response = self.client.post(
+            f"/api/clinical/orders/{self.order.id}/files/uploads/",
+            {"filename": "scan.pdf", "size": len(self.data)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.upload_id = response.data["upload_id"]
+
+    def _put(self, offset, chunk, **headers):
+        return self.client.put(
+            f"/api/clinical/uploads/{self.upload_id}/?offset={offset}",
+            data=chunk,
+            content_type="application/offset+octet-stream",
+            **headers,
+        )
+
+    def _finalize(self, checksum=None):
+        body = {"checksum": checksum} if checksum else {}
+        return self.client.post(f"/api/clinical/uploads/{self.upload_id}/finalize/", body, format="json")
+
+    def test_offset_mismatch_is_a_conflict_with_the_resume_offset(self):
+        self.assertEqual(self._put(0, self.data[:500]).status_code, 200)
+
+        replayed = self._put(0, self.data[:500])
+        ahead = self._put(700, self.data[700:])
+
+        for response in (replayed, ahead):
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.data["offset"], 500)
+        self.assertEqual(self._put(500, self.data[500:]).data["offset"], len(self.data))
+
+    def test_chunk_adler32_mismatch_is_rejected_and_not_counted(self):
+        chunk = self.data[:500]
+
+        bad = self._put(0, chunk, HTTP_UPLOAD_CHECKSUM=f"adler32={zlib.adler32(chunk) ^ 1:08x}")
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.client.get(f"/api/clinical/uploads/{self.upload_id}/").data["offset"], 0)
+
+        good = self._put(0, chunk, HTTP_UPLOAD_CHECKSUM=f"adler32={zlib.adler32(chunk):08x}")
+        self.assertEqual(good.status_code, 200)
+        self.assertEqual(good.data["offset"], 500)
+
+    def test_finalize_verifies_the_whole_file_adler32(self):
+        self._put(0, self.data[:500])
+        self._put(500, self.data[500:])
+
+        self.assertEqual(self._finalize(f"{zlib.adler32(self.data) ^ 1:08x}").status_code, 400)
+
+        response = self._finalize(f"{zlib.adler32(self.data):08x}")
+        self.assertEqual(response.status_code, 201, response.data)
+        record_file = MedicalRecordFile.objects.get(id=response.data["id"])
+        with record_file.file.open("rb") as fh:
+            self.assertEqual(fh.read(), self.data)
+
+    def test_purge_removes_stale_uploads_and_their_parts(self):
+        self._put(0, self.data[:500])
+        stale = ChunkedUpload.objects.get(id=self.upload_id)
+        ChunkedUpload.objects.filter(id=stale.id).update(updated_at=timezone.now() - timedelta(hours=25))
+        fresh = uploads.initiate(order=self.order, patient_id=self.patient.id, filename="x.pdf", total_size=10)
+
+        call_command("purge_chunked_uploads", hours=24, stdout=StringIO())
+
+        self.assertEqual(list(ChunkedUpload.objects.values_list("id", flat=True)), [fresh.id])
+        self.assertFalse(os.path.exists(uploads.part_path(stale)))
+        self.assertTrue(os.path.exists(uploads.part_path(fresh)))
+
+
+# -----------------------------
+# Content-addressed blobs (dedup + refcount)
+# -----------------------------
+class StoredBlobTests(FileTestCase):
+    def test_identical_uploads_share_one_blob(self):
+        first = self._upload(b"%PDF-1.4 same bytes", filename="a.pdf")
+        second = self._upload(b"%PDF-1.4 same bytes", filename="b.pdf")
+
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(
+            set(MedicalRecordFile.objects.values_list("id", "blob_id")),
+            {(first.data["id"], blob.id), (second.data["id"], blob.id)},
+        )
+        self.assertEqual(len(os.listdir(os.path.dirname(self.storage.path(blob.name)))), 1)
+
+    def test_content_is_deleted_only_with_the_last_reference(self):
+        first = self._upload(b"%PDF-1.4 same bytes")
+        second = self._upload(b"%PDF-1.4 same bytes")
+        blob = StoredBlob.objects.get()
+        client = _client(self.patient)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.delete(f"/api/clinical/files/{first.data['id']}/").status_code, 204)
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(self.storage.exists(blob.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.delete(f"/api/clinical/files/{second.data['id']}/").status_code, 204)
+
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(self.storage.exists(blob.name))
+
+    def test_stored_content_survives_a_rolled_back_release(self):
+        self._upload(b"%PDF-1.4 only copy")
+        blob = StoredBlob.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            try:
+                with transaction.atomic():
+                    MedicalRecordFile.objects.get().delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+        self.assertTrue(self.storage.exists(blob.name))
+
+
+# -----------------------------
+# Downloads (Range / X-Accel-Redirect / X-Sendfile)
+# -----------------------------
+class DownloadTests(FileTestCase):
+    data = b"%PDF-1.4 " + b"0123456789" * 10
+
+    def setUp(self):
+        super().setUp()
+        self.file_id = self._upload(self.data).data["id"]
+        self.url = f"/api/clinical/files/{self.file_id}/download/"
+        self.client = _client(self.patient)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(_body(response), self.data)
+
+    def test_range_returns_206_with_content_range(self):
+        size = len(self.data)
+        cases = {
+            "bytes=2-5": (2, 5),
+            "bytes=100-": (100, size - 1),
+            "bytes=-4": (size - 4, size - 1),
+            "bytes=5-100000": (5, size - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response["Content-Range"], f"bytes {start}-{end}/{size}")
+                self.assertEqual(response["Content-Length"], str(end - start + 1))
+                self.assertEqual(_body(response), self.data[start:end + 1])
+
+    def test_unsatisfiable_or_empty_range_returns_416(self):
+        for header in (f"bytes={len(self.data)}-", "bytes=-0", "bytes=9-3"):
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response["Content-Range"], f"bytes */{len(self.data)}")
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_body(response), self.data)
+
+    def test_front_end_server_headers(self):
+        name = MedicalRecordFile.objects.get(id=self.file_id).file.name
+
+        with override_settings(MEDICAL_FILE_SENDFILE="nginx", MEDICAL_FILE_ACCEL_PREFIX="/protected-media/"):
+            nginx = self.client.get(self.url)
+        with override_settings(MEDICAL_FILE_SENDFILE="apache"):
+            apache = self.client.get(self.url)
+
+        self.assertEqual(nginx["X-Accel-Redirect"], "/protected-media/" + name)
+        self.assertEqual(apache["X-Sendfile"], self.storage.path(name))
+        for response in (nginx, apache):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, b"")
+            self.assertIn("scan.pdf", response["Content-Disposition"])
+
+    def test_other_patients_cannot_download(self):
+        other = _user("pat2@example.com", "patient")
+
+        self.assertEqual(_client(other).get(self.url).status_code, 404)
+
+
+# -----------------------------
+# Previews
+# -----------------------------
+def _fake_render(src, dest, max_px, fmt):
+    with open(dest, "wb") as fh:
+        fh.write(b"preview")
+    return True
+
+
+class PreviewTests(FileTestCase):
+    def _upload_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._upload()
+        self.assertEqual(response.status_code, 201, response.data)
+        return MedicalRecordFile.objects.get(id=response.data["id"])
+
+    def test_successful_render_sets_has_preview(self):
+        with mock.patch.object(previews, "render_preview", side_effect=_fake_render):
+            record_file = self._upload_committed()
+
+        self.assertTrue(record_file.has_preview)
+        response = _client(self.patient).get(f"/api/clinical/files/{record_file.id}/preview/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_body(response), b"preview")
+
+    def test_render_failure_does_not_break_the_upload(self):
+        with mock.patch.object(previews, "render_preview", side_effect=OSError("corrupt")):
+            with self.assertLogs("clinical.previews", level="ERROR"):
+                record_file = self._upload_committed()
+
+        self.assertFalse(record_file.has_preview)
+        self.assertEqual(_client(self.patient).get(f"/api/clinical/files/{record_file.id}/preview/").status_code, 404)
+
+    def test_pool_callback_closes_only_its_own_thread_connection(self):
+        record_file = self._upload_committed()
+        future = Future()
+        future.set_result(True)
+
+        with mock.patch.object(previews.connection, "close") as close:
+            previews._on_done(record_file.file.name, threading.get_ident(), future)
+            close.assert_not_called()
+            previews._on_done(record_file.file.name, threading.get_ident() + 1, future)
+            close.assert_called_once()
+
+        record_file.refresh_from_db()
+        self.assertTrue(record_file.has_preview)
+
+
+# -----------------------------
+# Patient timeline
+# -----------------------------
+class TimelineTests(ClinicalTestCase):
+    url = "/api/clinical/timeline/"
+
+    def setUp(self):
+        super().setUp()
+        self.base = timezone.now().replace(microsecond=0) - timedelta(days=10)
+        # ties inside a source and across sources on the same timestamp
+        for hours in (0, 1, 1, 3):
+            ClinicalOrder.objects.filter(id=self._order().id).update(created_at=self.base + timedelta(hours=hours))
+        for hours in (1, 2):
+            rx = Prescription.objects.create(doctor=self.doctor, patient=self.patient)
+            Prescription.objects.filter(id=rx.id).update(created_at=self.base + timedelta(hours=hours))
+        ap = self._appointment()
+        Appointment.objects.filter(id=ap.id).update(date_time=self.base + timedelta(hours=1))
+
+    def _pages(self, limit):
+        client = _client(self.patient)
+        items, cursor = [], None
+        while True:
+            params = {"patient_id": self.patient.id, "limit": limit}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(self.url, params)
+            self.assertEqual(response.status_code, 200, response.data)
+            items.extend(response.data["results"])
+            cursor = response.data["next"]
+            if cursor is None:
+                return items
+            if len(items) == 2:
+                # rows added after the first page must not shift the following ones
+                self._order(title="late")
+
+    def test_pages_concatenate_to_the_single_page_order(self):
+        expected = _client(self.patient).get(self.url, {"patient_id": self.patient.id, "limit": 50}).data["results"]
+        self.assertEqual(len(expected), 7)
+
+        paged = self._pages(limit=2)
+
+        self.assertEqual([(i["type"], i["id"]) for i in paged], [(i["type"], i["id"]) for i in expected])
+        stamps = [datetime.fromisoformat(i["at"]) for i in paged]
+        self.assertEqual(stamps, sorted(stamps, reverse=True))
+
+    def test_timestamps_are_rendered_in_the_current_timezone(self):
+        with override_settings(TIME_ZONE="Asia/Tokyo"):
+            results = _client(self.patient).get(self.url, {"patient_id": self.patient.id}).data["results"]
+
+        oldest = datetime.fromisoformat(results[-1]["at"])
+        self.assertEqual(oldest.utcoffset(), timedelta(hours=9))
+        self.assertEqual(oldest, self.base)
+
+    def test_invalid_cursor_is_400(self):
+        response = _client(self.patient).get(self.url, {"patient_id": self.patient.id, "cursor": "!!"})
+
+        self.assertEqual(response.status_code, 400)
+
+
+# -----------------------------
+# Record sections (keyset pages)
+# -----------------------------
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite-specific")
+class RecordSectionIndexTests(ClinicalTestCase):
+    SECTION_INDEX = {
+        "orders": (ClinicalOrder, "order_patient_created_idx"),
+        "prescriptions": (Prescription, "rx_patient_created_idx"),
+        "adherence": (MedicationAdherence, "adherence_patient_taken_idx"),
+    }
+
+    def _plan(self, qs) -> str:
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return " | ".join(row[-1] for row in cursor.fetchall())
+
+    def test_pages_read_the_section_index_without_sorting(self):
+        cursor = record.encode_cursor(timezone.now(), 10)
+        ts, pk = record.decode_cursor(cursor)
+        for section, (model, index) in self.SECTION_INDEX.items():
+            ts_field = record.SECTION_TIMESTAMP[section]
+            qs = record.ordered(section, model.objects.filter(patient_id=self.patient.id))
+            after = qs.filter(Q(**{f"{ts_field}__lt": ts}) | Q(**{ts_field: ts, "id__lt": pk}))
+            for label, page_qs in (("first", qs), ("after cursor", after)):
+                with self.subTest(section=section, page=label):
+                    plan = self._plan(page_qs[: record.DEFAULT_PAGE_SIZE + 1])
+                    self.assertIn(index, plan)
+                    self.assertNotIn("TEMP B-TREE", plan)
+
+
+# -----------------------------
+# Offline adherence sync
+# -----------------------------
+class AdherenceBulkSyncTests(ClinicalTestCase):
+    url = "/api/clinical/adherence/bulk/"
+
+    def setUp(self):
+        super().setUp()
+        rx = Prescription.objects.create(doctor=self.doctor, patient=self.patient)
+        self.item = PrescriptionItem.objects.create(prescription=rx, medicine_name="Metformin")
+
+    def _entry(self, client_uuid, hours_ago=1):
+        return {
+            "client_uuid": str(client_uuid),
+            "prescription_item": self.item.id,
+            "status": "taken",
+            "taken_at": (timezone.now() - timedelta(hours=hours_ago)).isoformat(),
+        }
+
+    def _sync(self, entries):
+        response = _client(self.patient).post(self.url, {"entries": entries}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_duplicate_uuid_inside_a_batch_is_stored_once(self):
+        repeated, other = uuid.uuid4(), uuid.uuid4()
+
+        data = self._sync([self._entry(repeated), self._entry(other, 2), self._entry(repeated, 3)])
+
+        self.assertEqual(data["created"], 2)
+        self.assertEqual([r["result"] for r in data["results"]], ["created", "created", "duplicate"])
+        self.assertEqual(MedicationAdherence.objects.filter(client_uuid=repeated).count(), 1)
+        self.assertEqual(MedicationAdherence.objects.count(), 2)
+
+    def test_replayed_batch_creates_nothing(self):
+        entries = [self._entry(uuid.uuid4(), hours) for hours in (1, 2, 3)]
+        first = self._sync(entries)
+
+        replay = self._sync(entries)
+
+        self.assertEqual(replay["created"], 0)
+        self.assertEqual({r["result"] for r in replay["results"]}, {"duplicate"})
+        self.assertEqual([r["id"] for r in replay["results"]], [r["id"] for r in first["results"]])
+        self.assertEqual(MedicationAdherence.objects.count(), 3)
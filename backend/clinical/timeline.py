@@ -0,0 +1,146 @@
+"""
+Unified patient timeline: appointments, orders, prescriptions, files and adherence
+logs merged newest first.
+
+- Each source is one bounded query ordered by (timestamp, id) on a per-patient index;
+  heapq.merge interleaves the sources lazily and the first `limit` items form the page.
+- Global order is (timestamp desc, source rank, id desc). The cursor is the last
+  emitted (timestamp, rank, id); every source resumes strictly after it, so a page
+  costs at most one query of `limit + 1` rows per source however long the history is.
+"""
+from __future__ import annotations
+
+import base64
+import heapq
+import json
+from itertools import islice
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import Appointment
+
+from .models import ClinicalOrder, MedicalRecordFile, MedicationAdherence, Prescription
+from .record import InvalidCursor
+
+
+DEFAULT_PAGE_SIZE = 50
+
+
+class Source:
+    def __init__(self, name: str, model, ts_field: str, fields: tuple, doctor_lookup: str, aliases=None):
+        self.name = name
+        self.model = model
+        self.ts_field = ts_field
+        self.fields = fields
+        self.doctor_lookup = doctor_lookup
+        self.aliases = aliases or {}
+
+
+# Order of this tuple = tie-break rank between rows with the same timestamp
+SOURCES = (
+    Source(
+        "appointment", Appointment, "date_time",
+        ("status", "doctor_id", "appointment_type_id", "duration_minutes"),
+        "doctor",
+    ),
+    Source(
+        "order", ClinicalOrder, "created_at",
+        ("title", "order_category", "status", "doctor_id", "appointment_id"),
+        "doctor",
+    ),
+    Source(
+        "prescription", Prescription, "created_at",
+        ("doctor_id", "appointment_id", "notes"),
+        "doctor",
+    ),
+    Source(
+        "file", MedicalRecordFile, "uploaded_at",
+        ("order_id", "original_filename", "review_status"),
+        "order__doctor",
+    ),
+    Source(
+        "adherence", MedicationAdherence, "taken_at",
+        ("status", "prescription_item_id"),
+        "prescription_item__prescription__doctor",
+        aliases={"medicine_name": F("prescription_item__medicine_name")},
+    ),
+)
+
+
+# -----------------------------
+# Cursor: (timestamp, source rank, id)
+# -----------------------------
+def encode_timeline_cursor(ts, rank: int, pk: int) -> str:
+    raw = json.dumps([ts.isoformat(), rank, pk]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_timeline_cursor(value: str):
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        ts_raw, rank, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        ts = parse_datetime(ts_raw)
+        rank = int(rank)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor.")
+    if ts is None:
+        raise InvalidCursor("Invalid cursor.")
+    return ts, rank, pk
+
+
+def _after(source: Source, rank: int, cursor) -> Q:
+    """Rows of this source that come strictly after the cursor in global order."""
+    ts, cur_rank, cur_pk = cursor
+    ts_field = source.ts_field
+    if rank > cur_rank:
+        return Q(**{f"{ts_field}__lte": ts})
+    if rank < cur_rank:
+        return Q(**{f"{ts_field}__lt": ts})
+    return Q(**{f"{ts_field}__lt": ts}) | Q(**{ts_field: ts, "id__lt": cur_pk})
+
+
+def _stream(source: Source, rank: int, *, patient_id: int, doctor_id, cursor, limit: int):
+    qs = source.model.objects.filter(patient_id=patient_id)
+    if doctor_id is not None:
+        qs = qs.filter(**{source.doctor_lookup: doctor_id})
+    if cursor is not None:
+        qs = qs.filter(_after(source, rank, cursor))
+
+    rows = qs.order_by(f"-{source.ts_field}", "-id").values(
+        "id", source.ts_field, *source.fields, **source.aliases
+    )
+    for row in rows[:limit]:
+        ts = row.pop(source.ts_field)
+        pk = row.pop("id")
+        # merged with reverse=True: newest first, then lower rank, then id desc
+        yield (ts, -rank, pk), source.name, row
+
+
+def timeline_page(*, patient_id: int, doctor_id=None, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None):
+    """
+    (items, next_cursor). doctor_id restricts every source to that doctor's rows.
+    Raises InvalidCursor.
+    """
+    position = decode_timeline_cursor(cursor) if cursor else None
+
+    streams = [
+        _stream(source, rank, patient_id=patient_id, doctor_id=doctor_id, cursor=position, limit=limit + 1)
+        for rank, source in enumerate(SOURCES)
+    ]
+    merged = list(islice(heapq.merge(*streams, key=lambda entry: entry[0], reverse=True), limit + 1))
+
+    next_cursor = None
+    if len(merged) > limit:
+        merged = merged[:limit]
+        (ts, neg_rank, pk), _name, _row = merged[-1]
+        next_cursor = encode_timeline_cursor(ts, -neg_rank, pk)
+
+    tz = timezone.get_current_timezone()
+    items = [
+        {"type": name, "id": pk, "at": ts.astimezone(tz).isoformat(), "data": row}
+        for (ts, _neg_rank, pk), name, row in merged
+    ]
+    return items, next_cursor
@@ -0,0 +1,217 @@
+"""
+Resumable chunked uploads for MedicalRecordFile.
+
+Protocol (tus-like):
+- initiate(): session with the declared size; bytes go to CHUNKED_UPLOAD_DIR/<id>.part
+- append_chunk(): one PUT body written at `offset`, which must equal the bytes already
+  received (a retry after a dropped connection re-sends from there). The body is
+  spooled to a per-request temp file in READ_BLOCK pieces (never held whole in memory)
+  while a running adler32 is updated; an optional per-chunk adler32 is verified before
+  the chunk counts. Only the request that wins the compare-and-swap on `received`
+  copies its bytes into the .part file (in the same transaction), so a losing
+  concurrent PUT at the same offset never touches the accepted bytes.
+- finalize(): once every byte is in, optionally verifies the whole-file adler32,
+  stores the content as a deduplicated blob (clinical/blobs.py) and creates the
+  MedicalRecordFile.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from . import blobs
+from .models import ChunkedUpload, MedicalRecordFile
+
+
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, detail: str, status: int = 400, **extra):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.extra = extra
+
+    def as_dict(self) -> dict:
+        return {"detail": self.detail, **self.extra}
+
+
+def upload_dir() -> str:
+    return str(getattr(settings, "CHUNKED_UPLOAD_DIR", "") or os.path.join(settings.BASE_DIR, "chunked_uploads"))
+
+
+def max_upload_bytes() -> int:
+    return int(getattr(settings, "CHUNKED_UPLOAD_MAX_BYTES", 200 * 1024 * 1024))
+
+
+def max_chunk_bytes() -> int:
+    return int(getattr(settings, "CHUNKED_UPLOAD_MAX_CHUNK_BYTES", 8 * 1024 * 1024))
+
+
+def part_path(upload: ChunkedUpload) -> str:
+    return os.path.join(upload_dir(), f"{upload.id}.part")
+
+
+def parse_checksum(value) -> int | None:
+    """adler32 as 8 hex digits (None when not sent); ValueError if malformed."""
+    value = (value or "").strip().lower()
+    if not value:
+        return None
+    if value.startswith("adler32="):
+        value = value[len("adler32="):]
+    return int(value, 16)
+
+
+def status_data(upload: ChunkedUpload) -> dict:
+    return {
+        "upload_id": str(upload.id),
+        "order": upload.order_id,
+        "filename": upload.original_filename,
+        "size": upload.total_size,
+        "offset": upload.received,
+        "checksum": f"{upload.checksum:08x}",
+        "status": upload.status,
+        "file_id": upload.medical_file_id,
+        "max_chunk_bytes": max_chunk_bytes(),
+    }
+
+
+# -----------------------------
+# Protocol steps
+# -----------------------------
+def initiate(*, order, patient_id: int, filename: str, total_size: int) -> ChunkedUpload:
+    filename = os.path.basename((filename or "").strip())[:255]
+    if not filename:
+        raise UploadError("filename is required.")
+    if total_size <= 0:
+        raise UploadError("size must be a positive integer.")
+    if total_size > max_upload_bytes():
+        raise UploadError(f"File too large (max {max_upload_bytes()} bytes).", status=413)
+
+    upload = ChunkedUpload.objects.create(
+        order=order,
+        patient_id=patient_id,
+        original_filename=filename,
+        total_size=total_size,
+    )
+    os.makedirs(upload_dir(), exist_ok=True)
+    open(part_path(upload), "wb").close()
+    return upload
+
+
+def append_chunk(upload: ChunkedUpload, *, offset: int, stream, length: int, chunk_checksum: int | None = None) -> ChunkedUpload:
+    if upload.status != ChunkedUpload.Status.OPEN:
+        raise UploadError("Upload is already finalized.", status=409)
+    if offset != upload.received:
+        raise UploadError("Offset does not match the bytes received.", status=409, offset=upload.received)
+    if length <= 0:
+        raise UploadError("Empty chunk.")
+    if length > max_chunk_bytes():
+        raise UploadError(f"Chunk too large (max {max_chunk_bytes()} bytes).", status=413)
+    if offset + length > upload.total_size:
+        raise UploadError("Chunk exceeds the declared file size.")
+
+    running = upload.checksum
+    chunk_sum = zlib.adler32(b"")
+    written = 0
+
+    with tempfile.SpooledTemporaryFile(max_size=READ_BLOCK * 16, dir=upload_dir()) as spool:
+        while written < length:
+            block = stream.read(min(READ_BLOCK, length - written))
+            if not block:
+                break
+            spool.write(block)
+            written += len(block)
+            running = zlib.adler32(block, running)
+            chunk_sum = zlib.adler32(block, chunk_sum)
+
+        if written != length:
+            raise UploadError("Incomplete chunk.", offset=offset)
+        if chunk_checksum is not None and chunk_checksum != chunk_sum:
+            raise UploadError("Chunk checksum mismatch.", offset=offset)
+
+        with transaction.atomic():
+            updated = ChunkedUpload.objects.filter(
+                id=upload.id,
+                received=offset,
+                status=ChunkedUpload.Status.OPEN,
+            ).update(received=offset + written, checksum=running, updated_at=timezone.now())
+            if not updated:
+                upload.refresh_from_db()
+                raise UploadError("Concurrent write on this upload.", status=409, offset=upload.received)
+
+            # We own [offset, offset + written): a failed copy rolls `received` back
+            spool.seek(0)
+            path = part_path(upload)
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as fh:
+                fh.seek(offset)
+                shutil.copyfileobj(spool, fh, READ_BLOCK)
+
+    upload.received = offset + written
+    upload.checksum = running
+    return upload
+
+
+def finalize(upload: ChunkedUpload, *, checksum: int | None = None) -> tuple[MedicalRecordFile, bool]:
+    """(file, created). Finalizing twice returns the same file with created=False."""
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(id=upload.id)
+
+        if upload.status == ChunkedUpload.Status.COMPLETED and upload.medical_file_id:
+            return upload.medical_file, False
+
+        if upload.received != upload.total_size:
+            raise UploadError("Upload is incomplete.", status=409, offset=upload.received)
+        if checksum is not None and checksum != upload.checksum:
+            raise UploadError("File checksum mismatch.", checksum=f"{upload.checksum:08x}")
+
+        path = part_path(upload)
+        with open(path, "rb") as fh:
+            # Content-addressed: identical bytes already stored -> no copy at all
+            blob = blobs.acquire(File(fh, name=upload.original_filename), filename=upload.original_filename)
+
+        record_file = MedicalRecordFile.objects.create(
+            order_id=upload.order_id,
+            patient_id=upload.patient_id,
+            original_filename=upload.original_filename,
+            file=blob.name,
+            blob=blob,
+        )
+
+        upload.status = ChunkedUpload.Status.COMPLETED
+        upload.medical_file = record_file
+        upload.save(update_fields=["status", "medical_file", "updated_at"])
+
+        transaction.on_commit(lambda: _remove_part(path))
+
+    return record_file, True
+
+
+def abort(upload: ChunkedUpload) -> None:
+    path = part_path(upload)
+    upload.delete()
+    _remove_part(path)
+
+
+def _remove_part(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def purge_stale(older_than) -> int:
+    """Drop open sessions not touched since `older_than` (datetime) and their parts."""
+    count = 0
+    for upload in ChunkedUpload.objects.filter(status=ChunkedUpload.Status.OPEN, updated_at__lt=older_than).iterator():
+        abort(upload)
+        count += 1
+    return count
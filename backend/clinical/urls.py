@@ -5,14 +5,24 @@ from .views import (
     ClinicalOrderRetrieveView,
     OrderFilesListView,
     OrderFileUploadView,
+    ChunkedUploadInitiateView,
+    ChunkedUploadView,
+    ChunkedUploadFinalizeView,
+    DirectUploadInitiateView,
+    DirectUploadCompleteView,
+    SignedMediaView,
     approve_medical_record_file,
     reject_medical_record_file,
     PrescriptionListCreateView,
     PrescriptionRetrieveView,
     MedicationAdherenceListCreateView,
+    MedicationAdherenceRollupsView,
+    MedicationAdherenceBulkSyncView,
     OutboxEventListView,
     OrderFileDeleteView,
+    MedicalRecordFileDownloadView,
     ClinicalRecordAggregationView,
+    ClinicalTimelineView,
     MyInboxEventsView,
 )
 from .views_advice import PatientAdviceCardsView
@@ -26,19 +36,34 @@ urlpatterns = [
     path("orders/<int:order_id>/files/", OrderFilesListView.as_view(), name="order-files-list"),
     path("orders/<int:order_id>/files/upload/", OrderFileUploadView.as_view(), name="order-file-upload"),
 
+    # Resumable (chunked) uploads
+    path("orders/<int:order_id>/files/uploads/", ChunkedUploadInitiateView.as_view(), name="order-file-upload-initiate"),
+    path("uploads/<uuid:upload_id>/", ChunkedUploadView.as_view(), name="chunked-upload"),
+    path("uploads/<uuid:upload_id>/finalize/", ChunkedUploadFinalizeView.as_view(), name="chunked-upload-finalize"),
+
+    # Direct-to-storage uploads (presigned PUT) + presigned URLs of the local "signed" storage
+    path("orders/<int:order_id>/files/direct-uploads/", DirectUploadInitiateView.as_view(), name="order-file-direct-upload"),
+    path("orders/<int:order_id>/files/direct-uploads/complete/", DirectUploadCompleteView.as_view(), name="order-file-direct-upload-complete"),
+    path("signed-media/<str:token>/", SignedMediaView.as_view(), name="clinical-signed-media"),
+
     # File review actions
     path("files/<int:file_id>/approve/", approve_medical_record_file, name="file-approve"),
     path("files/<int:file_id>/reject/", reject_medical_record_file, name="file-reject"),
     path("files/<int:file_id>/", OrderFileDeleteView.as_view(), name="clinical-file-delete"), 
+    path("files/<int:file_id>/download/", MedicalRecordFileDownloadView.as_view(), name="clinical-file-download"),
+    path("files/<int:file_id>/preview/", MedicalRecordFileDownloadView.as_view(preview=True), name="clinical-file-preview"),
     # Prescriptions
     path("prescriptions/", PrescriptionListCreateView.as_view(), name="prescription-list-create"),
     path("prescriptions/<int:pk>/", PrescriptionRetrieveView.as_view(), name="prescription-retrieve"),
 
     # Adherence
     path("adherence/", MedicationAdherenceListCreateView.as_view(), name="adherence-list-create"),
+    path("adherence/rollups/", MedicationAdherenceRollupsView.as_view(), name="adherence-rollups"),
+    path("adherence/bulk/", MedicationAdherenceBulkSyncView.as_view(), name="adherence-bulk-sync"),
 
     #aggrigation
     path("record/", ClinicalRecordAggregationView.as_view(), name="clinical-record-aggregation"),
+    path("timeline/", ClinicalTimelineView.as_view(), name="clinical-timeline"),
 
 
     # Outbox (optional)
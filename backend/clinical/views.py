@@ -1,21 +1,38 @@
+import uuid
+
+from django.core import signing
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import (
+    ChunkedUpload,
     ClinicalOrder,
     MedicalRecordFile,
     Prescription,
     MedicationAdherence,
     OutboxEvent,
 )
+from . import blobs, direct_uploads, downloads, previews, record, uploads
+from .adherence import (
+    MAX_WINDOW_DAYS,
+    PERIODS as ADHERENCE_PERIODS,
+    SYNC_MAX_ENTRIES,
+    rollups as adherence_rollups,
+    sync_entries,
+    with_projection,
+)
+from .links import doctor_is_linked
 from .permissions import IsDoctor, IsPatient, is_admin, is_doctor, is_patient
+from .storage import SignedURLFileSystemStorage, medical_storage
+from .timeline import timeline_page
 from .serializers import (
     ClinicalOrderSerializer,
     MedicalRecordFileCreateSerializer,
@@ -68,6 +85,36 @@ def _create_outbox_event(
     )
 
 
+def _notify_file_uploaded(*, actor, order, file_obj) -> None:
+    # إشعار للطبيب: تم رفع ملف طبي (رفع عادي أو رفع مجزأ)
+    _create_outbox_event(
+        event_type="file_uploaded",
+        actor=actor,             # patient
+        patient=order.doctor,    # recipient doctor
+        obj=file_obj,
+        entity_type="medical_record_file",
+        entity_id=file_obj.id,
+        route="/app/record/files",
+        payload={
+            "order_id": order.id,
+            "patient_id": order.patient_id,
+            "doctor_id": order.doctor_id,
+            "filename": file_obj.original_filename,
+            "title": "تم رفع ملف طبي",
+            "message": f"تم رفع الملف: {file_obj.original_filename or 'ملف جديد'}",
+        },
+    )
+
+
+def _delete_record_file(record_file) -> None:
+    # Shared (blob) content is released by the post_delete signal and removed
+    # only with its last reference; files stored before dedup are deleted directly.
+    if not record_file.blob_id and getattr(record_file, "file", None):
+        previews.delete_preview(record_file.file.storage, record_file.file.name)
+        record_file.file.delete(save=False)
+    record_file.delete()
+
+
 def _is_pending_review_status(value: str) -> bool:
     """
     توحيد التعامل مع pending:
@@ -78,23 +125,18 @@ def _is_pending_review_status(value: str) -> bool:
     return v in ("pending", "pending_review", "pending-review")
 
 
-def _doctor_is_linked_to_patient(*, doctor, patient_id: int) -> bool:
-    # 1) Existing clinical relationship via previous Orders
-    if ClinicalOrder.objects.filter(doctor=doctor, patient_id=patient_id).exists():
-        return True
-
-    # 2) Existing clinical relationship via previous Prescriptions
-    if Prescription.objects.filter(doctor=doctor, patient_id=patient_id).exists():
-        return True
-
-    # 3) Optional: if Appointment exists already, use it as a stronger link
+def _is_uuid(value) -> bool:
     try:
-        if Appointment.objects.filter(doctor_id=doctor.id, patient_id=patient_id).exists():
-            return True
-    except Exception:
-        pass
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
 
-    return False
+
+def _doctor_is_linked_to_patient(*, doctor, patient_id: int, request=None) -> bool:
+    # Single lookup on DoctorPatientLink (orders / prescriptions / appointments),
+    # memoized per request when request is given.
+    return doctor_is_linked(doctor_id=doctor.id, patient_id=patient_id, request=request)
 
 
 # ---------------------------------------------------------------------------
@@ -287,36 +329,305 @@ class OrderFileUploadView(generics.CreateAPIView):
         if not (is_admin(request.user) or (order.patient_id == request.user.id)):
             return Response({"detail": "You can only upload files for your own orders."}, status=403)
 
+        # Hash the file while the multipart body is parsed (before request.data is read)
+        request.upload_handlers.insert(0, blobs.Sha256UploadHandler(request._request))
+
         data = request.data.copy()
         data["order"] = str(order_id)
         data["patient"] = str(request.user.id)
 
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        file_obj = serializer.save()
+        file_obj = serializer.save(
+            upload_digest=getattr(request._request, "upload_sha256", {}).get("file"),
+        )
 
-        # إشعار للطبيب: تم رفع ملف طبي
-        _create_outbox_event(
-            event_type="file_uploaded",
-            actor=request.user,      # patient
-            patient=order.doctor,    # recipient doctor
-            obj=file_obj,
-            entity_type="medical_record_file",
-            entity_id=file_obj.id,
-            route="/app/record/files",
-            payload={
-                "order_id": order.id,
-                "patient_id": order.patient_id,
-                "doctor_id": order.doctor_id,
-                "filename": file_obj.original_filename,
-                "title": "تم رفع ملف طبي",
-                "message": f"تم رفع الملف: {file_obj.original_filename or 'ملف جديد'}",
-            },
+        _notify_file_uploaded(actor=request.user, order=order, file_obj=file_obj)
+
+        return Response(MedicalRecordFileSerializer(file_obj).data, status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadInitiateView(APIView):
+    """
+    POST /api/clinical/orders/<order_id>/files/uploads/  {"filename", "size"}
+    Starts a resumable upload -> {"upload_id", "offset": 0, ...}
+    """
+    permission_classes = [IsAuthenticated, IsPatient]
+
+    def post(self, request, order_id):
+        order = ClinicalOrder.objects.select_related("doctor").filter(id=order_id).first()
+        if not order:
+            return Response({"detail": "Clinical order not found."}, status=404)
+
+        if not (is_admin(request.user) or (order.patient_id == request.user.id)):
+            return Response({"detail": "You can only upload files for your own orders."}, status=403)
+
+        try:
+            total_size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            return Response({"size": "size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            upload = uploads.initiate(
+                order=order,
+                patient_id=order.patient_id,
+                filename=request.data.get("filename"),
+                total_size=total_size,
+            )
+        except uploads.UploadError as exc:
+            return Response(exc.as_dict(), status=exc.status)
+
+        return Response(uploads.status_data(upload), status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadView(APIView):
+    """
+    /api/clinical/uploads/<upload_id>/
+    - GET: progress (offset to resume from)
+    - PUT: raw chunk body at ?offset= (or Upload-Offset header);
+      optional Upload-Checksum: adler32 of the chunk (hex)
+    - DELETE: abort
+    """
+    permission_classes = [IsAuthenticated, IsPatient]
+
+    def _get_upload(self, request, upload_id):
+        upload = ChunkedUpload.objects.filter(id=upload_id).first()
+        if upload is None:
+            return None
+        if not (is_admin(request.user) or upload.patient_id == request.user.id):
+            return None
+        return upload
+
+    def get(self, request, upload_id):
+        upload = self._get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Not found."}, status=404)
+        return Response(uploads.status_data(upload))
+
+    def put(self, request, upload_id):
+        upload = self._get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Not found."}, status=404)
+
+        offset_raw = request.query_params.get("offset") or request.headers.get("Upload-Offset")
+        try:
+            offset = int(offset_raw)
+        except (TypeError, ValueError):
+            return Response({"offset": "offset must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            length = int(request.headers.get("Content-Length") or "")
+        except ValueError:
+            return Response({"detail": "Content-Length is required."}, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        try:
+            chunk_checksum = uploads.parse_checksum(request.headers.get("Upload-Checksum"))
+        except ValueError:
+            return Response({"detail": "Upload-Checksum must be adler32 in hex."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # request.stream = raw body; request.data is never touched, so nothing is buffered
+            upload = uploads.append_chunk(
+                upload,
+                offset=offset,
+                stream=request.stream,
+                length=length,
+                chunk_checksum=chunk_checksum,
+            )
+        except uploads.UploadError as exc:
+            return Response(exc.as_dict(), status=exc.status)
+
+        return Response(uploads.status_data(upload))
+
+    def delete(self, request, upload_id):
+        upload = self._get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Not found."}, status=404)
+        if upload.status != ChunkedUpload.Status.OPEN:
+            return Response({"detail": "Upload is already finalized."}, status=status.HTTP_409_CONFLICT)
+
+        uploads.abort(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChunkedUploadFinalizeView(ChunkedUploadView):
+    """
+    POST /api/clinical/uploads/<upload_id>/finalize/  {"checksum": "<adler32 hex of whole file>"}
+    Creates the MedicalRecordFile (and the file_uploaded event) once all bytes are in.
+    """
+    http_method_names = ["post", "options"]
+
+    def post(self, request, upload_id):
+        upload = self._get_upload(request, upload_id)
+        if upload is None:
+            return Response({"detail": "Not found."}, status=404)
+
+        try:
+            checksum = uploads.parse_checksum(request.data.get("checksum"))
+        except ValueError:
+            return Response({"checksum": "checksum must be adler32 in hex."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_obj, created = uploads.finalize(upload, checksum=checksum)
+        except uploads.UploadError as exc:
+            return Response(exc.as_dict(), status=exc.status)
+
+        if created:
+            _notify_file_uploaded(actor=request.user, order=file_obj.order, file_obj=file_obj)
+
+        return Response(
+            MedicalRecordFileSerializer(file_obj).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
         )
 
+
+class DirectUploadInitiateView(APIView):
+    """
+    POST /api/clinical/orders/<order_id>/files/direct-uploads/  {"filename", "size", "sha256"}
+    - 201 + file: the patient already has a file with this content, nothing to upload
+    - 200 + {"upload_url", "method": "PUT", "headers", "upload_id", ...}: PUT the bytes
+      to the object store, then POST .../direct-uploads/complete/ {"upload_id"}
+    Only with a presigned-capable MEDICAL_FILE_STORAGE ("s3" / "signed").
+    """
+    permission_classes = [IsAuthenticated, IsPatient]
+
+    def _get_order(self, request, order_id):
+        order = ClinicalOrder.objects.select_related("doctor").filter(id=order_id).first()
+        if not order:
+            return None, Response({"detail": "Clinical order not found."}, status=404)
+        if not (is_admin(request.user) or (order.patient_id == request.user.id)):
+            return None, Response({"detail": "You can only upload files for your own orders."}, status=403)
+        return order, None
+
+    def post(self, request, order_id):
+        order, error = self._get_order(request, order_id)
+        if error is not None:
+            return error
+
+        try:
+            size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            return Response({"size": "size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            file_obj, instructions = direct_uploads.initiate(
+                order=order,
+                filename=request.data.get("filename"),
+                size=size,
+                sha256=request.data.get("sha256"),
+            )
+        except uploads.UploadError as exc:
+            return Response(exc.as_dict(), status=exc.status)
+
+        if file_obj is None:
+            return Response(instructions, status=status.HTTP_200_OK)
+
+        _notify_file_uploaded(actor=request.user, order=order, file_obj=file_obj)
         return Response(MedicalRecordFileSerializer(file_obj).data, status=status.HTTP_201_CREATED)
 
 
+class DirectUploadCompleteView(DirectUploadInitiateView):
+    """
+    POST /api/clinical/orders/<order_id>/files/direct-uploads/complete/  {"upload_id"}
+    Registers the uploaded object and creates the MedicalRecordFile.
+    """
+
+    def post(self, request, order_id):
+        order, error = self._get_order(request, order_id)
+        if error is not None:
+            return error
+
+        try:
+            file_obj = direct_uploads.complete(order=order, upload_id=request.data.get("upload_id"))
+        except uploads.UploadError as exc:
+            return Response(exc.as_dict(), status=exc.status)
+
+        _notify_file_uploaded(actor=request.user, order=order, file_obj=file_obj)
+        return Response(MedicalRecordFileSerializer(file_obj).data, status=status.HTTP_201_CREATED)
+
+
+class SignedMediaView(APIView):
+    """
+    GET / PUT /api/clinical/signed-media/<token>/
+    Presigned URLs of the local "signed" storage: the signed token is the only credential.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def _payload(self, token, method):
+        storage = medical_storage()
+        if not isinstance(storage, SignedURLFileSystemStorage):
+            return storage, None
+        try:
+            payload = storage.read_token(token)
+        except signing.BadSignature:
+            return storage, None
+        if payload.get("m") != method:
+            return storage, None
+        return storage, payload
+
+    def get(self, request, token):
+        storage, payload = self._payload(token, "GET")
+        if payload is None:
+            return Response({"detail": "Invalid or expired link."}, status=403)
+        return downloads.serve_signed(request, storage, payload)
+
+    def put(self, request, token):
+        storage, payload = self._payload(token, "PUT")
+        if payload is None:
+            return Response({"detail": "Invalid or expired link."}, status=403)
+
+        try:
+            length = int(request.headers.get("Content-Length") or "")
+        except ValueError:
+            return Response({"detail": "Content-Length is required."}, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        try:
+            # raw body, never buffered through request.data
+            direct_uploads.receive_signed_put(storage, payload, stream=request.stream, length=length)
+        except uploads.UploadError as exc:
+            return Response(exc.as_dict(), status=exc.status)
+
+        return Response(status=status.HTTP_200_OK)
+
+
+class MedicalRecordFileDownloadView(APIView):
+    """
+    GET /api/clinical/files/<file_id>/download/[?attachment=1]
+    GET /api/clinical/files/<file_id>/preview/  (small JPEG/WebP, when has_preview)
+    Permission check once, then the transfer goes to the front-end server
+    (X-Accel-Redirect / X-Sendfile) or a Range-capable stream (clinical/downloads.py).
+    """
+    permission_classes = [IsAuthenticated]
+    preview = False
+
+    def get(self, request, file_id):
+        record_file = (
+            MedicalRecordFile.objects.select_related("order", "blob")
+            .filter(id=file_id)
+            .first()
+        )
+        if record_file is None or not record_file.file:
+            return Response({"detail": "Not found."}, status=404)
+
+        user = request.user
+        allowed = (
+            is_admin(user)
+            or (is_doctor(user) and record_file.order.doctor_id == user.id)
+            or (is_patient(user) and record_file.patient_id == user.id)
+        )
+        if not allowed:
+            return Response({"detail": "Not found."}, status=404)
+
+        if self.preview:
+            if not record_file.has_preview:
+                return Response({"detail": "No preview available."}, status=404)
+            return downloads.serve(request, record_file, preview=True)
+
+        attachment = (request.query_params.get("attachment") or "").strip().lower() in ("1", "true", "yes")
+        return downloads.serve(request, record_file, attachment=attachment)
+
+
 class OrderFileDeleteView(APIView):
     """
     DELETE /api/clinical/files/<file_id>/
@@ -336,9 +647,7 @@ class OrderFileDeleteView(APIView):
         user = request.user
 
         if is_admin(user):
-            if getattr(record_file, "file", None):
-                record_file.file.delete(save=False)
-            record_file.delete()
+            _delete_record_file(record_file)
 
             _create_outbox_event(
                 event_type="MEDICAL_FILE_DELETED",
@@ -369,9 +678,7 @@ class OrderFileDeleteView(APIView):
                     status=status.HTTP_403_FORBIDDEN,
                 )
 
-            if getattr(record_file, "file", None):
-                record_file.file.delete(save=False)
-            record_file.delete()
+            _delete_record_file(record_file)
 
             # (ملاحظة UX) هذا الحدث غالباً recipient=self (المريض) وقد تختاره لتجاهله بالـ polling
             _create_outbox_event(
@@ -635,9 +942,7 @@ class MedicationAdherenceListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        qs = MedicationAdherence.objects.all().select_related(
-            "patient", "prescription_item", "prescription_item__prescription"
-        )
+        qs = with_projection(MedicationAdherence.objects.all())
 
         if is_admin(user):
             return qs
@@ -655,6 +960,18 @@ class MedicationAdherenceListCreateView(generics.ListCreateAPIView):
      #      return Response({"detail": "Only patients can record adherence."}, status=403)
         if not is_patient(request.user):
             return Response({"detail": "Only patients can record adherence."}, status=403)
+
+        # Replay of an already-stored offline log -> return it unchanged
+        client_uuid = request.data.get("client_uuid")
+        if client_uuid and _is_uuid(client_uuid):
+            existing = with_projection(
+                MedicationAdherence.objects.filter(patient=request.user, client_uuid=client_uuid)
+            ).first()
+            if existing is not None:
+                return Response(
+                    MedicationAdherenceSerializer(existing, context={"request": request}).data,
+                    status=status.HTTP_200_OK,
+                )
        # serializer = self.get_serializer(data=request.data)
         serializer = self.get_serializer(
             data=request.data,
@@ -681,12 +998,110 @@ class MedicationAdherenceListCreateView(generics.ListCreateAPIView):
             },
         )
 
+        log = with_projection(MedicationAdherence.objects.filter(id=log.id)).get()
         return Response(
             MedicationAdherenceSerializer(log, context={"request": request}).data,
             status=status.HTTP_201_CREATED,
         )
 
 
+class MedicationAdherenceBulkSyncView(APIView):
+    """
+    POST /api/clinical/adherence/bulk/
+    {"entries": [{"client_uuid", "prescription_item", "status", "taken_at"}, ...]}
+    Offline replay: idempotent per client_uuid, per-entry results in input order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not is_patient(request.user):
+            return Response({"detail": "Only patients can record adherence."}, status=403)
+
+        entries = request.data.get("entries") if isinstance(request.data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            return Response({"entries": "entries must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > SYNC_MAX_ENTRIES:
+            return Response(
+                {"entries": f"At most {SYNC_MAX_ENTRIES} entries per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results, created = sync_entries(request.user, entries)
+
+        if created:
+            # One summary event per batch (not one per log)
+            _create_outbox_event(
+                event_type="MEDICATION_ADHERENCE_RECORDED",
+                actor=request.user,
+                patient=request.user,
+                entity_type="medication_adherence",
+                route="/app/record/adherence",
+                payload={
+                    "count": created,
+                    "title": "تسجيل التزام دوائي",
+                    "message": f"تمت مزامنة {created} سجل التزام دوائي",
+                },
+            )
+
+        return Response({"created": created, "results": results}, status=status.HTTP_200_OK)
+
+
+class MedicationAdherenceRollupsView(APIView):
+    """
+    GET /api/clinical/adherence/rollups/?patient_id=...&period=day|week&days=30
+    Taken / skipped counts and rates per prescription item per period (DB GROUP BY,
+    cached per patient until the next adherence write).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        user = request.user
+
+        patient_id_raw = (params.get("patient_id") or "").strip()
+        if not patient_id_raw and is_patient(user):
+            patient_id_raw = str(user.id)
+        if not patient_id_raw:
+            return Response({"patient_id": "patient_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            patient_id = int(patient_id_raw)
+        except ValueError:
+            return Response({"patient_id": "patient_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = (params.get("period") or "day").strip().lower()
+        if period not in ADHERENCE_PERIODS:
+            return Response({"period": "period must be day or week."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            days = int((params.get("days") or "30").strip())
+        except ValueError:
+            return Response({"days": "days must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, MAX_WINDOW_DAYS))
+
+        if is_admin(user):
+            doctor_id = None
+        elif is_doctor(user):
+            if not _doctor_is_linked_to_patient(doctor=user, patient_id=patient_id, request=request):
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            doctor_id = user.id
+        elif is_patient(user):
+            if user.id != patient_id:
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            doctor_id = None
+        else:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(
+            {
+                "patient_id": patient_id,
+                "period": period,
+                "days": days,
+                "results": adherence_rollups(patient_id, period=period, days=days, doctor_id=doctor_id),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 # ---------------------------------------------------------------------------
 # Aggregation
 # ---------------------------------------------------------------------------
@@ -695,6 +1110,13 @@ class ClinicalRecordAggregationView(APIView):
     """
     GET /api/clinical/record/?patient_id=...
     Read-only aggregation within role scope.
+
+    Optional:
+    - section=orders|prescriptions|adherence -> only that section
+    - limit / cursor -> keyset pages per section, newest first
+      (response adds "next": {section: cursor|null}; cursor needs section)
+    - stream=ndjson -> one JSON line per row, read with .iterator()
+    Without these the response stays the full legacy payload.
     """
     permission_classes = [IsAuthenticated]
 
@@ -708,24 +1130,50 @@ class ClinicalRecordAggregationView(APIView):
         except ValueError:
             return Response({"patient_id": "patient_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
 
+        params = request.query_params
+
+        section = (params.get("section") or "").strip().lower()
+        if section and section not in record.SECTIONS:
+            return Response(
+                {"section": f"section must be one of: {', '.join(record.SECTIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        sections = (section,) if section else record.SECTIONS
+
+        stream = (params.get("stream") or "").strip().lower()
+        if stream and stream != "ndjson":
+            return Response({"stream": "Only stream=ndjson is supported."}, status=status.HTTP_400_BAD_REQUEST)
+
+        cursor = (params.get("cursor") or "").strip()
+        paginated = not stream and ("limit" in params or bool(cursor))
+        if cursor and not section:
+            return Response({"cursor": "cursor requires section."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = record.parse_limit(params.get("limit"))
+        except ValueError:
+            return Response({"limit": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
         user = request.user
 
         if is_admin(user):
             orders_qs = ClinicalOrder.objects.filter(patient_id=patient_id).select_related("doctor", "patient", "appointment")
             rx_qs = Prescription.objects.filter(patient_id=patient_id).select_related("doctor", "patient", "appointment").prefetch_related("items")
-            adh_qs = MedicationAdherence.objects.filter(patient_id=patient_id).select_related(
-                "patient", "prescription_item", "prescription_item__prescription"
-            )
+            adh_qs = with_projection(MedicationAdherence.objects.filter(patient_id=patient_id))
             scope = {"role": "admin", "admin_id": user.id}
 
         elif is_doctor(user):
+            scope = {"role": "doctor", "doctor_id": user.id}
+
+            if not _doctor_is_linked_to_patient(doctor=user, patient_id=patient_id, request=request):
+                # No relationship -> nothing in scope, skip the section queries
+                return self._empty_response(patient_id, scope, sections, stream=stream, paginated=paginated)
+
             orders_qs = ClinicalOrder.objects.filter(doctor=user, patient_id=patient_id).select_related("doctor", "patient", "appointment")
             rx_qs = Prescription.objects.filter(doctor=user, patient_id=patient_id).select_related("doctor", "patient", "appointment").prefetch_related("items")
-            adh_qs = MedicationAdherence.objects.filter(
+            adh_qs = with_projection(MedicationAdherence.objects.filter(
                 patient_id=patient_id,
                 prescription_item__prescription__doctor=user,
-            ).select_related("patient", "prescription_item", "prescription_item__prescription")
-            scope = {"role": "doctor", "doctor_id": user.id}
+            ))
 
         elif is_patient(user):
             if user.id != patient_id:
@@ -733,33 +1181,116 @@ class ClinicalRecordAggregationView(APIView):
 
             orders_qs = ClinicalOrder.objects.filter(patient=user).select_related("doctor", "patient", "appointment")
             rx_qs = Prescription.objects.filter(patient=user).select_related("doctor", "patient", "appointment").prefetch_related("items")
-            adh_qs = MedicationAdherence.objects.filter(patient=user).select_related(
-                "patient", "prescription_item", "prescription_item__prescription"
-            )
+            adh_qs = with_projection(MedicationAdherence.objects.filter(patient=user))
             scope = {"role": "patient", "patient_id": user.id}
 
         else:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        orders_data = ClinicalOrderSerializer(orders_qs, many=True, context={"request": request}).data
-        prescriptions_data = PrescriptionSerializer(rx_qs, many=True, context={"request": request}).data
-        adherence_data = MedicationAdherenceSerializer(adh_qs, many=True, context={"request": request}).data
+        all_querysets = {"orders": orders_qs, "prescriptions": rx_qs, "adherence": adh_qs}
+        querysets = {name: all_querysets[name] for name in sections}
+        context = {"request": request}
 
-        return Response(
-            {
+        if stream:
+            header = {
                 "patient_id": patient_id,
                 "scope": scope,
-                "orders": orders_data,
-                "prescriptions": prescriptions_data,
-                "adherence": adherence_data,
-                "counts": {
-                    "orders": len(orders_data),
-                    "prescriptions": len(prescriptions_data),
-                    "adherence": len(adherence_data),
-                },
-            },
-            status=status.HTTP_200_OK,
-        )
+                "counts": record.section_counts(patient_id, querysets),
+            }
+            return StreamingHttpResponse(
+                record.iter_ndjson(header, querysets, context=context),
+                content_type="application/x-ndjson",
+            )
+
+        if paginated:
+            body = {"patient_id": patient_id, "scope": scope}
+            next_cursors = {}
+            try:
+                for name, qs in querysets.items():
+                    body[name], next_cursors[name] = record.page(
+                        name, qs, limit=limit, cursor=cursor or None, context=context
+                    )
+            except record.InvalidCursor as exc:
+                return Response({"cursor": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+            body["next"] = next_cursors
+            body["counts"] = record.section_counts(patient_id, querysets)
+            return Response(body, status=status.HTTP_200_OK)
+
+        body = {"patient_id": patient_id, "scope": scope}
+        for name, qs in querysets.items():
+            body[name] = record.SECTION_SERIALIZER[name](qs, many=True, context=context).data
+        body["counts"] = {name: len(body[name]) for name in querysets}
+
+        return Response(body, status=status.HTTP_200_OK)
+
+    def _empty_response(self, patient_id, scope, sections, *, stream, paginated):
+        counts = {name: 0 for name in sections}
+
+        if stream:
+            header = {"patient_id": patient_id, "scope": scope, "counts": counts}
+            return StreamingHttpResponse(
+                record.iter_ndjson(header, {}),
+                content_type="application/x-ndjson",
+            )
+
+        body = {"patient_id": patient_id, "scope": scope}
+        body.update({name: [] for name in sections})
+        if paginated:
+            body["next"] = {name: None for name in sections}
+        body["counts"] = counts
+        return Response(body, status=status.HTTP_200_OK)
+
+
+class ClinicalTimelineView(APIView):
+    """
+    GET /api/clinical/timeline/?patient_id=...&limit=...&cursor=...
+    Appointments, orders, prescriptions, files and adherence logs merged newest first
+    (doctor: only rows they are part of). Response: {"results", "next"}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        patient_id_raw = request.query_params.get("patient_id")
+        if not patient_id_raw:
+            return Response({"patient_id": "patient_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            patient_id = int(patient_id_raw)
+        except ValueError:
+            return Response({"patient_id": "patient_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = record.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"limit": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+
+        if is_admin(user):
+            doctor_id = None
+        elif is_doctor(user):
+            if not _doctor_is_linked_to_patient(doctor=user, patient_id=patient_id, request=request):
+                return Response({"results": [], "next": None}, status=status.HTTP_200_OK)
+            doctor_id = user.id
+        elif is_patient(user):
+            if user.id != patient_id:
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            doctor_id = None
+        else:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            items, next_cursor = timeline_page(
+                patient_id=patient_id,
+                doctor_id=doctor_id,
+                limit=limit,
+                cursor=(request.query_params.get("cursor") or "").strip() or None,
+            )
+        except record.InvalidCursor as exc:
+            return Response({"cursor": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"results": items, "next": next_cursor}, status=status.HTTP_200_OK)
 
 
 # ---------------------------------------------------------------------------
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medical_app.settings')
 
 application = get_asgi_application()
+
+# Build the in-process autocomplete index before the first request needs it
+from appointments.services.autocomplete import warm as warm_autocomplete  # noqa: E402
+
+warm_autocomplete()
@@ -180,9 +180,69 @@ DEFAULT_FROM_EMAIL = os.environ.get(
 )
 
 
+# ===========================
+# Cache (slot holds, scheduling caches)
+# LocMem is per-process; point DJANGO_CACHE_BACKEND at Redis/Memcached
+# when running more than one worker so holds are shared.
+# ===========================
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "vera-default"),
+    }
+}
+
+SLOT_HOLD_TTL_SECONDS = int(os.environ.get("SLOT_HOLD_TTL_SECONDS", "120"))
+
+# Urgent matcher: freed slots are offered (held) to open urgent requests; priority = score + aging
+# (stored in UrgentRequest.effective_priority, re-aged by `manage.py refresh_urgent_priorities`)
+URGENT_OFFER_TTL_SECONDS = int(os.environ.get("URGENT_OFFER_TTL_SECONDS", "900"))
+URGENT_AGING_POINTS_PER_HOUR = float(os.environ.get("URGENT_AGING_POINTS_PER_HOUR", "0.25"))
+URGENT_AGING_MAX_BONUS = float(os.environ.get("URGENT_AGING_MAX_BONUS", "3"))
+
+# Rebooking priority tokens: cached "has active token for doctor X" lookups (seconds)
+REBOOKING_TOKEN_CACHE_TTL_SECONDS = int(os.environ.get("REBOOKING_TOKEN_CACHE_TTL_SECONDS", "3600"))
+
+# Idempotency-Key on booking / urgent-request POSTs: how long a stored response is replayed
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+
+# Public hospital / lab listings: Cache-Control max-age (seconds)
+DIRECTORY_CACHE_MAX_AGE = int(os.environ.get("DIRECTORY_CACHE_MAX_AGE", "60"))
+
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Resumable (chunked) medical file uploads: temp parts live outside MEDIA_ROOT
+CHUNKED_UPLOAD_DIR = os.environ.get("CHUNKED_UPLOAD_DIR", str(BASE_DIR / "chunked_uploads"))
+CHUNKED_UPLOAD_MAX_BYTES = int(os.environ.get("CHUNKED_UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_CHUNK_BYTES = int(os.environ.get("CHUNKED_UPLOAD_MAX_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+# Medical file storage: "local" (MEDIA_ROOT), "signed" (local + presigned URLs served by Django), "s3" (boto3)
+MEDICAL_FILE_STORAGE = os.environ.get("MEDICAL_FILE_STORAGE", "local")
+MEDICAL_FILE_URL_EXPIRES = int(os.environ.get("MEDICAL_FILE_URL_EXPIRES", "300"))  # presigned URL lifetime (s)
+MEDICAL_S3_BUCKET = os.environ.get("MEDICAL_S3_BUCKET", "")
+MEDICAL_S3_ENDPOINT_URL = os.environ.get("MEDICAL_S3_ENDPOINT_URL", "")  # e.g. MinIO: http://minio:9000
+MEDICAL_S3_REGION = os.environ.get("MEDICAL_S3_REGION", "")
+MEDICAL_S3_ACCESS_KEY = os.environ.get("MEDICAL_S3_ACCESS_KEY", "")
+MEDICAL_S3_SECRET_KEY = os.environ.get("MEDICAL_S3_SECRET_KEY", "")
+MEDICAL_S3_PREFIX = os.environ.get("MEDICAL_S3_PREFIX", "")
+
+# Medical file downloads: "" = stream from Django (or redirect to a presigned URL on
+# remote storage), "redirect" = presigned URL, "nginx" = X-Accel-Redirect, "apache" = X-Sendfile
+MEDICAL_FILE_SENDFILE = os.environ.get("MEDICAL_FILE_SENDFILE", "")
+# nginx: `location /protected-media/ { internal; alias <MEDIA_ROOT>/; }`
+MEDICAL_FILE_ACCEL_PREFIX = os.environ.get("MEDICAL_FILE_ACCEL_PREFIX", "/protected-media/")
+
+# Upload previews (optional Pillow / PyMuPDF); 0 workers = render inline after commit
+MEDICAL_FILE_PREVIEWS_ENABLED = os.environ.get("MEDICAL_FILE_PREVIEWS_ENABLED", "1") == "1"
+MEDICAL_FILE_PREVIEW_WORKERS = int(os.environ.get("MEDICAL_FILE_PREVIEW_WORKERS", "2"))
+MEDICAL_FILE_PREVIEW_MAX_PX = int(os.environ.get("MEDICAL_FILE_PREVIEW_MAX_PX", "320"))
+MEDICAL_FILE_PREVIEW_FORMAT = os.environ.get("MEDICAL_FILE_PREVIEW_FORMAT", "jpeg")  # or "webp"
+
 ADVICE_ENGINE = "rules"        # or "ml"
 ADVICE_MODEL_VERSION = "v0"    # used when ADVICE_ENGINE="ml"
 ADVICE_LOGGING_ENABLED = False
@@ -40,7 +40,7 @@ def _normalize_entity_id(value):
     return value
 
 
-def create_outbox_event(
+def build_outbox_event(
     *,
     event_type: str,
     actor,
@@ -52,76 +52,83 @@ def create_outbox_event(
     route: str | None = None,
     title: str | None = None,
     message: str | None = None,
-) -> None:
+) -> OutboxEvent:
     """
-    Create Outbox event safely (fail-safe, does not break main flow).
+    Unsaved OutboxEvent with the enriched payload (for bulk_create).
 
     Notes:
     - OutboxEvent.patient is used as RECIPIENT (may be patient OR doctor).
     - payload is enriched with ready-to-display fields for Flutter:
       actor_name/recipient_name/title/message/route/entity_type/entity_id/timestamp.
     """
-    try:
-        actor_user = actor if getattr(actor, "is_authenticated", False) else None
-        recipient_user = recipient
-
-        base = dict(payload) if isinstance(payload, dict) else {}
-
-        # ---- unified identity ----
-        base.setdefault("type", event_type)
-
-        base.setdefault("actor_id", getattr(actor_user, "id", None))
-        base.setdefault("actor_name", display_name(actor_user))
-        base.setdefault("actor_role", getattr(actor_user, "role", None) if actor_user else None)
-
-        base.setdefault("recipient_id", getattr(recipient_user, "id", None))
-        base.setdefault("recipient_name", display_name(recipient_user))
-        base.setdefault("recipient_role", getattr(recipient_user, "role", None) if recipient_user else None)
-
-        # ---- entity + routing ----
-        resolved_entity_id = _normalize_entity_id(entity_id)
-        if resolved_entity_id is None and obj is not None:
-            resolved_entity_id = _normalize_entity_id(getattr(obj, "id", None))
-
-        resolved_entity_type = entity_type or base.get("entity_type")
-
-        if resolved_entity_type:
-            base.setdefault("entity_type", resolved_entity_type)
-        if resolved_entity_id is not None:
-            base.setdefault("entity_id", resolved_entity_id)
-
-        if route:
-            base.setdefault("route", route)
-
-        # ---- timestamp ----
-        base.setdefault("timestamp", timezone.now().isoformat())
-
-        # ---- ready-to-show defaults ----
-        # Allow explicit title/message params to override, else fallback to payload, else defaults
-        if title and str(title).strip():
-            base["title"] = title
-        elif not str(base.get("title") or "").strip():
-            base["title"] = event_type
-
-        if message and str(message).strip():
-            base["message"] = message
-        elif not str(base.get("message") or "").strip():
-            base["message"] = "تفاصيل غير متوفرة."
-
-        # OutboxEvent.object_id is stored as string.
-        object_id_str = ""
-        if resolved_entity_id is not None:
-            object_id_str = str(resolved_entity_id)
-
-        OutboxEvent.objects.create(
-            event_type=event_type,
-            actor=actor_user,
-            patient=recipient_user,  # recipient (legacy DB field)
-            object_id=object_id_str,
-            payload=base,
-            status=OutboxEvent.Status.PENDING,
-        )
+    actor_user = actor if getattr(actor, "is_authenticated", False) else None
+    recipient_user = recipient
+
+    base = dict(payload) if isinstance(payload, dict) else {}
+
+    # ---- unified identity ----
+    base.setdefault("type", event_type)
+
+    base.setdefault("actor_id", getattr(actor_user, "id", None))
+    base.setdefault("actor_name", display_name(actor_user))
+    base.setdefault("actor_role", getattr(actor_user, "role", None) if actor_user else None)
+
+    base.setdefault("recipient_id", getattr(recipient_user, "id", None))
+    base.setdefault("recipient_name", display_name(recipient_user))
+    base.setdefault("recipient_role", getattr(recipient_user, "role", None) if recipient_user else None)
+
+    # ---- entity + routing ----
+    resolved_entity_id = _normalize_entity_id(entity_id)
+    if resolved_entity_id is None and obj is not None:
+        resolved_entity_id = _normalize_entity_id(getattr(obj, "id", None))
+
+    resolved_entity_type = entity_type or base.get("entity_type")
+
+    if resolved_entity_type:
+        base.setdefault("entity_type", resolved_entity_type)
+    if resolved_entity_id is not None:
+        base.setdefault("entity_id", resolved_entity_id)
+
+    if route:
+        base.setdefault("route", route)
 
+    # ---- timestamp ----
+    base.setdefault("timestamp", timezone.now().isoformat())
+
+    # ---- ready-to-show defaults ----
+    # Allow explicit title/message params to override, else fallback to payload, else defaults
+    if title and str(title).strip():
+        base["title"] = title
+    elif not str(base.get("title") or "").strip():
+        base["title"] = event_type
+
+    if message and str(message).strip():
+        base["message"] = message
+    elif not str(base.get("message") or "").strip():
+        base["message"] = "تفاصيل غير متوفرة."
+
+    # OutboxEvent.object_id is stored as string.
+    object_id_str = ""
+    if resolved_entity_id is not None:
+        object_id_str = str(resolved_entity_id)
+
+    return OutboxEvent(
+        event_type=event_type,
+        actor=actor_user,
+        patient=recipient_user,  # recipient (legacy DB field)
+        object_id=object_id_str,
+        payload=base,
+        status=OutboxEvent.Status.PENDING,
+    )
+
+
+def create_outbox_event(**kwargs) -> None:
+    """
+    Create Outbox event safely (fail-safe, does not break main flow).
+    Accepts the keyword arguments of build_outbox_event().
+    """
+    try:
+        build_outbox_event(**kwargs).save()
     except Exception:
         # fail-safe: do not break main operation
         pass